@@ -0,0 +1,123 @@
+import re
+from dataclasses import dataclass
+from difflib import SequenceMatcher
+
+# --- Accessibility Resolver Settings ---
+ACCESSIBILITY_MIN_SCORE = 0.6 # Best matches scoring below this are rejected (callers fall back to CSS guessing)
+ROLE_HINT_BONUS = 0.1 # Added when the description names the node's role ("... button", "... link")
+WRONG_ROLE_PENALTY = 0.3 # Subtracted when the role can't take a click (STRICT_ROLE_ACTIONS skip such nodes outright)
+STRICT_ROLE_ACTIONS = {"type", "select"} # Only nodes whose role can take these actions are considered
+
+# Words in a description that say what kind of element is meant
+ROLE_WORDS = {
+    "button": {"button"},
+    "link": {"link"},
+    "checkbox": {"checkbox"},
+    "radio": {"radio"},
+    "tab": {"tab"},
+    "menu": {"menuitem", "menu"},
+    "dropdown": {"combobox", "listbox"},
+    "select": {"combobox", "listbox"},
+    "field": {"textbox", "searchbox", "combobox"},
+    "input": {"textbox", "searchbox", "combobox"},
+    "textbox": {"textbox", "searchbox"},
+    "search": {"searchbox", "combobox", "textbox"},
+    "heading": {"heading"},
+    "image": {"img"},
+}
+# Roles that can take each action; wait/assert/extract accept anything
+ACTION_ROLES = {
+    "click": {"button", "link", "checkbox", "radio", "tab", "menuitem", "menuitemcheckbox", "menuitemradio",
+              "option", "switch", "combobox", "treeitem", "img", "heading", "cell", "row"},
+    "type": {"textbox", "searchbox", "combobox", "spinbutton"},
+    "select": {"combobox", "listbox"},
+}
+FILLER_WORDS = {"click", "tap", "press", "type", "enter", "choose", "on", "the", "a", "an", "to", "into", "from", "of", "element", "bar", "box"}
+# Structural nodes that have no usable role selector
+IGNORED_ROLES = {"WebArea", "RootWebArea", "text", "StaticText", "generic", "none", "presentation", "LineBreak", "InlineTextBox"}
+
+
+@dataclass
+class AccessibilityMatch:
+    role: str
+    name: str
+    score: float
+    selector: str # Playwright role selector for the matched node
+
+
+def _tokens(text: str) -> list[str]:
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+
+def flatten_snapshot(snapshot: dict | None) -> list[dict]:
+    """Named, addressable nodes of an accessibility snapshot, in document order."""
+    nodes = []
+    stack = [snapshot] if snapshot else []
+    while stack:
+        node = stack.pop()
+        if node.get("name") and node.get("role") not in IGNORED_ROLES:
+            nodes.append(node)
+        stack.extend(reversed(node.get("children", [])))
+    return nodes
+
+
+def describe_query(description: str) -> tuple[str, set]:
+    """
+    Splits a description into the text to look for and the roles it hints at. Quoted
+    text wins outright; otherwise filler and role words are dropped from the query.
+    """
+    words = _tokens(description)
+    hinted_roles = set().union(*(ROLE_WORDS[word] for word in words if word in ROLE_WORDS))
+    quoted = re.search(r"""['"]([^'"]+)['"]""", description)
+    if quoted:
+        return " ".join(_tokens(quoted.group(1))), hinted_roles
+    content = [word for word in words if word not in FILLER_WORDS]
+    query = [word for word in content if word not in ROLE_WORDS] or content # "search bar" keeps "search"
+    return " ".join(query), hinted_roles
+
+
+def name_similarity(query: str, name: str) -> float:
+    """0..1: fuzzy ratio of the two strings, or the share of query words the name contains if that's higher."""
+    name = " ".join(_tokens(name))
+    if not query or not name:
+        return 0.0
+    if query == name:
+        return 1.0
+    query_words = set(query.split())
+    overlap = len(query_words & set(name.split())) / len(query_words)
+    return max(SequenceMatcher(None, query, name).ratio(), 0.9 * overlap)
+
+
+def role_selector(role: str, name: str, nth: int = 0) -> str:
+    """Exact-name Playwright role selector; nth picks among nodes sharing role and name."""
+    # Playwright's attribute parser takes a backslash as "next character literally", so only \ and " may be escaped
+    quoted = name.replace("\\", "\\\\").replace('"', '\\"')
+    return f'role={role}[name="{quoted}"s] >> nth={nth}'
+
+
+def best_match(snapshot: dict | None, description: str, action: str = None) -> AccessibilityMatch | None:
+    """Scores every named node in the snapshot against the description and returns the best (first on ties)."""
+    query, hinted_roles = describe_query(description)
+    allowed_roles = ACTION_ROLES.get(action)
+    best, best_score = None, None
+    seen = {}
+    for node in flatten_snapshot(snapshot):
+        role, name = node["role"], node["name"]
+        nth = seen.get((role, name), 0)
+        seen[(role, name)] = nth + 1
+        if allowed_roles and role not in allowed_roles and action in STRICT_ROLE_ACTIONS:
+            continue
+        score = name_similarity(query, name)
+        if role in hinted_roles:
+            score += ROLE_HINT_BONUS
+        if allowed_roles and role not in allowed_roles:
+            score -= WRONG_ROLE_PENALTY
+        if best is None or score > best_score: # Compared unclamped, so the role hint still breaks ties between exact names
+            best, best_score = AccessibilityMatch(role, name, max(0.0, min(1.0, score)), role_selector(role, name, nth)), score
+    return best
+
+
+async def resolve_by_accessibility(page, description: str, action: str = None) -> AccessibilityMatch | None:
+    """Takes one accessibility snapshot of the page and returns the node that best fits the description."""
+    snapshot = await page.accessibility.snapshot()
+    return best_match(snapshot, description, action)
@@ -0,0 +1,80 @@
+import re
+
+from html_reducer import reduce_html
+
+# --- Batched Analysis Settings ---
+ANALYSIS_BATCH_SIZE = 5 # Most pages packed into one Gemini request (1 disables batching)
+ANALYSIS_BATCH_MAX_CHARS = 60000 # Context budget for the page outlines in one request
+ANALYSIS_BATCH_WAIT = 2.0 # Seconds a worker waits for more pages before sending a partial batch
+
+ANALYSIS_MARKER_PATTERN = re.compile(r"^[=#*\s]*ANALYSIS\s+(\d+)\s*[=#*\s]*$", re.MULTILINE | re.IGNORECASE)
+
+
+def pack_batches(outlines: list[str], max_chars: int = ANALYSIS_BATCH_MAX_CHARS) -> list[list[int]]:
+    """Groups outline indexes into batches whose combined size stays within max_chars."""
+    batches, current, used = [], [], 0
+    for index, outline in enumerate(outlines):
+        if current and used + len(outline) > max_chars:
+            batches.append(current)
+            current, used = [], 0
+        current.append(index)
+        used += len(outline)
+    if current:
+        batches.append(current)
+    return batches
+
+
+def build_batch_prompt(outlines: list[str], prompt_suffix: str) -> str:
+    """One prompt covering several pages, each delimited and numbered from 1."""
+    parts = [
+        f"Analyze each of the following {len(outlines)} web pages, given as text outlines of their headings, links, forms, prices and text. {prompt_suffix}",
+        f"Analyze every page on its own. Start the analysis of each page with a line reading exactly \"=== ANALYSIS <page number> ===\" "
+        f"and cover all {len(outlines)} pages, in order.",
+    ]
+    for number, outline in enumerate(outlines, start=1):
+        parts.append(f"=== PAGE {number} ===\n{outline}\n=== END PAGE {number} ===")
+    return "\n\n".join(parts)
+
+
+def split_batch_response(text: str, count: int) -> list[str | None]:
+    """Splits a batched reply into per-page analyses; pages the model skipped come back as None."""
+    results = [None] * count
+    markers = list(ANALYSIS_MARKER_PATTERN.finditer(text or ""))
+    for position, marker in enumerate(markers):
+        number = int(marker.group(1))
+        end = markers[position + 1].start() if position + 1 < len(markers) else len(text)
+        analysis = text[marker.end():end].strip()
+        if 1 <= number <= count and analysis and results[number - 1] is None:
+            results[number - 1] = analysis
+    return results
+
+
+def analyze_pages_in_batches(contents: list[str], prompt_suffix: str, model, analyze_one, cache=None) -> list[str]:
+    """
+    Analyses several pages in as few requests to `model` as the context budget allows.
+    Cached analyses (from an AnalysisCache, if given) are reused; pages missing from a
+    reply are passed to analyze_one(content, prompt_suffix) one by one.
+    """
+    outlines = [reduce_html(content) for content in contents]
+    results = [cache.lookup(outline, prompt_suffix) if cache else None for outline in outlines]
+    pending = [index for index, result in enumerate(results) if result is None]
+
+    for batch in pack_batches([outlines[index] for index in pending]):
+        batch = [pending[position] for position in batch]
+        if len(batch) < 2:
+            continue
+        full_prompt = build_batch_prompt([outlines[index] for index in batch], prompt_suffix)
+        try:
+            print(f"Sending {len(batch)} pages for batched AI analysis (prompt len: {len(full_prompt)})...")
+            response = model.generate_content(full_prompt)
+            text = response.parts[0].text if response.parts else ""
+            for index, analysis in zip(batch, split_batch_response(text, len(batch))):
+                if analysis:
+                    results[index] = analysis
+                    if cache:
+                        cache.store(outlines[index], prompt_suffix, analysis)
+        except Exception as e:
+            print(f"Batched AI analysis failed ({e}); analysing those pages one by one.")
+
+    return [result if result is not None else analyze_one(contents[index], prompt_suffix)
+            for index, result in enumerate(results)]
@@ -0,0 +1,125 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+# --- Analysis Cache Settings ---
+ANALYSIS_CACHE_FILE = "analysis_cache.json" # Where page analyses are kept between runs
+ANALYSIS_CACHE_TTL_HOURS = 24 # Analyses older than this are redone
+ANALYSIS_CACHE_MAX_ENTRIES = 2000 # Oldest analyses are dropped beyond this
+NEAR_DUPLICATE_DETECTION = False # Also reuse analyses of pages that are "same enough" (SimHash). Off by default: a near-duplicate can differ in exactly the detail a test checks
+SIMHASH_MAX_DISTANCE = 3 # Differing bits (out of 64) for two pages to count as near-duplicates
+SIMHASH_BANDS = SIMHASH_MAX_DISTANCE + 1 # Pigeonhole: near-duplicates share at least one 64/bands-bit band
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def content_hash(content: str, prompt: str) -> str:
+    """Exact-match key: hash of the reduced page content and the prompt it was analysed with."""
+    return hashlib.sha256(f"{prompt}\n\x00\n{content}".encode("utf-8")).hexdigest()
+
+
+def prompt_hash(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16]
+
+
+def simhash(content: str, shingle_size: int = 3) -> int:
+    """64-bit SimHash over word shingles. Similar pages get hashes a few bits apart."""
+    words = WORD_PATTERN.findall(content.lower())
+    shingles = [" ".join(words[i:i + shingle_size]) for i in range(max(1, len(words) - shingle_size + 1))]
+    weights = [0] * 64
+    for shingle in shingles:
+        value = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(64):
+            weights[bit] += 1 if value >> bit & 1 else -1
+    return sum(1 << bit for bit in range(64) if weights[bit] > 0)
+
+
+def _bands(fingerprint: int) -> list[int]:
+    width = 64 // SIMHASH_BANDS
+    mask = (1 << width) - 1
+    return [fingerprint >> (band * width) & mask for band in range(SIMHASH_BANDS)]
+
+
+class AnalysisCache:
+    """
+    Reuses AI analyses across pages whose reduced content is identical, or with
+    near-duplicate detection on, close enough by SimHash. Near-duplicate lookups go
+    through a band index, so they stay cheap on crawls with hundreds of pages.
+    Safe to share between the analysis worker threads.
+    """
+
+    def __init__(self, path: str = ANALYSIS_CACHE_FILE, near_duplicates: bool = NEAR_DUPLICATE_DETECTION):
+        self.path = path
+        self.near_duplicates = near_duplicates
+        self.entries = {} # content hash -> {analysis, prompt, simhash, created}
+        self.band_index = {} # (prompt hash, band number, band value) -> set of content hashes
+        self.lock = threading.Lock()
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.entries = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"WARN: Could not read analysis cache {path}: {e}. Starting with an empty cache.")
+                self.entries = {}
+        expiry = time.time() - ANALYSIS_CACHE_TTL_HOURS * 3600
+        self.entries = {key: entry for key, entry in self.entries.items() if entry.get("created", 0) >= expiry}
+        for key, entry in self.entries.items():
+            self._index(key, entry)
+
+    def _index(self, key: str, entry: dict):
+        for band, value in enumerate(_bands(entry["simhash"])):
+            self.band_index.setdefault((entry["prompt"], band, value), set()).add(key)
+
+    def _unindex(self, key: str, entry: dict):
+        for band, value in enumerate(_bands(entry["simhash"])):
+            self.band_index.get((entry["prompt"], band, value), set()).discard(key)
+
+    def lookup(self, content: str, prompt: str) -> str | None:
+        """Returns a prior analysis of the same (or a near-identical) page under the same prompt."""
+        key = content_hash(content, prompt)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry:
+                print("Reusing AI analysis of an identical page.")
+                return entry["analysis"]
+            if not self.near_duplicates:
+                return None
+            fingerprint = simhash(content)
+            prompt_key = prompt_hash(prompt)
+            candidates = set()
+            for band, value in enumerate(_bands(fingerprint)):
+                candidates |= self.band_index.get((prompt_key, band, value), set())
+            for candidate in candidates:
+                distance = bin(self.entries[candidate]["simhash"] ^ fingerprint).count("1")
+                if distance <= SIMHASH_MAX_DISTANCE:
+                    print(f"Reusing AI analysis of a near-identical page (SimHash distance {distance}).")
+                    return self.entries[candidate]["analysis"]
+        return None
+
+    def store(self, content: str, prompt: str, analysis: str):
+        """Records an analysis and persists the cache."""
+        key = content_hash(content, prompt)
+        entry = {"analysis": analysis, "prompt": prompt_hash(prompt), "simhash": simhash(content), "created": time.time()}
+        with self.lock:
+            self.entries[key] = entry
+            self._index(key, entry)
+            if len(self.entries) > ANALYSIS_CACHE_MAX_ENTRIES:
+                oldest = sorted(self.entries, key=lambda k: self.entries[k]["created"])
+                for old_key in oldest[:len(self.entries) - ANALYSIS_CACHE_MAX_ENTRIES]:
+                    self._unindex(old_key, self.entries.pop(old_key))
+            self.save()
+
+    def save(self):
+        """Writes the cache to disk atomically. Call with the lock held."""
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"WARN: Could not write analysis cache {self.path}: {e}")
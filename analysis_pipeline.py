@@ -0,0 +1,178 @@
+import asyncio
+import concurrent.futures
+import threading
+
+# --- Analysis Pipeline Settings ---
+ANALYSIS_WORKERS = 3 # Concurrent AI analysis calls
+ANALYSIS_QUEUE_SIZE = 10 # Snapshots waiting for analysis before the crawler is made to wait
+ANALYSIS_FAILED_PREFIX = "AI analysis failed" # How analysis errors read in the report
+
+
+class AnalysisPipeline:
+    """
+    Bounded queue of page snapshots consumed by a pool of async analysis workers,
+    so the crawler can move on while Gemini is still thinking about earlier pages.
+
+    `submit()` returns a future for the analysis text. Crawlers put that future into
+    their report where the analysis belongs and resolve it when writing the report,
+    which keeps every analysis attached to its page and in crawl order.
+
+    With `analyze_batch` and a batch_size above 1, a worker drains up to batch_size
+    waiting snapshots (lingering up to batch_wait seconds) and analyses those that
+    share a prompt in a single call.
+    """
+
+    def __init__(self, analyze, workers: int = ANALYSIS_WORKERS, queue_size: int = ANALYSIS_QUEUE_SIZE,
+                 analyze_batch=None, batch_size: int = 1, batch_wait: float = 0.0):
+        self.analyze = analyze # analyze(content, prompt) -> str, sync or async
+        self.analyze_batch = analyze_batch # analyze_batch(contents, prompt) -> list[str], sync or async
+        self.batch_size = max(1, batch_size) if analyze_batch else 1
+        self.batch_wait = batch_wait
+        self.worker_count = max(1, workers)
+        self.queue = asyncio.Queue(maxsize=max(1, queue_size))
+        self.workers = []
+
+    async def start(self):
+        self.workers = [asyncio.create_task(self._worker()) for _ in range(self.worker_count)]
+
+    async def _call(self, function, *args):
+        if asyncio.iscoroutinefunction(function):
+            return await function(*args)
+        return await asyncio.to_thread(function, *args)
+
+    async def _next_batch(self) -> list:
+        """Takes one snapshot, plus whatever else arrives within batch_wait, up to batch_size."""
+        items = [await self.queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.batch_wait
+        while len(items) < self.batch_size:
+            try:
+                items.append(self.queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                break
+            try:
+                items.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return items
+
+    async def _worker(self):
+        while True:
+            items = await self._next_batch()
+            try:
+                groups = {}
+                for item in items:
+                    groups.setdefault(item[2], []).append(item) # Only snapshots with the same prompt share a request
+                for prompt, group in groups.items():
+                    futures = [future for future, _, _ in group]
+                    try:
+                        if len(group) == 1:
+                            results = [await self._call(self.analyze, group[0][1], prompt)]
+                        else:
+                            results = await self._call(self.analyze_batch, [content for _, content, _ in group], prompt)
+                            if len(results) != len(group):
+                                raise ValueError(f"Batch analysis returned {len(results)} results for {len(group)} pages")
+                        for future, result in zip(futures, results):
+                            if not future.done():
+                                future.set_result(result)
+                    except Exception as e:
+                        for future in futures:
+                            if not future.done():
+                                future.set_exception(e)
+            finally:
+                for _ in items:
+                    self.queue.task_done()
+
+    async def submit(self, content: str, prompt: str) -> asyncio.Future:
+        """Queues a snapshot for analysis, waiting for room if the queue is full."""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((future, content, prompt))
+        return future
+
+    async def close(self):
+        """Waits for every queued snapshot to be analysed, then stops the workers."""
+        await self.queue.join()
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+
+
+class BackgroundAnalysisPipeline:
+    """
+    Runs an AnalysisPipeline on its own event loop thread so synchronous crawlers
+    (the Selenium scripts) can feed it. `submit()` blocks only while the queue is
+    full and returns a concurrent.futures.Future.
+    """
+
+    def __init__(self, analyze, workers: int = ANALYSIS_WORKERS, queue_size: int = ANALYSIS_QUEUE_SIZE, **batching):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.pipeline = self._call(self._create(analyze, workers, queue_size, batching))
+
+    async def _create(self, analyze, workers, queue_size, batching):
+        # The queue must be created on the loop that will use it
+        pipeline = AnalysisPipeline(analyze, workers, queue_size, **batching)
+        await pipeline.start()
+        return pipeline
+
+    def _call(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def submit(self, content: str, prompt: str) -> concurrent.futures.Future:
+        future = self._call(self.pipeline.submit(content, prompt))
+        return asyncio.run_coroutine_threadsafe(self._wait(future), self.loop)
+
+    @staticmethod
+    async def _wait(future):
+        return await future
+
+    def close(self):
+        self._call(self.pipeline.close())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+
+def _analysis_failed(e: Exception) -> str:
+    return f"{ANALYSIS_FAILED_PREFIX}: {e}. This might be due to API issues, rate limits, or content too large."
+
+
+async def resolve_report_lines(lines: list) -> list[str]:
+    """Replaces pending analysis futures in a report with their text."""
+    resolved = []
+    for line in lines:
+        if isinstance(line, asyncio.Future):
+            try:
+                line = await line
+            except Exception as e:
+                line = _analysis_failed(e)
+        resolved.append(line)
+    return resolved
+
+
+def report_lines_ready(lines: list) -> bool:
+    """True once every analysis future in a report has finished (resolving it won't block)."""
+    return all(line.done() for line in lines if isinstance(line, (asyncio.Future, concurrent.futures.Future)))
+
+
+def analysis_succeeded(future) -> bool:
+    """True if an analysis future (asyncio or concurrent) has finished with an analysis rather than an error."""
+    if not future.done() or future.cancelled() or future.exception() is not None:
+        return False
+    return not str(future.result()).startswith(ANALYSIS_FAILED_PREFIX)
+
+
+def resolve_report_lines_sync(lines: list) -> list[str]:
+    """Blocking counterpart of resolve_report_lines for BackgroundAnalysisPipeline futures."""
+    resolved = []
+    for line in lines:
+        if isinstance(line, concurrent.futures.Future):
+            try:
+                line = line.result()
+            except Exception as e:
+                line = _analysis_failed(e)
+        resolved.append(line)
+    return resolved
@@ -0,0 +1,145 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+from playwright.async_api import async_playwright
+
+from execution_profiles import ExecutionProfile, get_execution_profile
+
+try:
+    import psutil
+except ImportError:
+    psutil = None # Memory-based recycling is skipped without it
+
+# --- Browser Pool Settings ---
+POOL_SIZE = 1 # Browsers kept running; concurrent tasks share them through separate contexts
+MAX_TASKS_PER_BROWSER = 50 # A browser is replaced after serving this many tasks
+MAX_BROWSER_MEMORY_MB = 2048 # Per browser; above this (all Chromium processes together) the busiest one is replaced. Needs psutil
+SHUTDOWN_TIMEOUT = 30 # Seconds close() waits for running tasks before closing browsers under them
+BROWSER_PROCESS_NAMES = ("chrome", "chromium", "headless_shell")
+
+
+def browser_memory_mb() -> float | None:
+    """Resident memory of every Chromium process started from this Python process, or None if it can't be measured."""
+    if psutil is None:
+        return None
+    total = 0
+    try:
+        for child in psutil.Process().children(recursive=True):
+            try:
+                if any(name in child.name().lower() for name in BROWSER_PROCESS_NAMES):
+                    total += child.memory_info().rss
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+    except psutil.Error:
+        return None
+    return total / (1024 * 1024)
+
+
+class PooledBrowser:
+    def __init__(self, browser):
+        self.browser = browser
+        self.active = 0 # Contexts currently handed out
+        self.tasks_served = 0
+        self.retiring = False # No new tasks; closed once the running ones finish
+
+
+class BrowserPool:
+    """
+    Keeps launched browsers alive between tasks so only the first task pays for the
+    launch. Every task still gets a fresh context, so cookies, storage and pages are
+    never shared between tasks. Browsers are launched, and contexts created, with the
+    execution profile's settings (the configured profile by default). Browsers are
+    replaced after max_tasks tasks, when memory grows past max_memory_mb each, or when
+    they disconnect.
+    """
+
+    def __init__(self, size: int = POOL_SIZE, profile: ExecutionProfile = None,
+                 max_tasks: int = MAX_TASKS_PER_BROWSER, max_memory_mb: float = MAX_BROWSER_MEMORY_MB):
+        self.size = max(1, size)
+        self.profile = profile or get_execution_profile()
+        self.max_tasks = max_tasks
+        self.max_memory_mb = max_memory_mb
+        self._playwright = None
+        self._browsers = []
+        self._lock = asyncio.Lock()
+        self._closed = False
+
+    async def _launch(self) -> PooledBrowser:
+        if self._playwright is None:
+            self._playwright = await async_playwright().start()
+        browser = await self._playwright.chromium.launch(**self.profile.launch_options())
+        entry = PooledBrowser(browser)
+        self._browsers.append(entry)
+        return entry
+
+    async def _acquire(self) -> PooledBrowser:
+        async with self._lock:
+            if self._closed:
+                raise RuntimeError("Browser pool is closed.")
+            for entry in self._browsers:
+                if not entry.browser.is_connected():
+                    entry.retiring = True
+            await self._close_retired()
+            # A browser that has already been promised max_tasks tasks takes no more
+            usable = [entry for entry in self._browsers if not entry.retiring and entry.tasks_served + entry.active < self.max_tasks]
+            entry = await self._launch() if len(usable) < self.size else min(usable, key=lambda e: e.active)
+            entry.active += 1
+            return entry
+
+    async def _release(self, entry: PooledBrowser):
+        entry.active -= 1
+        entry.tasks_served += 1
+        if entry.tasks_served >= self.max_tasks and not entry.retiring:
+            print(f"Recycling browser after {entry.tasks_served} tasks.")
+            entry.retiring = True
+        self._check_memory()
+        await self._close_retired()
+
+    def _check_memory(self):
+        live = [entry for entry in self._browsers if not entry.retiring]
+        if not self.max_memory_mb or not live:
+            return
+        used = browser_memory_mb()
+        if used is not None and used > self.max_memory_mb * len(self._browsers):
+            busiest = max(live, key=lambda entry: entry.tasks_served)
+            print(f"Browser memory at {used:.0f} MB; recycling the browser that has served {busiest.tasks_served} tasks.")
+            busiest.retiring = True
+
+    async def _close_retired(self):
+        for entry in [entry for entry in self._browsers if entry.retiring and entry.active == 0]:
+            self._browsers.remove(entry)
+            try:
+                await entry.browser.close()
+            except Exception as e:
+                print(f"WARN: Could not close a retired browser cleanly: {e}")
+
+    @asynccontextmanager
+    async def context(self, **context_options):
+        """Yields a fresh context on a warm browser and closes it when the task is done. Options override the profile's."""
+        entry = await self._acquire()
+        context = None
+        try:
+            context = await entry.browser.new_context(**{**self.profile.context_options(), **context_options})
+            yield context
+        finally:
+            if context is not None:
+                try:
+                    await context.close()
+                except Exception:
+                    pass # The browser went away with it; it's retired on the next acquire
+            await self._release(entry)
+
+    async def close(self, timeout: float = SHUTDOWN_TIMEOUT):
+        """Stops handing out contexts, gives running tasks up to timeout seconds to finish, then closes every browser."""
+        self._closed = True
+        deadline = time.monotonic() + timeout
+        while any(entry.active for entry in self._browsers) and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        for entry in self._browsers:
+            entry.retiring = True
+            entry.active = 0
+        await self._close_retired()
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
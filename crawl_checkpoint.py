@@ -0,0 +1,86 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+# --- Crawl Checkpoint Settings ---
+CHECKPOINT_DIR = "crawl_checkpoints" # One SQLite file per crawl (script, start URL and prompt)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS queued (seq INTEGER PRIMARY KEY AUTOINCREMENT, url TEXT UNIQUE NOT NULL, priority INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS pages (page_number INTEGER PRIMARY KEY, url TEXT NOT NULL, lines TEXT NOT NULL, completed REAL NOT NULL);
+"""
+
+
+class CrawlCheckpoint:
+    """
+    SQLite record of a crawl in progress: every URL that was queued, and the finished
+    report lines of every completed page. On resume, completed pages are restored
+    as-is (no new fetch, no new AI analysis) and every other queued URL is crawled,
+    so a crash only costs the pages that were in flight.
+
+    Queued URLs are written into an open transaction that is committed with the next
+    completed page, so a page's discovered links are never durable later than the page.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL") # Commits stay cheap; one per completed page
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+
+    @classmethod
+    def for_crawl(cls, name: str, start_url: str, *prompts: str, directory: str = CHECKPOINT_DIR):
+        """Checkpoint file of this script's crawl of start_url with these prompts."""
+        digest = hashlib.sha256("\n".join((start_url,) + prompts).encode("utf-8")).hexdigest()[:16]
+        return cls(os.path.join(directory, f"{name}_{digest}.sqlite"))
+
+    def _meta(self, key: str) -> str | None:
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def reset(self):
+        self.db.execute("DELETE FROM meta")
+        self.db.execute("DELETE FROM queued")
+        self.db.execute("DELETE FROM pages")
+        self.db.commit()
+
+    def restore(self, frontier) -> list[tuple[int, str, list[str]]]:
+        """
+        Loads an unfinished crawl into the frontier and returns its completed pages as
+        (page_number, url, report_lines). A finished crawl is cleared, so it runs again from scratch.
+        """
+        if self._meta("status") == "finished":
+            self.reset()
+        pages = [(number, url, json.loads(lines))
+                 for number, url, lines in self.db.execute("SELECT page_number, url, lines FROM pages ORDER BY page_number")]
+        for _, url, _ in pages:
+            frontier.mark_visited(url)
+        queued = 0
+        for url, priority in self.db.execute("SELECT url, priority FROM queued ORDER BY seq"):
+            queued += frontier.add(url, priority)
+        if pages or queued:
+            print(f"Resuming crawl from checkpoint {self.path}: {len(pages)} pages done, {queued} URLs still to visit.")
+        self.db.execute("INSERT OR REPLACE INTO meta VALUES ('status', 'running')")
+        return pages
+
+    def record_queued(self, url: str, priority: int = 0):
+        self.db.execute("INSERT OR IGNORE INTO queued (url, priority) VALUES (?, ?)", (url, priority))
+
+    def record_page(self, page_number: int, url: str, lines: list[str]):
+        """Saves a completed page's (resolved) report lines and commits everything queued so far."""
+        self.db.execute("INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?)", (page_number, url, json.dumps(lines), time.time()))
+        self.db.commit()
+
+    def finish(self):
+        """Marks the crawl as done, so the next run starts over instead of resuming."""
+        self.db.execute("INSERT OR REPLACE INTO meta VALUES ('status', 'finished')")
+        self.db.commit()
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
@@ -0,0 +1,117 @@
+import asyncio
+
+from crawl_frontier import CrawlFrontier, DEFAULT_PRIORITY
+from url_canonicalizer import clean_url
+from analysis_pipeline import resolve_report_lines
+
+# --- Crawl Engine Settings ---
+CRAWL_CONCURRENCY = 4 # Number of pages crawled in parallel inside one shared browser
+
+
+class CrawlEngine:
+    """
+    Crawls a site with a bounded pool of Playwright pages that share one browser context.
+
+    `visit_page(page, url, page_number, engine)` is awaited for every URL taken off the
+    frontier and returns the report lines for that page. It discovers new links by calling
+    `engine.add_url(...)`. Results are returned ordered by page number, so the report reads
+    the same way as the old sequential crawl even though pages finish out of order.
+
+    With a CrawlCheckpoint, an interrupted crawl picks up where it stopped: completed
+    pages come back from the checkpoint and count towards max_pages, and every queued
+    URL and finished page (once its analyses resolve) is written to it as the crawl goes.
+    """
+
+    def __init__(self, context, visit_page, max_pages: int, concurrency: int = CRAWL_CONCURRENCY,
+                 allow_url=None, normalize_url=clean_url, checkpoint=None):
+        self.context = context
+        self.visit_page = visit_page
+        self.max_pages = max_pages
+        self.concurrency = max(1, concurrency)
+        self.allow_url = allow_url or (lambda url: True)
+        self.normalize_url = normalize_url
+
+        self.frontier = CrawlFrontier(normalize_url=normalize_url)
+        self.skipped_urls = {} # Filtered URLs in discovery order (dict keys, so membership is O(1))
+        self.page_count = 0
+        self.results = []
+
+        self._active_pages = 0
+        self._wakeup = asyncio.Event()
+
+        self.checkpoint = checkpoint
+        self._checkpoint_writes = []
+        if checkpoint:
+            self.results = checkpoint.restore(self.frontier)
+            self.page_count = max((page_number for page_number, _, _ in self.results), default=0)
+
+    @property
+    def visited_urls(self) -> set:
+        return self.frontier.visited
+
+    @property
+    def trapped_urls(self) -> dict:
+        return self.frontier.trapped
+
+    def add_url(self, url: str, priority: int = DEFAULT_PRIORITY) -> bool:
+        """Queues a URL for crawling unless it is filtered, a likely trap, already visited or already queued (lower priority goes first)."""
+        url = self.normalize_url(url)
+        if url in self.frontier:
+            return False
+        if not self.allow_url(url):
+            self.skipped_urls[url] = None
+            return False
+        if not self.frontier.add(url, priority):
+            return False
+        if self.checkpoint:
+            self.checkpoint.record_queued(url, priority)
+        self._wakeup.set()
+        return True
+
+    async def _next_url(self):
+        """Claims the next URL to visit, waiting while other workers may still discover more."""
+        while True:
+            if self.page_count >= self.max_pages:
+                return None
+            url = self.frontier.pop()
+            if url is not None:
+                self.page_count += 1
+                self._active_pages += 1
+                return url, self.page_count
+            if self._active_pages == 0:
+                return None # Nothing queued and nobody left who could queue more
+            self._wakeup.clear()
+            await self._wakeup.wait()
+
+    async def _worker(self):
+        page = await self.context.new_page()
+        try:
+            while True:
+                claimed = await self._next_url()
+                if claimed is None:
+                    break
+                url, page_number = claimed
+                try:
+                    lines = await self.visit_page(page, url, page_number, self)
+                except Exception as e:
+                    lines = [f"\n--- Testing Page {page_number}: {url} ---",
+                             f"ERROR: An unexpected error occurred while testing {url}: {e}"]
+                finally:
+                    self._active_pages -= 1
+                    self._wakeup.set()
+                self.results.append((page_number, url, lines))
+                if self.checkpoint:
+                    self._checkpoint_writes.append(asyncio.create_task(self._record_page(page_number, url, lines)))
+        finally:
+            self._wakeup.set()
+            await page.close()
+
+    async def _record_page(self, page_number: int, url: str, lines: list):
+        """Checkpoints a page once its pending analyses have resolved; the crawl doesn't wait for them."""
+        self.checkpoint.record_page(page_number, url, await resolve_report_lines(lines))
+
+    async def run(self) -> list[tuple[int, str, list[str]]]:
+        """Crawls until the frontier is exhausted or max_pages is reached; returns (page_number, url, report_lines)."""
+        await asyncio.gather(*(self._worker() for _ in range(self.concurrency)))
+        await asyncio.gather(*self._checkpoint_writes)
+        return sorted(self.results, key=lambda result: result[0])
@@ -0,0 +1,83 @@
+import heapq
+import itertools
+from urllib.parse import urlparse
+
+from url_canonicalizer import clean_url, canonical_key
+from crawl_traps import TrapDetector
+
+# --- Crawl Frontier Settings ---
+DEFAULT_PRIORITY = 0 # Lower numbers are crawled first
+
+
+class CrawlFrontier:
+    """
+    URLs waiting to be crawled plus every URL ever queued or visited, so "have we
+    seen this?" is a set lookup however large the crawl gets.
+
+    pop() returns the lowest priority first. Within a priority, hosts take turns,
+    so one link-heavy host can't starve the others, and each host's URLs come out
+    in the order they were added (plain breadth-first order on single-host crawls).
+
+    Duplicates are recognised by canonical URL (see url_canonicalizer.py), but URLs
+    are stored and handed out as they were found, so the crawler fetches real URLs.
+    Ones that look like crawler traps are refused and kept in `trapped` instead.
+    """
+
+    def __init__(self, normalize_url=clean_url, key=canonical_key, detect_traps: bool = True):
+        self.normalize_url = normalize_url # Applied to URLs before they are stored
+        self.key = key
+        self.trap_detector = TrapDetector() if detect_traps else None
+        self.trapped = {} # URL -> why it looks like a crawler trap
+        self.visited = set() # Keys of URLs handed out by pop() or marked visited
+        self._seen = set() # Keys of every URL queued or visited
+        self._heap = [] # (priority, host turn, insertion order, url, key)
+        self._pending = set() # Keys of URLs queued and not yet popped or marked visited
+        self._host_turns = {} # (priority, host) -> turn of that host's next URL
+        self._turn_floor = {} # priority -> turn of the last URL popped; newly seen hosts start here
+        self._order = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def __contains__(self, url: str) -> bool:
+        return self.key(self.normalize_url(url)) in self._seen
+
+    def add(self, url: str, priority: int = DEFAULT_PRIORITY) -> bool:
+        """Queues a URL unless it was already queued or visited or looks like a trap; returns whether it was queued."""
+        url = self.normalize_url(url)
+        key = self.key(url)
+        if key in self._seen:
+            return False
+        self._seen.add(key)
+        reason = self.trap_detector.check(key) if self.trap_detector else None # Canonical, so tracking parameters don't count
+        if reason:
+            self.trapped[url] = reason
+            return False
+        host = urlparse(key).netloc
+        turn = max(self._host_turns.get((priority, host), 0), self._turn_floor.get(priority, 0))
+        self._host_turns[(priority, host)] = turn + 1
+        heapq.heappush(self._heap, (priority, turn, next(self._order), url, key))
+        self._pending.add(key)
+        return True
+
+    def pop(self) -> str | None:
+        """Takes the next URL and marks it visited; None once nothing is queued."""
+        while self._heap:
+            priority, turn, _, url, key = heapq.heappop(self._heap)
+            if key in self.visited:
+                continue # Marked visited while it was waiting
+            self._turn_floor[priority] = turn
+            self.visited.add(key)
+            self._pending.discard(key)
+            return url
+        return None
+
+    def mark_visited(self, url: str) -> bool:
+        """Records a URL reached some other way (e.g. a redirect) so it is never queued; False if it already was visited."""
+        key = self.key(self.normalize_url(url))
+        if key in self.visited:
+            return False
+        self._pending.discard(key) # If it is still queued, pop() skips the entry
+        self._seen.add(key)
+        self.visited.add(key)
+        return True
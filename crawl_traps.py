@@ -0,0 +1,70 @@
+import re
+from collections import Counter
+from urllib.parse import urlparse, parse_qsl
+
+# --- Crawler Trap Settings ---
+MAX_URL_LENGTH = 512
+MAX_PATH_DEPTH = 10 # Path segments
+MAX_SEGMENT_REPEATS = 2 # The same segment more often than this is a relative-link loop (/a/b/a/b/a/b)
+MAX_QUERY_PARAMS = 4 # More (canonical) parameters than this is a faceted filter combination
+MAX_URLS_PER_SHAPE = 100 # Distinct URLs sharing one shape (numbers and query values blanked), e.g. /catalogue/page-N.html
+MAX_CALENDAR_URLS_PER_SHAPE = 12 # The same for calendar/date navigation, which never runs out of next months
+
+CALENDAR_QUERY_KEYS = {"year", "month", "day", "date", "week", "cal", "calendar"}
+CALENDAR_PATH_RE = re.compile(r"(?:^|/)(?:calendar|(?:19|20)\d{2}[/-](?:0?[1-9]|1[0-2]))(?:$|[/.-])", re.IGNORECASE)
+NUMBER_RE = re.compile(r"\d+")
+
+
+def url_shape(url: str) -> str:
+    """Host, path with every number replaced by N, and the sorted query parameter names (values blanked)."""
+    parts = urlparse(url)
+    keys = sorted({key for key, _ in parse_qsl(parts.query, keep_blank_values=True)})
+    return f"{parts.netloc}{NUMBER_RE.sub('N', parts.path)}" + (f"?{'&'.join(keys)}" if keys else "")
+
+
+def looks_like_calendar(url: str) -> bool:
+    parts = urlparse(url)
+    if CALENDAR_PATH_RE.search(parts.path):
+        return True
+    return any(key.lower() in CALENDAR_QUERY_KEYS for key, _ in parse_qsl(parts.query, keep_blank_values=True))
+
+
+class TrapDetector:
+    """
+    Flags URLs that would keep a crawl busy without finding new content: endlessly
+    long or deep paths, relative-link loops, filter combinations, and pages that
+    differ only by a number (calendars, endless pagination) once a shape has been
+    seen more than its cap. Pass canonical URLs, so tracking parameters don't
+    count as new query parameters.
+    """
+
+    def __init__(self, max_url_length: int = MAX_URL_LENGTH, max_path_depth: int = MAX_PATH_DEPTH,
+                 max_segment_repeats: int = MAX_SEGMENT_REPEATS, max_query_params: int = MAX_QUERY_PARAMS,
+                 max_urls_per_shape: int = MAX_URLS_PER_SHAPE, max_calendar_urls: int = MAX_CALENDAR_URLS_PER_SHAPE):
+        self.max_url_length = max_url_length
+        self.max_path_depth = max_path_depth
+        self.max_segment_repeats = max_segment_repeats
+        self.max_query_params = max_query_params
+        self.max_urls_per_shape = max_urls_per_shape
+        self.max_calendar_urls = max_calendar_urls
+        self.shape_counts = Counter()
+
+    def check(self, url: str) -> str | None:
+        """Returns why the URL looks like a trap, or None (and counts it towards its shape)."""
+        if len(url) > self.max_url_length:
+            return f"URL longer than {self.max_url_length} characters"
+        parts = urlparse(url)
+        segments = [segment for segment in parts.path.split("/") if segment]
+        if len(segments) > self.max_path_depth:
+            return f"path deeper than {self.max_path_depth} segments"
+        if segments and max(Counter(segments).values()) > self.max_segment_repeats:
+            return "repeating path segments"
+        if len(parse_qsl(parts.query, keep_blank_values=True)) > self.max_query_params:
+            return f"more than {self.max_query_params} query parameters"
+        shape = url_shape(url)
+        calendar = looks_like_calendar(url)
+        limit = self.max_calendar_urls if calendar else self.max_urls_per_shape
+        if self.shape_counts[shape] >= limit:
+            return f"more than {limit} {'calendar ' if calendar else ''}URLs shaped like {shape}"
+        self.shape_counts[shape] += 1
+        return None
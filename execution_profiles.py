@@ -0,0 +1,113 @@
+import os
+
+# --- Execution Profile Settings ---
+# Chromium switches every headless profile gets: no first-run UI, no background
+# services phoning home, and /tmp instead of the (often tiny) /dev/shm in containers.
+HEADLESS_BASE_ARGS = [
+    "--no-first-run",
+    "--no-default-browser-check",
+    "--disable-dev-shm-usage",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-extensions",
+    "--disable-sync",
+    "--metrics-recording-only",
+    "--mute-audio",
+]
+
+# Named profiles. "args" are extra Chromium switches, "disabled_features" are joined
+# into --disable-features, "disk_cache_mb" of None keeps Chromium's default cache.
+EXECUTION_PROFILES = {
+    # Visible browser for watching (and helping) a run; no sandbox, like Playwright's default launch
+    "interactive": {
+        "headless": False, "viewport": {"width": 1280, "height": 800}, "args": [],
+        "disabled_features": [], "disk_cache_mb": None, "sandbox": False, "block_service_workers": False,
+    },
+    # CI boxes: headless, no GPU, no sandbox (containers usually lack the privileges for it)
+    "ci-fast": {
+        "headless": True, "viewport": {"width": 1280, "height": 800},
+        "args": HEADLESS_BASE_ARGS + ["--disable-gpu", "--disable-renderer-backgrounding", "--disable-background-timer-throttling"],
+        "disabled_features": ["Translate", "MediaRouter", "OptimizationHints", "AutofillServerCommunication"],
+        "disk_cache_mb": 100, "sandbox": False, "block_service_workers": True,
+    },
+    # Small VMs: fewer renderer processes, capped V8 heap, no disk cache, smaller viewport
+    "low-memory": {
+        "headless": True, "viewport": {"width": 1024, "height": 768},
+        "args": HEADLESS_BASE_ARGS + ["--disable-gpu", "--renderer-process-limit=2", "--js-flags=--max-old-space-size=256"],
+        "disabled_features": ["Translate", "MediaRouter", "OptimizationHints", "AutofillServerCommunication", "BackForwardCache", "site-per-process"],
+        "disk_cache_mb": 0, "sandbox": False, "block_service_workers": True,
+    },
+}
+DEFAULT_EXECUTION_PROFILE = "interactive"
+
+
+def configured_profile_name(default: str = DEFAULT_EXECUTION_PROFILE) -> str:
+    """The EXECUTION_PROFILE environment variable if set, else default (lets CI switch profiles without code edits)."""
+    name = os.getenv("EXECUTION_PROFILE") or default
+    if default == "interactive" and EXECUTION_PROFILES.get(name, {}).get("headless"):
+        print(f"WARN: EXECUTION_PROFILE={name} makes this run headless; nobody will see the browser if it asks for help.")
+    return name
+
+
+class ExecutionProfile:
+    """Launch and context settings for one kind of run, for both Playwright and Selenium."""
+
+    def __init__(self, name: str, headless: bool, viewport: dict, args=(), disabled_features=(),
+                 disk_cache_mb: int | None = None, sandbox: bool = False, block_service_workers: bool = False):
+        self.name = name
+        self.headless = headless
+        self.viewport = dict(viewport)
+        self.args = list(args)
+        self.disabled_features = list(disabled_features)
+        self.disk_cache_mb = disk_cache_mb
+        self.sandbox = sandbox
+        self.block_service_workers = block_service_workers
+
+    @classmethod
+    def from_name(cls, name: str):
+        if name not in EXECUTION_PROFILES:
+            print(f"WARN: Unknown execution profile '{name}'; using '{DEFAULT_EXECUTION_PROFILE}'.")
+            name = DEFAULT_EXECUTION_PROFILE
+        return cls(name, **EXECUTION_PROFILES[name])
+
+    def chromium_args(self) -> list[str]:
+        args = list(self.args)
+        if self.disabled_features:
+            args.append(f"--disable-features={','.join(self.disabled_features)}")
+        if self.disk_cache_mb is not None:
+            args.append(f"--disk-cache-size={max(1, self.disk_cache_mb * 1024 * 1024)}") # 1 byte effectively disables it
+        return args
+
+    def launch_options(self) -> dict:
+        """Keyword arguments for Playwright's chromium.launch()."""
+        return {"headless": self.headless, "args": self.chromium_args(), "chromium_sandbox": self.sandbox}
+
+    def context_options(self) -> dict:
+        """Keyword arguments for Playwright's browser.new_context()."""
+        options = {"viewport": dict(self.viewport)}
+        if self.block_service_workers:
+            options["service_workers"] = "block" # They cache aggressively and keep pages from going idle
+        return options
+
+    def apply_to_chrome_options(self, options):
+        """Configures Selenium ChromeOptions the same way."""
+        if self.headless:
+            options.add_argument("--headless=new")
+            options.add_argument(f"--window-size={self.viewport['width']},{self.viewport['height']}")
+        else:
+            options.add_argument("--start-maximized")
+        if not self.sandbox:
+            options.add_argument("--no-sandbox")
+        for arg in self.chromium_args():
+            options.add_argument(arg)
+        return options
+
+    def summary(self) -> str:
+        mode = "headless" if self.headless else "headed"
+        return f"{self.name} ({mode}, {self.viewport['width']}x{self.viewport['height']})"
+
+
+def get_execution_profile(name: str = None) -> ExecutionProfile:
+    """Builds the named profile, or the configured one (EXECUTION_PROFILE env var, then the default)."""
+    return ExecutionProfile.from_name(name or configured_profile_name())
@@ -0,0 +1,162 @@
+import asyncio
+import os
+import random
+import threading
+import time
+
+import google.generativeai as genai
+
+# --- Gemini Quota Settings (override with environment variables) ---
+GEMINI_REQUESTS_PER_MINUTE = int(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "15"))
+GEMINI_TOKENS_PER_MINUTE = int(os.getenv("GEMINI_TOKENS_PER_MINUTE", "1000000"))
+
+# --- Retry and Circuit Breaker Settings ---
+GEMINI_MAX_RETRIES = 5 # Retries on 429/5xx before giving up on a call
+GEMINI_BACKOFF_BASE = 1.0 # Seconds; doubled on every retry, with full jitter
+GEMINI_BACKOFF_MAX = 60.0
+CIRCUIT_BREAKER_THRESHOLD = 5 # Consecutive failed calls before Gemini is considered down
+CIRCUIT_BREAKER_COOLDOWN = 60.0 # Seconds to stop calling Gemini once the breaker opens
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+CHARS_PER_TOKEN = 4 # Rough estimate used to charge the tokens-per-minute bucket
+
+
+class GeminiUnavailableError(Exception):
+    """Raised instead of calling Gemini while the circuit breaker is open."""
+
+
+class TokenBucket:
+    """Thread-safe token bucket. The balance may go negative; callers wait until it refills."""
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        """Takes `amount` tokens and returns how many seconds the caller must wait before using them."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_per_second)
+            self.updated = now
+            self.tokens -= min(amount, self.capacity) # A single oversized request can't wait forever
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.refill_per_second
+
+
+class CircuitBreaker:
+    """Stops calls for a cooldown period after too many consecutive failures."""
+
+    def __init__(self, threshold: int = CIRCUIT_BREAKER_THRESHOLD, cooldown: float = CIRCUIT_BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.open_until = 0.0
+        self.lock = threading.Lock()
+
+    def check(self):
+        with self.lock:
+            remaining = self.open_until - time.monotonic()
+        if remaining > 0:
+            raise GeminiUnavailableError(f"Gemini circuit breaker is open after repeated failures; retrying in {remaining:.0f}s")
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                self.open_until = time.monotonic() + self.cooldown
+                self.failures = 0
+                print(f"WARN: Gemini failed {self.threshold} times in a row; pausing calls for {self.cooldown:.0f}s.")
+
+
+# Quota is per API key, so every client in the process shares the same buckets and breaker
+request_bucket = TokenBucket(GEMINI_REQUESTS_PER_MINUTE, GEMINI_REQUESTS_PER_MINUTE / 60)
+token_bucket = TokenBucket(GEMINI_TOKENS_PER_MINUTE, GEMINI_TOKENS_PER_MINUTE / 60)
+circuit_breaker = CircuitBreaker()
+
+
+def is_retryable(error: Exception) -> bool:
+    """True for rate-limit (429) and server-side (5xx) errors."""
+    code = getattr(error, "code", None)
+    if isinstance(code, int) and code in RETRYABLE_STATUS_CODES:
+        return True
+    return type(error).__name__ in ("ResourceExhausted", "TooManyRequests", "ServiceUnavailable",
+                                    "InternalServerError", "DeadlineExceeded", "BadGateway")
+
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff for the given retry attempt (0-based)."""
+    return random.uniform(0, min(GEMINI_BACKOFF_MAX, GEMINI_BACKOFF_BASE * (2 ** attempt)))
+
+
+def estimate_tokens(prompt) -> int:
+    return max(1, len(str(prompt)) // CHARS_PER_TOKEN)
+
+
+class GeminiClient:
+    """
+    Drop-in wrapper around genai.GenerativeModel that rate limits, retries and
+    circuit-breaks every call. Exposes the same generate_content / generate_content_async methods.
+    """
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self.model = genai.GenerativeModel(model_name)
+
+    def _reserve(self, prompt) -> float:
+        return max(request_bucket.reserve(1), token_bucket.reserve(estimate_tokens(prompt)))
+
+    def generate_content(self, prompt, **kwargs):
+        for attempt in range(GEMINI_MAX_RETRIES + 1):
+            circuit_breaker.check()
+            time.sleep(self._reserve(prompt))
+            try:
+                response = self.model.generate_content(prompt, **kwargs)
+                circuit_breaker.record_success()
+                return response
+            except Exception as e:
+                if not is_retryable(e):
+                    raise # Bad requests are the caller's problem, not a sign Gemini is down
+                circuit_breaker.record_failure()
+                if attempt == GEMINI_MAX_RETRIES:
+                    raise
+                delay = backoff_delay(attempt)
+                print(f"Gemini call failed ({e}); retrying in {delay:.1f}s (attempt {attempt + 1}/{GEMINI_MAX_RETRIES})...")
+                time.sleep(delay)
+
+    async def generate_content_async(self, prompt, **kwargs):
+        for attempt in range(GEMINI_MAX_RETRIES + 1):
+            circuit_breaker.check()
+            await asyncio.sleep(self._reserve(prompt))
+            try:
+                response = await self.model.generate_content_async(prompt, **kwargs)
+                circuit_breaker.record_success()
+                return response
+            except Exception as e:
+                if not is_retryable(e):
+                    raise # Bad requests are the caller's problem, not a sign Gemini is down
+                circuit_breaker.record_failure()
+                if attempt == GEMINI_MAX_RETRIES:
+                    raise
+                delay = backoff_delay(attempt)
+                print(f"Gemini call failed ({e}); retrying in {delay:.1f}s (attempt {attempt + 1}/{GEMINI_MAX_RETRIES})...")
+                await asyncio.sleep(delay)
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_gemini_client(model_name: str) -> GeminiClient:
+    """Returns the shared client for a model, creating it on first use."""
+    with _clients_lock:
+        if model_name not in _clients:
+            _clients[model_name] = GeminiClient(model_name)
+        return _clients[model_name]
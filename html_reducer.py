@@ -0,0 +1,185 @@
+import re
+from html.parser import HTMLParser
+
+# --- HTML Reducer Settings ---
+REDUCED_CONTENT_MAX_CHARS = 15000 # Budget for the outline sent to the AI (the outline is far denser than raw HTML)
+MAX_LINK_TEXT_CHARS = 80
+MAX_TEXT_BLOCK_CHARS = 500
+
+# Subtrees that never carry content worth analysing
+SKIP_TAGS = {"script", "style", "noscript", "svg", "template", "iframe", "canvas", "object", "embed"}
+HEADING_TAGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+# Tags that end the current run of text
+BLOCK_TAGS = {"p", "div", "section", "article", "main", "aside", "header", "footer", "nav", "li", "ul", "ol",
+              "table", "tr", "td", "th", "dl", "dt", "dd", "blockquote", "pre", "figure", "figcaption", "br", "hr",
+              "body", "label", "option", "select", "textarea", "button", "form", "a"} | HEADING_TAGS
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param", "source", "track", "wbr"}
+
+PRICE_PATTERN = re.compile(r"(?:[$£€¥₹]\s?\d[\d,]*(?:\.\d{1,2})?|\d[\d,]*(?:\.\d{1,2})?\s?(?:USD|EUR|GBP|INR))")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def _clean(text: str, limit: int = 0) -> str:
+    text = WHITESPACE_PATTERN.sub(" ", text).strip()
+    if limit and len(text) > limit:
+        text = text[:limit].rstrip() + "..."
+    return text
+
+
+class HtmlReducer(HTMLParser):
+    """
+    Streaming HTML-to-outline reducer. Feed it HTML in chunks with `feed()` and read
+    the outline with `outline()`. Script, style, SVG and similar subtrees are dropped
+    as they stream past, so memory stays proportional to the outline, not the page.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.lines = []
+        self.title = ""
+        self._skip_depth = 0
+        self._text = []
+        self._in_title = False
+        self._heading = None
+        self._link = None # [href, text parts]
+        self._button = None
+        self._form_depth = 0
+        self._seen_links = set()
+
+    # --- Parser callbacks ---
+    def handle_starttag(self, tag, attrs):
+        if self._skip_depth:
+            if tag in SKIP_TAGS and tag not in VOID_TAGS:
+                self._skip_depth += 1
+            return
+        if tag in SKIP_TAGS:
+            if tag not in VOID_TAGS:
+                self._skip_depth = 1
+            return
+
+        attrs = dict(attrs)
+        if tag == "title":
+            self._in_title = True
+            return
+        if tag in BLOCK_TAGS:
+            self._flush_text()
+        if tag in HEADING_TAGS:
+            self._heading = (tag, [])
+        elif tag == "a" and attrs.get("href"):
+            self._link = [attrs["href"], []]
+        elif tag == "form":
+            self._form_depth += 1
+            self.lines.append(f"[form] action={attrs.get('action') or '(same page)'} method={(attrs.get('method') or 'get').lower()}")
+        elif tag in ("input", "select", "textarea"):
+            self._add_field(tag, attrs)
+        elif tag == "button":
+            self._button = []
+        elif tag == "img" and attrs.get("alt"):
+            self._text.append(f" [image: {_clean(attrs['alt'], MAX_LINK_TEXT_CHARS)}] ")
+
+    def handle_endtag(self, tag):
+        if self._skip_depth:
+            if tag in SKIP_TAGS:
+                self._skip_depth -= 1
+            return
+        if tag == "title":
+            self._in_title = False
+            return
+        if tag in HEADING_TAGS and self._heading:
+            text = _clean("".join(self._heading[1]), MAX_TEXT_BLOCK_CHARS)
+            if text:
+                self.lines.append(f"{'#' * int(self._heading[0][1])} {text}")
+            self._heading = None
+            return
+        if tag == "a" and self._link:
+            self._add_link(*self._link)
+            self._link = None
+            return
+        if tag == "button" and self._button is not None:
+            text = _clean("".join(self._button), MAX_LINK_TEXT_CHARS)
+            self.lines.append(f"{self._field_indent()}[button] {text or '(no label)'}")
+            self._button = None
+            return
+        if tag == "form" and self._form_depth:
+            self._flush_text()
+            self._form_depth -= 1
+            self.lines.append("[/form]")
+            return
+        if tag in BLOCK_TAGS:
+            self._flush_text()
+
+    def handle_data(self, data):
+        if self._skip_depth:
+            return
+        if self._in_title:
+            self.title += data
+            return
+        if self._link:
+            self._link[1].append(data)
+        if self._heading:
+            self._heading[1].append(data) # Linked headings show up both as heading and as link
+        elif self._button is not None:
+            self._button.append(data)
+        elif not self._link:
+            self._text.append(data)
+
+    # --- Outline building ---
+    def _field_indent(self) -> str:
+        return "  " if self._form_depth else ""
+
+    def _add_link(self, href: str, parts: list):
+        text = _clean("".join(parts), MAX_LINK_TEXT_CHARS)
+        if href.startswith(("javascript:", "#")) and not text:
+            return
+        if (href, text) in self._seen_links:
+            return # Menus and footers repeat the same links on every page
+        self._seen_links.add((href, text))
+        self.lines.append(f"[link] {text or '(no text)'} -> {href}")
+
+    def _add_field(self, tag: str, attrs: dict):
+        field_type = (attrs.get("type") or "text").lower() if tag == "input" else tag # Valueless attributes (<input type>) come through as None
+        if field_type == "hidden":
+            return
+        if field_type in ("submit", "button", "reset", "image"):
+            self.lines.append(f"{self._field_indent()}[button] {_clean(attrs.get('value') or attrs.get('alt') or field_type, MAX_LINK_TEXT_CHARS)}")
+            return
+        details = [f"{key}={_clean(attrs[key], MAX_LINK_TEXT_CHARS)}" for key in ("name", "id", "placeholder", "aria-label") if attrs.get(key)]
+        if "required" in attrs:
+            details.append("required")
+        self.lines.append(f"{self._field_indent()}[field] {field_type} {' '.join(details)}".rstrip())
+
+    def _flush_text(self):
+        text = _clean("".join(self._text), MAX_TEXT_BLOCK_CHARS)
+        self._text = []
+        if not text:
+            return
+        prices = PRICE_PATTERN.findall(text)
+        if prices and len(text) <= MAX_LINK_TEXT_CHARS:
+            self.lines.append(f"{self._field_indent()}[price] {text}")
+        else:
+            self.lines.append(f"{self._field_indent()}{text}")
+
+    def outline(self, max_chars: int = REDUCED_CONTENT_MAX_CHARS) -> str:
+        """Returns the outline so far, cut at max_chars on a line boundary."""
+        self._flush_text()
+        lines = [f"Title: {_clean(self.title)}"] if _clean(self.title) else []
+        lines += self.lines
+        output, used = [], 0
+        for line in lines:
+            if max_chars and used + len(line) + 1 > max_chars:
+                output.append("... [Outline Truncated] ...")
+                break
+            output.append(line)
+            used += len(line) + 1
+        return "\n".join(output)
+
+
+def reduce_html(html: str, max_chars: int = REDUCED_CONTENT_MAX_CHARS) -> str:
+    """Reduces a full HTML document to a compact outline of headings, links, forms, prices and text."""
+    reducer = HtmlReducer()
+    try:
+        reducer.feed(html)
+        reducer.close()
+    except Exception as e:
+        print(f"WARN: HTML reducer stopped early ({e}); using the partial outline.")
+    return reducer.outline(max_chars)
@@ -0,0 +1,118 @@
+from dataclasses import dataclass, field
+
+# --- Interaction Inventory Settings ---
+BUTTON_SELECTOR = "button, input[type='button'], input[type='submit']"
+FORM_FIELD_SELECTOR = "input, textarea, select" # Field handles are indexes into this selector within their form
+SUBMIT_SELECTOR = "input[type='submit'], button[type='submit']"
+TEXT_FIELD_TYPES = {"text", "email", "password", "search", "url", "tel", "textarea"}
+
+# One pass over the DOM that describes every button and form. Element handles are
+# positions in document order, so they stay valid in restored copies of the page.
+INVENTORY_SCAN_SCRIPT = """
+([buttonSelector, fieldSelector, submitSelector]) => {
+    const isVisible = el => !!(el.offsetWidth || el.offsetHeight || el.getClientRects().length)
+        && getComputedStyle(el).visibility !== 'hidden';
+    const isEnabled = el => !el.disabled && !el.closest('fieldset:disabled');
+    const forms = Array.from(document.querySelectorAll('form'));
+    const buttons = Array.from(document.querySelectorAll(buttonSelector), (el, index) => ({
+        index,
+        tag: el.tagName.toLowerCase(),
+        type: (el.getAttribute('type') || '').toLowerCase(),
+        text: (el.textContent || '').trim() || el.value || '',
+        visible: isVisible(el),
+        enabled: isEnabled(el),
+        form_index: forms.indexOf(el.closest('form')),
+    }));
+    const formInfo = forms.map((form, index) => {
+        const submit = form.querySelector(submitSelector);
+        return {
+            index,
+            action: form.getAttribute('action') || '',
+            method: (form.getAttribute('method') || 'get').toLowerCase(),
+            id: form.id || '',
+            fields: Array.from(form.querySelectorAll(fieldSelector), (el, fieldIndex) => {
+                const tag = el.tagName.toLowerCase();
+                return {
+                    index: fieldIndex,
+                    tag,
+                    type: tag === 'input' ? (el.type || 'text').toLowerCase() : tag,
+                    name: el.name || '',
+                    visible: isVisible(el),
+                    enabled: isEnabled(el),
+                    editable: isEnabled(el) && !el.readOnly,
+                    options: tag === 'select' ? Array.from(el.options, o => o.textContent.trim()) : [],
+                };
+            }),
+            submit_visible: !!submit && isVisible(submit),
+            submit_enabled: !!submit && isEnabled(submit),
+        };
+    });
+    return {buttons, forms: formInfo};
+}
+"""
+
+
+@dataclass
+class ButtonInfo:
+    index: int # Position among BUTTON_SELECTOR matches
+    tag: str
+    type: str
+    text: str
+    visible: bool
+    enabled: bool
+    form_index: int # -1 when the button isn't inside a form
+
+    @property
+    def in_form(self) -> bool:
+        return self.form_index >= 0
+
+    @property
+    def clickable(self) -> bool:
+        return self.visible and self.enabled
+
+
+@dataclass
+class FieldInfo:
+    index: int # Position among FORM_FIELD_SELECTOR matches inside the form
+    tag: str
+    type: str
+    name: str
+    visible: bool
+    enabled: bool
+    editable: bool
+    options: list[str] = field(default_factory=list)
+
+    @property
+    def is_text_entry(self) -> bool:
+        return self.type in TEXT_FIELD_TYPES
+
+
+@dataclass
+class FormInfo:
+    index: int # Position among the page's <form> elements
+    action: str
+    method: str
+    id: str
+    fields: list[FieldInfo]
+    submit_visible: bool
+    submit_enabled: bool
+
+    @property
+    def can_submit(self) -> bool:
+        return self.submit_visible and self.submit_enabled
+
+
+@dataclass
+class InteractionInventory:
+    buttons: list[ButtonInfo]
+    forms: list[FormInfo]
+
+
+async def scan_interactions(page, button_selector: str = BUTTON_SELECTOR) -> InteractionInventory:
+    """Describes every button and form on a Playwright page in a single evaluate call."""
+    raw = await page.evaluate(INVENTORY_SCAN_SCRIPT, [button_selector, FORM_FIELD_SELECTOR, SUBMIT_SELECTOR])
+    forms = [
+        FormInfo(**{**form, "fields": [FieldInfo(**field_info) for field_info in form["fields"]]})
+        for form in raw["forms"]
+    ]
+    return InteractionInventory([ButtonInfo(**button) for button in raw["buttons"]], forms)
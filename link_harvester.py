@@ -0,0 +1,95 @@
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlparse
+
+# Collects every link on the page in one round trip instead of one get_attribute call per <a>.
+# a.href is already absolute (resolved against <base href> and the URL after redirects); SVG links only have the attribute.
+LINK_SCAN_SCRIPT = """
+() => Array.from(document.querySelectorAll('a[href]'), a => ({
+    href: typeof a.href === 'string' ? a.href : a.getAttribute('href'),
+    rel: (a.getAttribute('rel') || '').toLowerCase(),
+    text: (a.textContent || '').replace(/\\s+/g, ' ').trim().slice(0, 200),
+    visible: !!(a.offsetWidth || a.offsetHeight || a.getClientRects().length),
+}))
+"""
+
+
+async def harvest_links(page) -> list[dict]:
+    """Returns href, rel, text and visibility for every link on a Playwright page."""
+    return await page.evaluate(LINK_SCAN_SCRIPT)
+
+
+def harvest_links_sync(driver) -> list[dict]:
+    """Selenium counterpart of harvest_links (one execute_script call, no stale element handles)."""
+    return driver.execute_script(f"return ({LINK_SCAN_SCRIPT})();")
+
+
+class _LinkParser(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.links = []
+        self.base_href = None # The first <base href>, which relative links resolve against
+        self._open = None # The <a> whose text is being collected
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "base" and self.base_href is None:
+            self.base_href = dict(attrs).get("href")
+        if tag != "a":
+            return
+        attrs = dict(attrs)
+        if attrs.get("href") is not None:
+            self._open = {"href": attrs["href"], "rel": (attrs.get("rel") or "").lower(), "text": "", "visible": True}
+            self.links.append(self._open)
+
+    def handle_endtag(self, tag):
+        if tag == "a" and self._open is not None:
+            self._open["text"] = " ".join(self._open["text"].split())[:200]
+            self._open = None
+
+    def handle_data(self, data):
+        if self._open is not None:
+            self._open["text"] += data
+
+
+def harvest_links_from_html(html: str) -> list[dict]:
+    """harvest_links for served HTML, without a browser. Visibility is unknown there, so every link counts as visible."""
+    parser = _LinkParser()
+    try:
+        parser.feed(html)
+        parser.close()
+    except Exception as e:
+        print(f"WARN: Link parser stopped early ({e}); using the links found so far.")
+    if parser.base_href:
+        for link in parser.links:
+            link["href"] = urljoin(parser.base_href, link["href"]) # Still relative if the base is; crawlable_urls resolves the rest
+    return parser.links
+
+
+def crawlable_urls(links: list[dict], page_url: str, base_url: str, allow_external: bool = False,
+                   skip_fragments: bool = True, visible_only: bool = False, skip_nofollow: bool = False) -> list[str]:
+    """
+    Resolves harvested links against the page URL and keeps the http(s) ones the crawl
+    may follow, in page order and without duplicates.
+    """
+    base_host = urlparse(base_url).netloc
+    urls = []
+    seen = set()
+    for link in links:
+        href = (link.get("href") or "").strip()
+        if not href:
+            continue
+        if visible_only and not link.get("visible"):
+            continue
+        if skip_nofollow and "nofollow" in link.get("rel", "").split():
+            continue
+        full_url = urljoin(page_url, href)
+        parsed = urlparse(full_url)
+        if parsed.scheme not in ("http", "https"):
+            continue
+        if skip_fragments and parsed.fragment:
+            continue
+        if not allow_external and parsed.netloc != base_host:
+            continue
+        if full_url not in seen:
+            seen.add(full_url)
+            urls.append(full_url)
+    return urls
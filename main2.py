@@ -1,7 +1,6 @@
 import os
 import time
-from collections import deque
-from urllib.parse import urljoin, urlparse
+from urllib.parse import urlparse
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.service import Service as ChromeService
@@ -12,6 +11,14 @@ from selenium.common.exceptions import TimeoutException, NoSuchElementException,
 
 import google.generativeai as genai
 
+from gemini_client import get_gemini_client
+from execution_profiles import configured_profile_name, get_execution_profile
+from page_readiness import wait_until_settled_sync
+from link_harvester import harvest_links_sync, crawlable_urls
+from crawl_frontier import CrawlFrontier
+from html_reducer import reduce_html
+from analysis_cache import AnalysisCache
+
 # --- Configuration ---
 # IMPORTANT: REPLACE THESE WITH YOUR WEBSITE'S ACTUAL VALUES AND TEST STRATEGY 
 BASE_URL = "https://the-internet.herokuapp.com" # Updated base URL
@@ -35,6 +42,7 @@ SCREENSHOT_DIR = "screenshots" # Directory to save screenshots
 MAX_PAGES_TO_VISIT = 10 # Limit the number of pages to prevent infinite crawling on large sites
 TEST_FORMS_ON_EACH_PAGE = True # Set to False if you want to skip form testing
 CLICK_EXTERNAL_LINKS = False # Set to True if you want to test external links (use with caution!)
+EXECUTION_PROFILE = configured_profile_name("ci-fast") # See execution_profiles.py; the EXECUTION_PROFILE env var overrides
 
 # --- Ensure Screenshot Directory Exists ---
 os.makedirs(SCREENSHOT_DIR, exist_ok=True)
@@ -48,7 +56,7 @@ except KeyError:
 
 # --- Initialize Gemini Model ---
 try:
-    gemini_model = genai.GenerativeModel(GEMINI_MODEL)
+    gemini_model = get_gemini_client(GEMINI_MODEL) # Rate-limited, retrying wrapper shared by all scripts
 except Exception as e:
     print(f"Error initializing Gemini model '{GEMINI_MODEL}': {e}")
     print("Please check if the model is available and your API key is correct.")
@@ -61,8 +69,7 @@ def setup_driver():
         print("Setting up Chrome WebDriver...")
         service = ChromeService(ChromeDriverManager().install())
         options = webdriver.ChromeOptions()
-        # options.add_argument("--headless") # Uncomment to run in headless mode (no visible browser)
-        options.add_argument("--start-maximized")
+        get_execution_profile(EXECUTION_PROFILE).apply_to_chrome_options(options) # Headless mode, window size and browser flags
         driver = webdriver.Chrome(service=service, options=options)
         print("WebDriver setup complete.")
         return driver
@@ -71,18 +78,26 @@ def setup_driver():
         print("Ensure you have Chrome installed and webdriver-manager is configured correctly.")
         exit()
 
+# --- AI Analysis Cache ---
+USE_ANALYSIS_CACHE = True # Reuse analyses of identical or near-identical pages instead of calling Gemini again
+analysis_cache = AnalysisCache() if USE_ANALYSIS_CACHE else None
+
 # --- AI Analysis Function ---
 def analyze_content_with_ai(content: str, prompt_suffix: str) -> str:
-    """Sends content to Gemini for analysis."""
-    MAX_CONTENT_LENGTH = 15000 # Adjust based on model's context window and your needs (approx 15k chars for flash, more for pro)
-    if len(content) > MAX_CONTENT_LENGTH:
-        content = content[:MAX_CONTENT_LENGTH] + "\n... [Content Truncated] ..."
-
-    full_prompt = f"Analyze the following web page content. {prompt_suffix}\n\nContent:\n{content}"
+    """Reduces page HTML to a compact outline and sends it to Gemini for analysis."""
+    content = reduce_html(content) # Outline of headings, links, forms, prices and text instead of raw HTML
+    if analysis_cache:
+        cached_analysis = analysis_cache.lookup(content, prompt_suffix)
+        if cached_analysis:
+            return cached_analysis
+
+    full_prompt = f"Analyze the following web page, given as a text outline of its headings, links, forms, prices and text. {prompt_suffix}\n\nContent:\n{content}"
     try:
         print(f"Sending content for AI analysis (prompt len: {len(full_prompt)})...")
         response = gemini_model.generate_content(full_prompt)
         if response.parts and response.parts[0].text:
+            if analysis_cache:
+                analysis_cache.store(content, prompt_suffix, response.parts[0].text)
             return response.parts[0].text
         else:
             return "AI analysis completed, but no text response was generated."
@@ -93,8 +108,7 @@ def analyze_content_with_ai(content: str, prompt_suffix: str) -> str:
 def run_web_test():
     driver = None
     report_content = []
-    visited_urls = set()
-    urls_to_visit = deque()
+    frontier = CrawlFrontier() # Pages to crawl; set-backed, so duplicate checks stay O(1)
     forms_tested = set() # To track forms by their unique properties (e.g., action attribute)
 
     # --- Get AI Prompts from User Input ---
@@ -111,6 +125,7 @@ def run_web_test():
         report_content.append(f"--- Starting AI Web Test ---")
         report_content.append(f"Timestamp: {time.ctime()}")
         report_content.append(f"Base URL: {BASE_URL}")
+        report_content.append(f"Execution Profile: {get_execution_profile(EXECUTION_PROFILE).summary()}")
         report_content.append(f"Gemini Model Used: {GEMINI_MODEL}\n")
 
         # --- Test Case 1: User Login ---
@@ -138,7 +153,7 @@ def run_web_test():
 
             login_button.click()
             report_content.append("Clicked Login button. Waiting for post-login page...")
-            time.sleep(5) # Give some buffer for client-side processing/redirect
+            wait_until_settled_sync(driver, expect_navigation=True)
 
             # --- Post-Login Verification ---
             try:
@@ -162,7 +177,7 @@ def run_web_test():
                     dashboard_prompt # Using user-defined prompt
                 )
                 report_content.append(ai_analysis_dashboard)
-                urls_to_visit.append(driver.current_url) # Start crawling from dashboard
+                frontier.add(driver.current_url) # Start crawling from dashboard
 
             except TimeoutException:
                 report_content.append(f"FAIL: Login did not lead to expected post-login page or element within timeout. Current URL: {driver.current_url}")
@@ -186,18 +201,14 @@ def run_web_test():
             report_content.append("\n--- Starting Automated Page Traversal ---")
             page_count = 0
 
-            while urls_to_visit and page_count < MAX_PAGES_TO_VISIT:
-                current_url = urls_to_visit.popleft()
-
-                if current_url in visited_urls:
-                    continue # Skip already visited URLs
+            while frontier and page_count < MAX_PAGES_TO_VISIT:
+                current_url = frontier.pop() # Also marks it visited, so it is never queued again
 
                 # Check if the URL is within the base domain (unless external links are allowed)
                 if not CLICK_EXTERNAL_LINKS and urlparse(current_url).netloc != urlparse(BASE_URL).netloc:
                     report_content.append(f"Skipping external URL: {current_url}")
                     continue
 
-                visited_urls.add(current_url)
                 page_count += 1
                 report_content.append(f"\n--- Testing Page {page_count}: {current_url} ---")
                 print(f"Testing Page {page_count}: {current_url}")
@@ -205,7 +216,7 @@ def run_web_test():
                 try:
                     driver.get(current_url)
                     WebDriverWait(driver, 15).until(EC.presence_of_element_located((By.TAG_NAME, "body"))) # Wait for body to load
-                    time.sleep(2) # Give some buffer for JS to render
+                    wait_until_settled_sync(driver) # Until the network and DOM go quiet (capped), instead of a fixed sleep
 
                     screenshot_path = os.path.join(SCREENSHOT_DIR, f"page_{page_count}_{os.path.basename(urlparse(current_url).path).replace('/', '_') or 'index'}.png")
                     driver.save_screenshot(screenshot_path)
@@ -220,24 +231,14 @@ def run_web_test():
                     report_content.append(ai_analysis_page)
 
                     # --- Find and Queue New Links ---
-                    links = driver.find_elements(By.TAG_NAME, "a")
-                    for link in links:
-                        try:
-                            href = link.get_attribute("href")
-                            if href: # Ensure href is not None
-                                # Resolve relative URLs
-                                full_url = urljoin(current_url, href)
-                                # Basic check to ensure it's a valid HTTP/HTTPS URL
-                                if full_url.startswith("http://") or full_url.startswith("https://"):
-                                    # Ensure it's within the base domain or external links are allowed
-                                    if (CLICK_EXTERNAL_LINKS or urlparse(full_url).netloc == urlparse(BASE_URL).netloc) and \
-                                       full_url not in visited_urls and full_url not in urls_to_visit:
-                                        urls_to_visit.append(full_url)
-                        except StaleElementReferenceException:
-                            # Element no longer attached to the DOM, skip it
-                            continue
-                        except Exception as link_e:
-                            report_content.append(f"WARN: Error processing link on {current_url}: {link_e}")
+                    # One execute_script call collects every link, so there are no stale element handles to chase
+                    try:
+                        links = harvest_links_sync(driver)
+                    except Exception as link_e:
+                        links = []
+                        report_content.append(f"WARN: Error collecting links on {current_url}: {link_e}")
+                    for full_url in crawlable_urls(links, current_url, BASE_URL, allow_external=CLICK_EXTERNAL_LINKS, skip_fragments=False):
+                        frontier.add(full_url)
 
 
                     # --- Test Forms on the Page (Optional but recommended) ---
@@ -307,7 +308,7 @@ def run_web_test():
                                     report_content.append(f"Attempting to submit form: {form_identifier[2]}")
                                     current_url_before_submit = driver.current_url
                                     submit_button.click()
-                                    time.sleep(5) # Wait for form submission to process
+                                    wait_until_settled_sync(driver, expect_navigation=True)
 
                                     # AI analysis of page after form submission
                                     report_content.append("\n--- AI Analysis: After Form Submission ---")
@@ -330,11 +331,10 @@ def run_web_test():
                                 # For comprehensive crawling, it's often safer to go back to the current_url
                                 # unless the submission explicitly leads to a new, crawlable page.
                                 if driver.current_url != current_url: # If form submission changed URL, add new URL to queue
-                                    if driver.current_url not in visited_urls and driver.current_url not in urls_to_visit:
-                                        urls_to_visit.append(driver.current_url)
+                                    frontier.add(driver.current_url)
                                 driver.get(current_url) # Return to the page being tested to find other links/forms
                                 WebDriverWait(driver, 15).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
-                                time.sleep(2)
+                                wait_until_settled_sync(driver)
 
 
                 except TimeoutException:
@@ -347,7 +347,9 @@ def run_web_test():
             if page_count >= MAX_PAGES_TO_VISIT:
                 report_content.append(f"\n--- Maximum pages to visit ({MAX_PAGES_TO_VISIT}) reached. Stopping traversal. ---")
             report_content.append("\n--- Automated Page Traversal Complete ---")
-            report_content.append(f"Total pages visited: {len(visited_urls)}")
+            for trapped_url, reason in frontier.trapped.items():
+                report_content.append(f"Skipping possible crawler trap: {trapped_url} ({reason})")
+            report_content.append(f"Total pages visited: {len(frontier.visited)}")
             report_content.append(f"Total forms tested: {len(forms_tested)}")
 
         else:
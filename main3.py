@@ -1,7 +1,6 @@
 import os
 import time
-from collections import deque
-from urllib.parse import urljoin, urlparse
+from urllib.parse import urlparse
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.service import Service as ChromeService
@@ -12,6 +11,21 @@ from selenium.common.exceptions import TimeoutException, NoSuchElementException,
 
 import google.generativeai as genai
 
+from gemini_client import get_gemini_client
+from execution_profiles import configured_profile_name, get_execution_profile
+from html_reducer import reduce_html
+from analysis_cache import AnalysisCache
+
+from analysis_pipeline import BackgroundAnalysisPipeline, resolve_report_lines_sync, report_lines_ready
+from page_readiness import wait_until_settled_sync
+from page_snapshot import probe_tab
+from link_harvester import harvest_links_sync, harvest_links_from_html, crawlable_urls
+from crawl_frontier import CrawlFrontier
+from crawl_checkpoint import CrawlCheckpoint
+from recrawl_state import RecrawlState
+from tiered_fetcher import BackgroundHttpFetcher, browser_reason
+from analysis_batching import ANALYSIS_BATCH_WAIT, analyze_pages_in_batches
+
 # --- Configuration ---
 # NO LONGER HARDCODED LOGIN DETAILS - These will be user input
 # BASE_URL will now be derived from the START_URL
@@ -26,6 +40,14 @@ SCREENSHOT_DIR = "screenshots_general_test" # Directory to save screenshots
 MAX_PAGES_TO_VISIT = 100 # Limit the number of pages to prevent infinite crawling on large sites
 TEST_FORMS_ON_EACH_PAGE = True # Set to False if you want to skip form testing
 CLICK_EXTERNAL_LINKS = False # Set to True if you want to test external links (use with caution!)
+EXECUTION_PROFILE = configured_profile_name("ci-fast") # See execution_profiles.py; the EXECUTION_PROFILE env var overrides
+RESUME_CRAWLS = True # An interrupted crawl of the same start URL and prompt resumes from its checkpoint (see crawl_checkpoint.py)
+HTTP_FIRST = True # Pages are fetched over plain HTTP first (doubling as the INCREMENTAL_CRAWL check); JS-rendered pages and, with TEST_FORMS_ON_EACH_PAGE, pages with forms still go to the browser. See tiered_fetcher.py
+SCREENSHOT_EVERY_PAGE = False # True renders (and screenshots) every page, giving up HTTP_FIRST's browser-free static pages; pages escalated to the browser are always screenshotted
+INCREMENTAL_CRAWL = True # Pages the server reports unchanged since the last run (ETag/Last-Modified or same content) skip rendering and AI analysis; see recrawl_state.py
+ANALYSIS_WORKERS = 3 # Concurrent Gemini analyses running while the browser keeps crawling
+ANALYSIS_QUEUE_SIZE = 10 # Page snapshots allowed to wait for analysis before crawling pauses
+ANALYSIS_BATCH_SIZE = 5 # Pages packed into one Gemini request when several are waiting (1 disables batching)
 
 # --- Ensure Screenshot Directory Exists ---
 os.makedirs(SCREENSHOT_DIR, exist_ok=True)
@@ -39,7 +61,7 @@ except KeyError:
 
 # --- Initialize Gemini Model ---
 try:
-    gemini_model = genai.GenerativeModel(GEMINI_MODEL)
+    gemini_model = get_gemini_client(GEMINI_MODEL) # Rate-limited, retrying wrapper shared by all scripts
 except Exception as e:
     print(f"Error initializing Gemini model '{GEMINI_MODEL}': {e}")
     print("Please check if the model is available and your API key is correct.")
@@ -52,8 +74,7 @@ def setup_driver():
         print("Setting up Chrome WebDriver...")
         service = ChromeService(ChromeDriverManager().install())
         options = webdriver.ChromeOptions()
-        # options.add_argument("--headless") # Uncomment to run in headless mode (no visible browser)
-        options.add_argument("--start-maximized")
+        get_execution_profile(EXECUTION_PROFILE).apply_to_chrome_options(options) # Headless mode, window size and browser flags
         driver = webdriver.Chrome(service=service, options=options)
         print("WebDriver setup complete.")
         return driver
@@ -62,31 +83,65 @@ def setup_driver():
         print("Ensure you have Chrome installed and webdriver-manager is configured correctly.")
         exit()
 
+# --- AI Analysis Cache ---
+USE_ANALYSIS_CACHE = True # Reuse analyses of identical or near-identical pages instead of calling Gemini again
+analysis_cache = AnalysisCache() if USE_ANALYSIS_CACHE else None
+
 # --- AI Analysis Function ---
 def analyze_content_with_ai(content: str, prompt_suffix: str) -> str:
-    """Sends content to Gemini for analysis."""
-    MAX_CONTENT_LENGTH = 15000 # Adjust based on model's context window and your needs (approx 15k chars for flash, more for pro)
-    if len(content) > MAX_CONTENT_LENGTH:
-        content = content[:MAX_CONTENT_LENGTH] + "\n... [Content Truncated] ..."
-
-    full_prompt = f"Analyze the following web page content. {prompt_suffix}\n\nContent:\n{content}"
+    """Reduces page HTML to a compact outline and sends it to Gemini for analysis."""
+    content = reduce_html(content) # Outline of headings, links, forms, prices and text instead of raw HTML
+    if analysis_cache:
+        cached_analysis = analysis_cache.lookup(content, prompt_suffix)
+        if cached_analysis:
+            return cached_analysis
+
+    full_prompt = f"Analyze the following web page, given as a text outline of its headings, links, forms, prices and text. {prompt_suffix}\n\nContent:\n{content}"
     try:
         print(f"Sending content for AI analysis (prompt len: {len(full_prompt)})...")
         response = gemini_model.generate_content(full_prompt)
         if response.parts and response.parts[0].text:
+            if analysis_cache:
+                analysis_cache.store(content, prompt_suffix, response.parts[0].text)
             return response.parts[0].text
         else:
             return "AI analysis completed, but no text response was generated."
     except Exception as e:
         return f"AI analysis failed: {e}. This might be due to API issues, rate limits, or content too large."
 
+def analyze_batch_with_ai(contents: list[str], prompt_suffix: str) -> list[str]:
+    """Analyses several pages in as few Gemini requests as possible; see analysis_batching.py."""
+    return analyze_pages_in_batches(contents, prompt_suffix, gemini_model, analyze_content_with_ai, analysis_cache)
+
 # --- Web Testing Logic ---
 def run_web_test():
     driver = None
+    analysis_pipeline = None
     report_content = []
-    visited_urls = set()
-    urls_to_visit = deque()
+    frontier = CrawlFrontier() # Pages to crawl; set-backed, so duplicate checks stay O(1)
     forms_tested = set() # To track forms by their unique properties (e.g., action attribute)
+    checkpoint = None
+    recrawl_state = None
+    http_fetcher = None
+    pending_pages = [] # (page number, url, report lines) of crawled pages not yet checkpointed
+    crawl_finished = False
+
+    def queue_url(url):
+        url = frontier.normalize_url(url)
+        if frontier.add(url) and checkpoint:
+            checkpoint.record_queued(url)
+
+    def checkpoint_pages(wait=False):
+        """Checkpoints crawled pages whose background analyses are done (all of them with wait=True)."""
+        for entry in list(pending_pages):
+            if wait or report_lines_ready(entry[2]):
+                checkpoint.record_page(entry[0], entry[1], resolve_report_lines_sync(entry[2]))
+                pending_pages.remove(entry)
+
+    def page_done(page_number, url, page_start):
+        if checkpoint:
+            pending_pages.append((page_number, url, report_content[page_start:]))
+            checkpoint_pages()
 
     # --- Get User Input for Testing ---
     print("\n--- Configure Web Test ---")
@@ -100,40 +155,91 @@ def run_web_test():
 
     main_ai_prompt = input("Enter the PRIMARY AI prompt for analysis on ALL visited pages (e.g., 'Check for broken links, missing content, layout issues, and overall relevance. Identify any functional anomalies or errors.'). This will guide all AI analysis:\n> ")
     print("--- Test Configuration Complete ---\n")
+    if INCREMENTAL_CRAWL:
+        recrawl_state = RecrawlState.for_crawl("main3", main_ai_prompt)
 
     try:
-        driver = setup_driver()
+        if HTTP_FIRST:
+            http_fetcher = BackgroundHttpFetcher() # The browser is only started for the first page that needs it
+        else:
+            driver = setup_driver()
+        # Page snapshots are analysed in the background while the driver moves on
+        analysis_pipeline = BackgroundAnalysisPipeline(
+            analyze_content_with_ai, workers=ANALYSIS_WORKERS, queue_size=ANALYSIS_QUEUE_SIZE,
+            analyze_batch=analyze_batch_with_ai, batch_size=ANALYSIS_BATCH_SIZE, batch_wait=ANALYSIS_BATCH_WAIT,
+        )
         report_content.append(f"--- Starting AI Web Test ---")
         report_content.append(f"Timestamp: {time.ctime()}")
         report_content.append(f"Starting URL: {start_url}")
         report_content.append(f"Base Domain for Crawling: {base_url}")
         report_content.append(f"AI Analysis Prompt: '{main_ai_prompt}'")
+        report_content.append(f"Execution Profile: {get_execution_profile(EXECUTION_PROFILE).summary()}")
         report_content.append(f"Gemini Model Used: {GEMINI_MODEL}\n")
 
-        # Start crawling from the user-provided URL
-        urls_to_visit.append(start_url)
+        # Completed pages and the queue are checkpointed as the crawl goes, so a rerun after a crash picks up from there
         page_count = 0
+        if RESUME_CRAWLS:
+            checkpoint = CrawlCheckpoint.for_crawl("main3", start_url, main_ai_prompt)
+            restored_pages = checkpoint.restore(frontier)
+            if restored_pages:
+                report_content.append(f"Resumed from checkpoint: {len(restored_pages)} pages already tested\n")
+            for restored_page_number, _, page_lines in restored_pages:
+                report_content.extend(page_lines)
+                page_count = max(page_count, restored_page_number)
 
-        while urls_to_visit and page_count < MAX_PAGES_TO_VISIT:
-            current_url = urls_to_visit.popleft()
+        # Start crawling from the user-provided URL
+        queue_url(start_url)
 
-            if current_url in visited_urls:
-                continue # Skip already visited URLs
+        while frontier and page_count < MAX_PAGES_TO_VISIT:
+            current_url = frontier.pop() # Also marks it visited, so it is never queued again
 
             # Check if the URL is within the base domain (unless external links are allowed)
             if not CLICK_EXTERNAL_LINKS and urlparse(current_url).netloc != urlparse(base_url).netloc:
                 report_content.append(f"Skipping external URL: {current_url}")
                 continue
 
-            visited_urls.add(current_url)
             page_count += 1
+            page_start = len(report_content)
             report_content.append(f"\n--- Testing Page {page_count}: {current_url} ---")
             print(f"Testing Page {page_count}: {current_url}")
 
+            # A cheap HTTP check first: pages unchanged since the last run are neither rendered nor re-analysed.
+            # With the HTTP tier, its (conditional) GET is that check, so each page costs one request.
+            if http_fetcher:
+                http_page = http_fetcher.fetch(current_url, recrawl_state.conditional_headers(current_url) if recrawl_state else None)
+                change = recrawl_state.check_fetched(current_url, http_page) if recrawl_state else None
+            else:
+                change = recrawl_state.check(current_url) if recrawl_state else None
+            if change and change.unchanged:
+                report_content.append(f"Unchanged since run {change.since}; skipped rendering and AI analysis.")
+                for linked_url in change.links:
+                    queue_url(linked_url)
+                page_done(page_count, current_url, page_start)
+                continue
+
+            # Static pages are tested from the served HTML; only pages that need it are rendered in the browser
+            if http_fetcher:
+                reason = browser_reason(http_page, needs_forms=TEST_FORMS_ON_EACH_PAGE, needs_screenshot=SCREENSHOT_EVERY_PAGE)
+                if reason is None:
+                    report_content.append("Fetched over HTTP (static page; no browser render or screenshot).")
+                    report_content.append("\n--- AI Content Analysis ---")
+                    ai_analysis_page = analysis_pipeline.submit(http_page.html, main_ai_prompt)
+                    report_content.append(ai_analysis_page)
+                    page_links = crawlable_urls(harvest_links_from_html(http_page.html), http_page.url, base_url, allow_external=CLICK_EXTERNAL_LINKS)
+                    for full_url in page_links:
+                        queue_url(full_url)
+                    if change:
+                        recrawl_state.record(current_url, change, page_links, ai_analysis_page)
+                    page_done(page_count, current_url, page_start)
+                    continue
+                report_content.append(f"Rendering in the browser: {reason}.")
+                if driver is None:
+                    driver = setup_driver()
+
             try:
                 driver.get(current_url)
                 WebDriverWait(driver, 20).until(EC.presence_of_element_located((By.TAG_NAME, "body"))) # Wait for body to load
-                time.sleep(3) # Give some buffer for JS to render
+                wait_until_settled_sync(driver) # Until the network and DOM go quiet (capped), instead of a fixed sleep
 
                 screenshot_path = os.path.join(SCREENSHOT_DIR, f"page_{page_count}_{os.path.basename(urlparse(current_url).path).replace('/', '_').replace('.', '_') or 'index'}.png")
                 driver.save_screenshot(screenshot_path)
@@ -141,31 +247,24 @@ def run_web_test():
 
                 page_source = driver.page_source
                 report_content.append("\n--- AI Content Analysis ---")
-                ai_analysis_page = analyze_content_with_ai(
+                ai_analysis_page = analysis_pipeline.submit(
                     page_source,
                     main_ai_prompt # Using the single user-defined prompt
                 )
                 report_content.append(ai_analysis_page)
 
                 # --- Find and Queue New Links ---
-                links = driver.find_elements(By.TAG_NAME, "a")
-                for link in links:
-                    try:
-                        href = link.get_attribute("href")
-                        if href: # Ensure href is not None
-                            full_url = urljoin(current_url, href)
-                            # Basic check to ensure it's a valid HTTP/HTTPS URL and not a fragment
-                            if (full_url.startswith("http://") or full_url.startswith("https://")) and \
-                               urlparse(full_url).fragment == '' and \
-                               (CLICK_EXTERNAL_LINKS or urlparse(full_url).netloc == urlparse(base_url).netloc):
-                                # Remove query parameters for simpler URL tracking, to avoid re-visiting same page with different params
-                                url_without_params = urlparse(full_url)._replace(query='').geturl()
-                                if url_without_params not in visited_urls and url_without_params not in urls_to_visit:
-                                    urls_to_visit.append(url_without_params)
-                    except StaleElementReferenceException:
-                        continue # Element no longer attached to the DOM, skip it
-                    except Exception as link_e:
-                        report_content.append(f"WARN: Error processing link on {current_url}: {link_e}")
+                # One execute_script call collects every link, so there are no stale element handles to chase
+                try:
+                    links = harvest_links_sync(driver)
+                except Exception as link_e:
+                    links = []
+                    report_content.append(f"WARN: Error collecting links on {current_url}: {link_e}")
+                page_links = crawlable_urls(links, current_url, base_url, allow_external=CLICK_EXTERNAL_LINKS)
+                for full_url in page_links:
+                    queue_url(full_url) # Deduped by canonical URL (tracking params, index.html etc. folded), so variants aren't re-visited
+                if change:
+                    recrawl_state.record(current_url, change, page_links, ai_analysis_page)
 
 
                 # --- Test Forms on the Page (Optional but recommended) ---
@@ -179,89 +278,85 @@ def run_web_test():
                         forms_tested.add(form_identifier)
 
                         report_content.append(f"\n--- Testing Form: {form_identifier[2]} on {current_url} ---")
-                        try:
-                            # Find form elements only within the current form to avoid confusion
-                            inputs = form.find_elements(By.TAG_NAME, "input")
-                            textareas = form.find_elements(By.TAG_NAME, "textarea")
-                            selects = form.find_elements(By.TAG_NAME, "select")
-
-                            for input_field in inputs:
-                                if input_field.is_displayed() and input_field.is_enabled():
-                                    input_type = input_field.get_attribute("type")
-                                    if input_type in ["text", "search", "email", "url", "tel", "password"]:
-                                        input_field.send_keys("test_data")
-                                    elif input_type == "checkbox":
-                                        if not input_field.is_selected():
-                                            input_field.click()
-                                    elif input_type == "radio":
-                                        input_field.click() # Clicks if not selected
-
-                            for textarea in textareas:
-                                if textarea.is_displayed() and textarea.is_enabled():
-                                    textarea.send_keys("This is a test comment.")
-
-                            for select in selects:
-                                if select.is_displayed() and select.is_enabled():
-                                    try:
-                                        # Try to select the first visible option
-                                        options = select.find_elements(By.TAG_NAME, "option")
-                                        if options:
-                                            selected = False
-                                            for opt in options:
-                                                if opt.is_enabled() and opt.is_displayed():
-                                                    opt.click()
-                                                    selected = True
-                                                    break
-                                            if not selected:
-                                                report_content.append(f"WARN: No clickable options found for select element in form {form_identifier[2]}.")
-                                        else:
-                                            report_content.append(f"WARN: No options found for select element in form {form_identifier[2]}.")
-                                    except Exception as select_e:
-                                        report_content.append(f"ERROR: Could not interact with select in form {form_identifier[2]}: {select_e}")
-
-                            # Attempt to submit the form
-                            submit_button = None
+                        # Each form is tested in a probe tab, so the crawled page never has to be reloaded
+                        with probe_tab(driver, current_url):
                             try:
-                                # Prioritize type='submit' buttons
-                                submit_button = form.find_element(By.CSS_SELECTOR, "input[type='submit'], button[type='submit']")
-                            except NoSuchElementException:
-                                try: # Fallback: Find any button within the form
-                                    submit_button = form.find_element(By.TAG_NAME, "button")
+                                form = driver.find_elements(By.TAG_NAME, "form")[form_index] # The same form, in the probe tab's copy of the page
+                                # Find form elements only within the current form to avoid confusion
+                                inputs = form.find_elements(By.TAG_NAME, "input")
+                                textareas = form.find_elements(By.TAG_NAME, "textarea")
+                                selects = form.find_elements(By.TAG_NAME, "select")
+
+                                for input_field in inputs:
+                                    if input_field.is_displayed() and input_field.is_enabled():
+                                        input_type = input_field.get_attribute("type")
+                                        if input_type in ["text", "search", "email", "url", "tel", "password"]:
+                                            input_field.send_keys("test_data")
+                                        elif input_type == "checkbox":
+                                            if not input_field.is_selected():
+                                                input_field.click()
+                                        elif input_type == "radio":
+                                            input_field.click() # Clicks if not selected
+
+                                for textarea in textareas:
+                                    if textarea.is_displayed() and textarea.is_enabled():
+                                        textarea.send_keys("This is a test comment.")
+
+                                for select in selects:
+                                    if select.is_displayed() and select.is_enabled():
+                                        try:
+                                            # Try to select the first visible option
+                                            options = select.find_elements(By.TAG_NAME, "option")
+                                            if options:
+                                                selected = False
+                                                for opt in options:
+                                                    if opt.is_enabled() and opt.is_displayed():
+                                                        opt.click()
+                                                        selected = True
+                                                        break
+                                                if not selected:
+                                                    report_content.append(f"WARN: No clickable options found for select element in form {form_identifier[2]}.")
+                                            else:
+                                                report_content.append(f"WARN: No options found for select element in form {form_identifier[2]}.")
+                                        except Exception as select_e:
+                                            report_content.append(f"ERROR: Could not interact with select in form {form_identifier[2]}: {select_e}")
+
+                                # Attempt to submit the form
+                                submit_button = None
+                                try:
+                                    # Prioritize type='submit' buttons
+                                    submit_button = form.find_element(By.CSS_SELECTOR, "input[type='submit'], button[type='submit']")
                                 except NoSuchElementException:
-                                    report_content.append(f"WARN: No explicit submit button found for form {form_identifier[2]}. Skipping submission.")
-
-                            if submit_button and submit_button.is_displayed() and submit_button.is_enabled():
-                                report_content.append(f"Attempting to submit form: {form_identifier[2]}")
-                                current_url_before_submit = driver.current_url
-                                submit_button.click()
-                                time.sleep(5) # Wait for form submission to process
-
-                                # AI analysis of page after form submission
-                                report_content.append("\n--- AI Analysis: After Form Submission ---")
-                                ai_analysis_form_submit = analyze_content_with_ai(
-                                    driver.page_source,
-                                    main_ai_prompt # Using the general prompt for form submission analysis
-                                )
-                                report_content.append(ai_analysis_form_submit)
-
-                                if driver.current_url == current_url_before_submit:
-                                    report_content.append(f"NOTE: Page did not redirect after submitting form {form_identifier[2]}. Check for AJAX validation or same-page updates.")
-                            else:
-                                report_content.append(f"WARN: Could not find clickable submit button for form {form_identifier[2]}.")
-
-                        except Exception as form_e:
-                            report_content.append(f"ERROR: Failed to test form {form_identifier[2]} due to: {form_e}")
-                        finally:
-                            # After testing a form, navigate back to the original page to continue crawling
-                            # if the URL changed due to submission, or stay if it's an AJAX form.
-                            if driver.current_url != current_url: # If form submission changed URL, add new URL to queue
-                                # Remove query parameters for simpler URL tracking
-                                new_url_without_params = urlparse(driver.current_url)._replace(query='').geturl()
-                                if new_url_without_params not in visited_urls and new_url_without_params not in urls_to_visit:
-                                    urls_to_visit.append(new_url_without_params)
-                            driver.get(current_url) # Return to the page being tested to find other links/forms
-                            WebDriverWait(driver, 15).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
-                            time.sleep(2)
+                                    try: # Fallback: Find any button within the form
+                                        submit_button = form.find_element(By.TAG_NAME, "button")
+                                    except NoSuchElementException:
+                                        report_content.append(f"WARN: No explicit submit button found for form {form_identifier[2]}. Skipping submission.")
+
+                                if submit_button and submit_button.is_displayed() and submit_button.is_enabled():
+                                    report_content.append(f"Attempting to submit form: {form_identifier[2]}")
+                                    current_url_before_submit = driver.current_url
+                                    submit_button.click()
+                                    wait_until_settled_sync(driver, expect_navigation=True)
+
+                                    # AI analysis of page after form submission
+                                    report_content.append("\n--- AI Analysis: After Form Submission ---")
+                                    ai_analysis_form_submit = analysis_pipeline.submit(
+                                        driver.page_source,
+                                        main_ai_prompt # Using the general prompt for form submission analysis
+                                    )
+                                    report_content.append(ai_analysis_form_submit)
+
+                                    if driver.current_url == current_url_before_submit:
+                                        report_content.append(f"NOTE: Page did not redirect after submitting form {form_identifier[2]}. Check for AJAX validation or same-page updates.")
+                                else:
+                                    report_content.append(f"WARN: Could not find clickable submit button for form {form_identifier[2]}.")
+
+                            except Exception as form_e:
+                                report_content.append(f"ERROR: Failed to test form {form_identifier[2]} due to: {form_e}")
+                            finally:
+                                # The crawled page was never touched; only queue where the submission led
+                                if driver.current_url != current_url: # If form submission changed URL, add new URL to queue
+                                    queue_url(driver.current_url)
 
 
             except TimeoutException:
@@ -271,11 +366,16 @@ def run_web_test():
                 report_content.append(f"ERROR: An unexpected error occurred while testing {current_url}: {e}")
                 driver.save_screenshot(os.path.join(SCREENSHOT_DIR, f"page_error_{page_count}.png"))
 
+            page_done(page_count, current_url, page_start)
+
         if page_count >= MAX_PAGES_TO_VISIT:
             report_content.append(f"\n--- Maximum pages to visit ({MAX_PAGES_TO_VISIT}) reached. Stopping traversal. ---")
         report_content.append("\n--- Automated Web Test Complete ---")
-        report_content.append(f"Total unique pages visited: {len(visited_urls)}")
+        for trapped_url, reason in frontier.trapped.items():
+            report_content.append(f"Skipping possible crawler trap: {trapped_url} ({reason})")
+        report_content.append(f"Total unique pages visited: {len(frontier.visited)}")
         report_content.append(f"Total forms attempted: {len(forms_tested)}")
+        crawl_finished = True
 
 
     except Exception as e:
@@ -284,11 +384,23 @@ def run_web_test():
         if driver:
             print("Closing WebDriver...")
             driver.quit()
+        if http_fetcher:
+            http_fetcher.close()
+        if analysis_pipeline:
+            print("Waiting for remaining AI analyses...")
+            analysis_pipeline.close()
+        if checkpoint:
+            checkpoint_pages(wait=True) # Pages finished before a crash are kept for the next run
+            if crawl_finished:
+                checkpoint.finish() # The next run starts over
+            checkpoint.close()
         # --- Generate Report ---
         print(f"\nWriting report to {REPORT_FILE}...")
         with open(REPORT_FILE, "w", encoding="utf-8") as f:
-            for line in report_content:
+            for line in resolve_report_lines_sync(report_content):
                 f.write(line + "\n")
+        if recrawl_state:
+            recrawl_state.save() # After the report has waited for every analysis
         print(f"\nWeb test completed. Report saved to {REPORT_FILE}")
         print("Please review the report for AI insights and test outcomes and check the 'screenshots_general_test' directory.")
 
@@ -1,11 +1,24 @@
+import asyncio
 import os
 import time
-from collections import deque
-from urllib.parse import urljoin, urlparse
-from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError, Page, Locator
+from urllib.parse import urlparse
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError, Page, Locator
 
 import google.generativeai as genai
 
+from gemini_client import get_gemini_client
+from html_reducer import reduce_html
+from analysis_cache import AnalysisCache
+
+from crawl_engine import CrawlEngine
+from url_canonicalizer import canonical_key
+from link_harvester import harvest_links, crawlable_urls
+from page_readiness import wait_until_settled
+from resource_policy import apply_resource_policy
+from execution_profiles import configured_profile_name, get_execution_profile
+from analysis_pipeline import AnalysisPipeline, resolve_report_lines
+from analysis_batching import ANALYSIS_BATCH_WAIT, analyze_pages_in_batches
+
 # --- Configuration ---
 # AI Model and Report
 GEMINI_MODEL = "gemini-1.5-flash"
@@ -14,7 +27,13 @@ SCREENSHOT_DIR = "screenshots_playwright_testcases" # Directory to save screensh
 
 # Crawler Settings
 MAX_PAGES_TO_VISIT = 20 # Limit the number of pages to prevent infinite crawling on large sites
+CRAWL_CONCURRENCY = 4 # Pages crawled in parallel (each worker has its own tab in the shared browser)
+RESOURCE_POLICY = "full" # "full", "lean" (no fonts/media/trackers) or "text-only" (also no images/CSS); blocking turns off the browser cache, see resource_policy.py
+EXECUTION_PROFILE = configured_profile_name("ci-fast") # See execution_profiles.py; the EXECUTION_PROFILE env var overrides
 CLICK_EXTERNAL_LINKS = False # Set to True if you want to test external links (use with caution!)
+ANALYSIS_WORKERS = 3 # Concurrent Gemini analyses running alongside the crawl
+ANALYSIS_QUEUE_SIZE = 10 # Page snapshots allowed to wait for analysis before crawling pauses
+ANALYSIS_BATCH_SIZE = 5 # Pages packed into one Gemini request when several are waiting (1 disables batching)
 
 # --- Action Control Flags (YOU SET THESE DIRECTLY IN THE CODE) ---
 PERFORM_BUTTON_CLICKS = True
@@ -43,47 +62,50 @@ except KeyError:
 
 # --- Initialize Gemini Model ---
 try:
-    gemini_model = genai.GenerativeModel(GEMINI_MODEL)
+    gemini_model = get_gemini_client(GEMINI_MODEL) # Rate-limited, retrying wrapper shared by all scripts
 except Exception as e:
     print(f"Error initializing Gemini model '{GEMINI_MODEL}': {e}")
     print("Please check if the model is available and your API key is correct.")
     exit()
 
+# --- AI Analysis Cache ---
+USE_ANALYSIS_CACHE = True # Reuse analyses of identical or near-identical pages instead of calling Gemini again
+analysis_cache = AnalysisCache() if USE_ANALYSIS_CACHE else None
+
 # --- AI Analysis Function ---
 def analyze_content_with_ai(content: str, prompt_suffix: str) -> str:
-    """Sends content to Gemini for analysis."""
-    MAX_CONTENT_LENGTH = 15000 # Max tokens for the model
-    if len(content) > MAX_CONTENT_LENGTH:
-        content = content[:MAX_CONTENT_LENGTH] + "\n... [Content Truncated] ..."
-
-    full_prompt = f"Analyze the following web page content. {prompt_suffix}\n\nContent:\n{content}"
+    """Reduces page HTML to a compact outline and sends it to Gemini for analysis."""
+    content = reduce_html(content) # Outline of headings, links, forms, prices and text instead of raw HTML
+    if analysis_cache:
+        cached_analysis = analysis_cache.lookup(content, prompt_suffix)
+        if cached_analysis:
+            return cached_analysis
+
+    full_prompt = f"Analyze the following web page, given as a text outline of its headings, links, forms, prices and text. {prompt_suffix}\n\nContent:\n{content}"
     try:
-        time.sleep(1) # Small delay before AI calls to be mindful of API rate limits
         print(f"Sending content for AI analysis (prompt len: {len(full_prompt)})...")
         response = gemini_model.generate_content(full_prompt)
         if response.parts and response.parts[0].text:
+            if analysis_cache:
+                analysis_cache.store(content, prompt_suffix, response.parts[0].text)
             return response.parts[0].text
         else:
             return "AI analysis completed, but no text response was generated."
     except Exception as e:
         return f"AI analysis failed: {e}. This might be due to API issues, rate limits, or content too large."
 
+def analyze_batch_with_ai(contents: list[str], prompt_suffix: str) -> list[str]:
+    """Analyses several pages in as few Gemini requests as possible; see analysis_batching.py."""
+    return analyze_pages_in_batches(contents, prompt_suffix, gemini_model, analyze_content_with_ai, analysis_cache)
+
 # --- Playwright Web Testing Logic ---
 
-def run_web_test_playwright():
+async def run_web_test_playwright():
     report_content = []
-    visited_urls = set()
-    urls_to_visit = deque() # URLs to visit, prioritizing test cases
-
-    # A set to keep track of URLs that are already in the queue to avoid duplicates
-    urls_in_queue = set()
 
-    def add_url_to_queue(url):
-        normalized_url = urlparse(url)._replace(query='', fragment='').geturl()
-        if normalized_url not in visited_urls and normalized_url not in urls_in_queue:
-            urls_to_visit.append(normalized_url)
-            urls_in_queue.add(normalized_url)
-            print(f"DEBUG: Added to queue: {normalized_url}") # Debugging line
+    def add_url_to_queue(engine, url):
+        if engine.add_url(url):
+            print(f"DEBUG: Added to queue: {engine.normalize_url(url)}") # Debugging line
 
     # --- Get User Input for Testing ---
     print("\n--- Configure Web Test (Playwright) ---")
@@ -102,237 +124,239 @@ def run_web_test_playwright():
     main_ai_prompt = input("\nEnter your PRIMARY AI analysis prompt:\n> ")
     print("--- Test Configuration Complete ---\n")
 
+    # AI analysis runs on its own workers, batching pages that pile up, while the crawl carries on
+    analysis_pipeline = AnalysisPipeline(
+        analyze_content_with_ai, workers=ANALYSIS_WORKERS, queue_size=ANALYSIS_QUEUE_SIZE,
+        analyze_batch=analyze_batch_with_ai, batch_size=ANALYSIS_BATCH_SIZE, batch_wait=ANALYSIS_BATCH_WAIT,
+    )
+
+    async def test_page(page, cleaned_current_url, page_count, engine):
+        """Runs the configured AI task and interactions on one crawled page and returns its report lines."""
+        page_report = [f"\n--- Testing Page {page_count}: {cleaned_current_url} ---"]
+        print(f"Testing Page {page_count}: {cleaned_current_url}")
+
+        try:
+            # --- Attempt Navigation ---
+            print(f"DEBUG: Navigating to: {cleaned_current_url}")
+            await page.goto(cleaned_current_url, wait_until="domcontentloaded", timeout=30000)
+            await wait_until_settled(page) # Until the network and DOM go quiet (capped), instead of a fixed sleep
+
+            # Verify actual URL after navigation
+            if canonical_key(page.url) != canonical_key(cleaned_current_url): # /docs -> /docs/ is the same page
+                page_report.append(f"WARN: Navigated to {cleaned_current_url} but landed on {page.url} (might be redirect).")
+                print(f"WARN: Navigated to {cleaned_current_url} but landed on {page.url} (might be redirect). Adding new URL to queue if not visited.")
+                add_url_to_queue(engine, page.url) # Add the redirected URL to be processed later if unique
+                return page_report # Skip current page analysis and actions if it's not the intended URL
+
+            # --- Take screenshot (with added error handling for timeouts) ---
+            screenshot_filename = os.path.basename(urlparse(page.url).path).replace('/', '_').replace('.', '_') or 'index'
+            screenshot_path = os.path.join(SCREENSHOT_DIR, f"page_{page_count}_{screenshot_filename}.png")
+            try: # <--- New try block for screenshot
+                await page.screenshot(path=screenshot_path, timeout=45000) # Increased timeout to 45 seconds
+                page_report.append(f"Screenshot saved: {screenshot_path}")
+            except PlaywrightTimeoutError:
+                page_report.append(f"FAIL: Screenshot timed out for {page.url}. Page might be slow to render or unresponsive.")
+                print(f"FAIL: Screenshot timed out for {page.url}.")
+            except Exception as screenshot_e:
+                page_report.append(f"ERROR: Failed to take screenshot for {page.url}: {screenshot_e}")
+                print(f"ERROR: Failed to take screenshot for {page.url}: {screenshot_e}")
+
+            # Get page source for AI analysis
+            page_source = await page.content()
+
+            # --- AI Content Analysis using the single user-defined prompt ---
+            page_report.append("\n--- AI Analysis (Direct Task) ---")
+            ai_analysis_page = await analysis_pipeline.submit(page_source, main_ai_prompt)
+            page_report.append(ai_analysis_page)
+
+            # --- Find and Queue New Links for further crawling ---
+            # One evaluate collects every link; resolving and filtering happen here in bulk
+            try:
+                links = await harvest_links(page)
+            except Exception as link_e:
+                links = []
+                page_report.append(f"WARN: Error collecting links on {page.url}: {link_e}")
+            for full_url in crawlable_urls(links, page.url, base_url, allow_external=CLICK_EXTERNAL_LINKS): # Use page.url for context
+                add_url_to_queue(engine, full_url)
+
+
+            # --- Click Buttons (Conditional Action) ---
+            if PERFORM_BUTTON_CLICKS:
+                buttons = await page.locator("button, input[type='button'], input[type='submit']").all()
+                for btn_index, button_locator in enumerate(buttons):
+                    try:
+                        # Skip submit buttons if form testing is enabled and we are handling forms separately
+                        if await button_locator.evaluate("el => el.closest('form')") and PERFORM_FORM_TESTING:
+                            continue
+
+                        if await button_locator.is_visible() and await button_locator.is_enabled():
+                            btn_text = await button_locator.text_content() or await button_locator.get_attribute("value") or f"Button {btn_index}"
+                            page_report.append(f"Attempting to click button: '{btn_text}' on {page.url}")
+                            print(f"Clicking button: '{btn_text}'")
+
+                            url_before_click = page.url
+                            await button_locator.click()
+                            await page.wait_for_load_state("domcontentloaded")
+                            await wait_until_settled(page, expect_navigation=True)
+
+                            if page.url != url_before_click:
+                                page_report.append(f"NOTE: Button click led to new URL: {page.url}. This URL will be processed in a future iteration.")
+                                add_url_to_queue(engine, page.url)
+                                # If a navigation occurred, we want the main loop to pick up the new URL.
+                                # We don't continue processing elements on this page.
+                                break # Exit button loop, effectively ending current page processing
+
+                            else:
+                                page_report.append(f"NOTE: Button click did not change URL on {page.url}.")
+
+                    except PlaywrightTimeoutError as e:
+                        page_report.append(f"FAIL: Button click failed (Timeout) for button {btn_index} on {page.url}: {e}")
+                    except Exception as e:
+                        page_report.append(f"ERROR: General error during button click for button {btn_index} on {page.url}: {e}")
+
+            # --- Test Forms on the Page (Conditional Action) ---
+            if PERFORM_FORM_TESTING:
+                forms = await page.locator("form").all()
+                for form_index, form_locator in enumerate(forms):
+                    page_report.append(f"\n--- Attempting basic form interaction for form {form_index} on {page.url} ---")
+                    try:
+                        # Fill text inputs and textareas
+                        text_inputs = form_locator.locator("input[type='text'], input[type='email'], input[type='password'], textarea")
+                        for i in range(await text_inputs.count()):
+                            if await text_inputs.nth(i).is_visible() and await text_inputs.nth(i).is_editable():
+                                await text_inputs.nth(i).fill("test_data")
+
+                        # Click checkboxes
+                        checkboxes = form_locator.locator("input[type='checkbox']")
+                        for i in range(await checkboxes.count()):
+                            if await checkboxes.nth(i).is_visible() and await checkboxes.nth(i).is_enabled():
+                                await checkboxes.nth(i).click()
+
+                        # Click radio buttons (selects the first visible/enabled one in a group)
+                        radios = form_locator.locator("input[type='radio']")
+                        for i in range(await radios.count()):
+                            if await radios.nth(i).is_visible() and await radios.nth(i).is_enabled():
+                                await radios.nth(i).click()
+                                break
+
+                        # Select options in dropdowns
+                        selects = form_locator.locator("select")
+                        for i in range(await selects.count()):
+                            if await selects.nth(i).is_visible() and await selects.nth(i).is_enabled():
+                                options = await selects.nth(i).locator("option").all_text_contents()
+                                if options:
+                                    await selects.nth(i).select_option(options[0])
+
+                        # Attempt to submit the form
+                        submit_button = form_locator.locator("input[type='submit'], button[type='submit']").first
+                        if await submit_button.is_visible() and await submit_button.is_enabled():
+                            page_report.append(f"Submitting form {form_index} on {page.url}...")
+                            url_before_submit = page.url
+                            await submit_button.click()
+                            await page.wait_for_load_state("domcontentloaded")
+                            await wait_until_settled(page, expect_navigation=True)
+
+                            page_report.append("\n--- AI Analysis: After Form Submission ---")
+                            ai_analysis_form_submit = await analysis_pipeline.submit(
+                                await page.content(),
+                                main_ai_prompt
+                            )
+                            page_report.append(ai_analysis_form_submit)
+
+                            if page.url != url_before_submit:
+                                page_report.append(f"NOTE: Form submission led to new URL: {page.url}. This URL will be processed in a future iteration.")
+                                add_url_to_queue(engine, page.url)
+                                # If a navigation occurred, we want the main loop to pick up the new URL.
+                                # We don't continue processing elements on this page.
+                                break # Exit form loop, effectively ending current page processing
+                            else:
+                                page_report.append(f"NOTE: Form submission did not change URL on {page.url}.")
+                        else:
+                            page_report.append(f"WARN: No clickable submit button found for form {form_index} on {page.url}.")
+
+                    except PlaywrightTimeoutError as e:
+                        page_report.append(f"FAIL: Form interaction failed (Timeout) for form {form_index} on {page.url}: {e}")
+                    except Exception as e:
+                        page_report.append(f"ERROR: General error during form interaction for form {form_index} on {page.url}: {e}")
+
+        except PlaywrightTimeoutError:
+            page_report.append(f"FAIL: Page {cleaned_current_url} did not load within timeout (30 seconds).")
+            # When a page load times out, we still try to take a screenshot if possible
+            screenshot_filename = os.path.basename(urlparse(cleaned_current_url).path).replace('/', '_').replace('.', '_') or 'index_timeout'
+            screenshot_path = os.path.join(SCREENSHOT_DIR, f"page_load_timeout_{page_count}_{screenshot_filename}.png")
+            try:
+                await page.screenshot(path=screenshot_path, timeout=5000) # Give a short timeout for screenshot
+                page_report.append(f"Screenshot saved for timeout page: {screenshot_path}")
+            except Exception as screenshot_e:
+                page_report.append(f"ERROR: Failed to take screenshot for timed-out page {cleaned_current_url}: {screenshot_e}")
+
+        except Exception as e:
+            page_report.append(f"ERROR: An unexpected error occurred while testing {cleaned_current_url}: {e}")
+            # Try to take a screenshot even on general errors
+            screenshot_filename = os.path.basename(urlparse(cleaned_current_url).path).replace('/', '_').replace('.', '_') or 'index_error'
+            screenshot_path = os.path.join(SCREENSHOT_DIR, f"page_error_{page_count}_{screenshot_filename}.png")
+            try:
+                await page.screenshot(path=screenshot_path, timeout=5000) # Give a short timeout for screenshot
+                page_report.append(f"Screenshot saved for error page: {screenshot_path}")
+            except Exception as screenshot_e:
+                page_report.append(f"ERROR: Failed to take screenshot for error page {cleaned_current_url}: {screenshot_e}")
+
+        return page_report
+
     # Playwright Context Manager
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=False) # Set to False for visible browser, True for headless
-        page = browser.new_page()
-        page.set_viewport_size({"width": 1280, "height": 800})
+    async with async_playwright() as p:
+        execution_profile = get_execution_profile(EXECUTION_PROFILE)
+        browser = await p.chromium.launch(**execution_profile.launch_options()) # Headless mode and browser flags come from the profile
+        # All crawl workers open their pages in this context, so they share one browser
+        context = await browser.new_context(**execution_profile.context_options()) # Viewport etc. from the profile
+        resource_policy = await apply_resource_policy(context, RESOURCE_POLICY) # Skip assets the crawl never looks at
 
         report_content.append(f"--- Starting AI Web Test (Playwright) ---")
         report_content.append(f"Timestamp: {time.ctime()}")
         report_content.append(f"Starting URL: {start_url}")
         report_content.append(f"Base Domain for Internal Crawling: {base_url}")
         report_content.append(f"AI Analysis Prompt: '{main_ai_prompt}'")
+        report_content.append(f"Execution Profile: {execution_profile.summary()}")
         report_content.append(f"Gemini Model Used: {GEMINI_MODEL}\n")
         report_content.append(f"Button Clicks Enabled: {PERFORM_BUTTON_CLICKS}")
         report_content.append(f"Form Testing Enabled: {PERFORM_FORM_TESTING}")
-        report_content.append(f"Number of Pre-defined Test Cases: {len(TEST_CASES_URLS)}\n")
+        report_content.append(f"Number of Pre-defined Test Cases: {len(TEST_CASES_URLS)}")
+        report_content.append(f"Crawl Concurrency: {CRAWL_CONCURRENCY}\n")
+
+        engine = CrawlEngine(
+            context,
+            test_page,
+            max_pages=MAX_PAGES_TO_VISIT,
+            concurrency=CRAWL_CONCURRENCY,
+            allow_url=lambda url: CLICK_EXTERNAL_LINKS or urlparse(url).netloc == urlparse(base_url).netloc,
+        )
 
         # --- Populate URLs to visit queue with test cases first ---
         for tc_url in TEST_CASES_URLS:
-            add_url_to_queue(tc_url)
+            add_url_to_queue(engine, tc_url)
 
         # Add the initial start_url to the queue if it's not already covered by test cases
-        add_url_to_queue(start_url)
-
-        page_count = 0
-
-        while urls_to_visit and page_count < MAX_PAGES_TO_VISIT:
-            current_url_to_process = urls_to_visit.popleft()
-            urls_in_queue.discard(current_url_to_process) # This URL is now being processed
-
-            # Normalize the URL for comparison and adding to visited_urls
-            normalized_current_url_to_process = urlparse(current_url_to_process)._replace(query='', fragment='').geturl()
-
-            if normalized_current_url_to_process in visited_urls:
-                print(f"DEBUG: Skipping already visited URL: {normalized_current_url_to_process}")
-                continue
-
-            if not CLICK_EXTERNAL_LINKS and urlparse(normalized_current_url_to_process).netloc != urlparse(base_url).netloc:
-                report_content.append(f"Skipping external URL (outside base domain): {normalized_current_url_to_process}")
-                continue
-
-            visited_urls.add(normalized_current_url_to_process) # Mark as visited *before* attempting goto
-            page_count += 1
-            report_content.append(f"\n--- Testing Page {page_count}: {normalized_current_url_to_process} ---")
-            print(f"Testing Page {page_count}: {normalized_current_url_to_process}")
-
-            try:
-                # --- Attempt Navigation ---
-                print(f"DEBUG: Navigating to: {normalized_current_url_to_process}")
-                page.goto(normalized_current_url_to_process, wait_until="domcontentloaded", timeout=30000)
-                time.sleep(3) # Give more buffer
-
-                # Verify actual URL after navigation
-                actual_url_after_goto = urlparse(page.url)._replace(query='', fragment='').geturl()
-                if actual_url_after_goto != normalized_current_url_to_process:
-                    report_content.append(f"WARN: Navigated to {normalized_current_url_to_process} but landed on {page.url} (might be redirect).")
-                    print(f"WARN: Navigated to {normalized_current_url_to_process} but landed on {page.url} (might be redirect). Adding new URL to queue if not visited.")
-                    add_url_to_queue(page.url) # Add the redirected URL to be processed later if unique
-                    continue # Skip current page analysis and actions if it's not the intended URL
-
-                # --- Take screenshot (with added error handling for timeouts) ---
-                screenshot_filename = os.path.basename(urlparse(page.url).path).replace('/', '_').replace('.', '_') or 'index'
-                screenshot_path = os.path.join(SCREENSHOT_DIR, f"page_{page_count}_{screenshot_filename}.png")
-                try: # <--- New try block for screenshot
-                    page.screenshot(path=screenshot_path, timeout=45000) # Increased timeout to 45 seconds
-                    report_content.append(f"Screenshot saved: {screenshot_path}")
-                except PlaywrightTimeoutError:
-                    report_content.append(f"FAIL: Screenshot timed out for {page.url}. Page might be slow to render or unresponsive.")
-                    print(f"FAIL: Screenshot timed out for {page.url}.")
-                except Exception as screenshot_e:
-                    report_content.append(f"ERROR: Failed to take screenshot for {page.url}: {screenshot_e}")
-                    print(f"ERROR: Failed to take screenshot for {page.url}: {screenshot_e}")
-
-                # Get page source for AI analysis
-                page_source = page.content()
-
-                # --- AI Content Analysis using the single user-defined prompt ---
-                report_content.append("\n--- AI Analysis (Direct Task) ---")
-                ai_analysis_page = analyze_content_with_ai(
-                    page_source,
-                    main_ai_prompt
-                )
-                report_content.append(ai_analysis_page)
-
-                # --- Find and Queue New Links for further crawling ---
-                links = page.locator("a").all()
-                for link_locator in links:
-                    try:
-                        href = link_locator.get_attribute("href")
-                        if href:
-                            full_url = urljoin(page.url, href) # Use page.url for context
-                            if (full_url.startswith("http://") or full_url.startswith("https://")) and \
-                               urlparse(full_url).fragment == '' and \
-                               (CLICK_EXTERNAL_LINKS or urlparse(full_url).netloc == urlparse(base_url).netloc):
-                                add_url_to_queue(full_url)
-
-                    except PlaywrightTimeoutError:
-                        continue
-                    except Exception as link_e:
-                        report_content.append(f"WARN: Error processing link on {page.url}: {link_e}")
-
-
-                # --- Click Buttons (Conditional Action) ---
-                if PERFORM_BUTTON_CLICKS:
-                    buttons = page.locator("button, input[type='button'], input[type='submit']").all()
-                    for btn_index, button_locator in enumerate(buttons):
-                        try:
-                            # Skip submit buttons if form testing is enabled and we are handling forms separately
-                            if button_locator.evaluate("el => el.closest('form')") and PERFORM_FORM_TESTING:
-                                continue
-
-                            if button_locator.is_visible() and button_locator.is_enabled():
-                                btn_text = button_locator.text_content() or button_locator.get_attribute("value") or f"Button {btn_index}"
-                                report_content.append(f"Attempting to click button: '{btn_text}' on {page.url}")
-                                print(f"Clicking button: '{btn_text}'")
-
-                                url_before_click = page.url
-                                button_locator.click()
-                                page.wait_for_load_state("domcontentloaded")
-                                time.sleep(3)
-
-                                if page.url != url_before_click:
-                                    report_content.append(f"NOTE: Button click led to new URL: {page.url}. This URL will be processed in a future iteration.")
-                                    add_url_to_queue(page.url)
-                                    # If a navigation occurred, we want the main loop to pick up the new URL.
-                                    # We don't continue processing elements on this page.
-                                    break # Exit button loop, effectively ending current page processing
-
-                                else:
-                                    report_content.append(f"NOTE: Button click did not change URL on {page.url}.")
-
-                        except PlaywrightTimeoutError as e:
-                            report_content.append(f"FAIL: Button click failed (Timeout) for button {btn_index} on {page.url}: {e}")
-                        except Exception as e:
-                            report_content.append(f"ERROR: General error during button click for button {btn_index} on {page.url}: {e}")
-
-                # --- Test Forms on the Page (Conditional Action) ---
-                if PERFORM_FORM_TESTING:
-                    forms = page.locator("form").all()
-                    for form_index, form_locator in enumerate(forms):
-                        report_content.append(f"\n--- Attempting basic form interaction for form {form_index} on {page.url} ---")
-                        try:
-                            # Fill text inputs and textareas
-                            text_inputs = form_locator.locator("input[type='text'], input[type='email'], input[type='password'], textarea")
-                            for i in range(text_inputs.count()):
-                                if text_inputs.nth(i).is_visible() and text_inputs.nth(i).is_editable():
-                                    text_inputs.nth(i).fill("test_data")
-
-                            # Click checkboxes
-                            checkboxes = form_locator.locator("input[type='checkbox']")
-                            for i in range(checkboxes.count()):
-                                if checkboxes.nth(i).is_visible() and checkboxes.nth(i).is_enabled():
-                                    checkboxes.nth(i).click()
-
-                            # Click radio buttons (selects the first visible/enabled one in a group)
-                            radios = form_locator.locator("input[type='radio']")
-                            for i in range(radios.count()):
-                                if radios.nth(i).is_visible() and radios.nth(i).is_enabled():
-                                    radios.nth(i).click()
-                                    break
-
-                            # Select options in dropdowns
-                            selects = form_locator.locator("select")
-                            for i in range(selects.count()):
-                                if selects.nth(i).is_visible() and selects.nth(i).is_enabled():
-                                    options = selects.nth(i).locator("option").all_text_contents()
-                                    if options:
-                                        selects.nth(i).select_option(options[0])
-
-                            # Attempt to submit the form
-                            submit_button = form_locator.locator("input[type='submit'], button[type='submit']").first
-                            if submit_button.is_visible() and submit_button.is_enabled():
-                                report_content.append(f"Submitting form {form_index} on {page.url}...")
-                                url_before_submit = page.url
-                                submit_button.click()
-                                page.wait_for_load_state("domcontentloaded")
-                                time.sleep(3)
-
-                                report_content.append("\n--- AI Analysis: After Form Submission ---")
-                                ai_analysis_form_submit = analyze_content_with_ai(
-                                    page.content(),
-                                    main_ai_prompt
-                                )
-                                report_content.append(ai_analysis_form_submit)
-
-                                if page.url != url_before_submit:
-                                    report_content.append(f"NOTE: Form submission led to new URL: {page.url}. This URL will be processed in a future iteration.")
-                                    add_url_to_queue(page.url)
-                                    # If a navigation occurred, we want the main loop to pick up the new URL.
-                                    # We don't continue processing elements on this page.
-                                    break # Exit form loop, effectively ending current page processing
-                                else:
-                                    report_content.append(f"NOTE: Form submission did not change URL on {page.url}.")
-                            else:
-                                report_content.append(f"WARN: No clickable submit button found for form {form_index} on {page.url}.")
-
-                        except PlaywrightTimeoutError as e:
-                            report_content.append(f"FAIL: Form interaction failed (Timeout) for form {form_index} on {page.url}: {e}")
-                        except Exception as e:
-                            report_content.append(f"ERROR: General error during form interaction for form {form_index} on {page.url}: {e}")
-
-            except PlaywrightTimeoutError:
-                report_content.append(f"FAIL: Page {normalized_current_url_to_process} did not load within timeout (30 seconds).")
-                # When a page load times out, we still try to take a screenshot if possible
-                screenshot_filename = os.path.basename(urlparse(normalized_current_url_to_process).path).replace('/', '_').replace('.', '_') or 'index_timeout'
-                screenshot_path = os.path.join(SCREENSHOT_DIR, f"page_load_timeout_{page_count}_{screenshot_filename}.png")
-                try:
-                    page.screenshot(path=screenshot_path, timeout=5000) # Give a short timeout for screenshot
-                    report_content.append(f"Screenshot saved for timeout page: {screenshot_path}")
-                except Exception as screenshot_e:
-                    report_content.append(f"ERROR: Failed to take screenshot for timed-out page {normalized_current_url_to_process}: {screenshot_e}")
-
-            except Exception as e:
-                report_content.append(f"ERROR: An unexpected error occurred while testing {normalized_current_url_to_process}: {e}")
-                # Try to take a screenshot even on general errors
-                screenshot_filename = os.path.basename(urlparse(normalized_current_url_to_process).path).replace('/', '_').replace('.', '_') or 'index_error'
-                screenshot_path = os.path.join(SCREENSHOT_DIR, f"page_error_{page_count}_{screenshot_filename}.png")
-                try:
-                    page.screenshot(path=screenshot_path, timeout=5000) # Give a short timeout for screenshot
-                    report_content.append(f"Screenshot saved for error page: {screenshot_path}")
-                except Exception as screenshot_e:
-                    report_content.append(f"ERROR: Failed to take screenshot for error page {normalized_current_url_to_process}: {screenshot_e}")
-
-
-        if page_count >= MAX_PAGES_TO_VISIT:
+        add_url_to_queue(engine, start_url)
+
+        await analysis_pipeline.start()
+        crawl_results = await engine.run()
+        await analysis_pipeline.close() # Wait for the last analyses to finish
+        for _, _, page_report in crawl_results:
+            report_content.extend(await resolve_report_lines(page_report))
+        for skipped_url in engine.skipped_urls:
+            report_content.append(f"Skipping external URL (outside base domain): {skipped_url}")
+        for trapped_url, reason in engine.trapped_urls.items():
+            report_content.append(f"Skipping possible crawler trap: {trapped_url} ({reason})")
+
+        if engine.page_count >= MAX_PAGES_TO_VISIT:
             report_content.append(f"\n--- Maximum pages to visit ({MAX_PAGES_TO_VISIT}) reached. Stopping traversal. ---")
         report_content.append("\n--- Automated Web Test Complete ---")
-        report_content.append(f"Total unique pages visited: {len(visited_urls)}")
+        report_content.append(f"Total unique pages visited: {len(engine.visited_urls)}")
         report_content.append(f"Button Clicks Performed: {PERFORM_BUTTON_CLICKS}")
         report_content.append(f"Form Testing Performed: {PERFORM_FORM_TESTING}")
 
-        browser.close()
+        report_content.append(f"Resource Policy: {resource_policy.summary()}")
+        await browser.close()
 
     # --- Generate Report ---
     print(f"\nWriting report to {REPORT_FILE}...")
@@ -344,4 +368,4 @@ def run_web_test_playwright():
     print(f"Check the '{SCREENSHOT_DIR}' directory for screenshots.")
 
 if __name__ == "__main__":
-    run_web_test_playwright()
\ No newline at end of file
+    asyncio.run(run_web_test_playwright())
\ No newline at end of file
@@ -2,11 +2,16 @@ import asyncio
 import json
 import re
 import os
-from playwright.async_api import async_playwright
+
+from plan_cache import get_cached_plan, store_plan
+from browser_pool import BrowserPool
+from execution_profiles import configured_profile_name, get_execution_profile
 
 # Import the Google Generative AI library
 import google.generativeai as genai
 
+from gemini_client import get_gemini_client
+
 # --- AI Model Configuration ---
 # Use the same model as specified in your existing script
 GEMINI_MODEL = "gemini-1.5-flash" 
@@ -20,13 +25,24 @@ except KeyError:
 
 # Initialize Gemini Model
 try:
-    gemini_model = genai.GenerativeModel(GEMINI_MODEL)
+    gemini_model = get_gemini_client(GEMINI_MODEL) # Rate-limited, retrying wrapper shared by all scripts
 except Exception as e:
     print(f"Error initializing Gemini model '{GEMINI_MODEL}': {e}")
     print("Please check if the model is available and your API key is correct.")
     exit()
 
 
+# --- Action Plan Cache ---
+USE_PLAN_CACHE = os.getenv("DISABLE_PLAN_CACHE") != "1" # Set DISABLE_PLAN_CACHE=1 to always ask Gemini for a fresh plan
+
+# --- Execution Profile ---
+EXECUTION_PROFILE = configured_profile_name("interactive") # See execution_profiles.py; the EXECUTION_PROFILE env var overrides
+execution_profile = get_execution_profile(EXECUTION_PROFILE)
+
+# --- Browser Pool ---
+browser_pool = BrowserPool(profile=execution_profile) # Browsers stay warm across run_automation calls; each task gets a fresh context
+
+
 # --- Helper function to infer generalized selectors ---
 
 def infer_generic_selectors(description: str) -> list[str]:
@@ -183,6 +199,12 @@ async def get_instructions_from_ai(prompt: str) -> dict:
             '`{"actions": [{"action": "navigate", "url": "https://example.com"}, {"action": "type", "selector_description": "username input field", "value": "myuser"}, {"action": "click", "selector_description": "Sign In button"}, {"action": "screenshot", "name": "final_page.png"}]}`'
         )
 
+        if USE_PLAN_CACHE:
+            cached_plan = get_cached_plan(prompt, GEMINI_MODEL, system_instruction)
+            if cached_plan is not None:
+                print("Using cached action plan for this instruction (skipping Gemini).")
+                return cached_plan
+
         print("Sending instruction to Gemini for action planning...")
         response = await gemini_model.generate_content_async( # Corrected: using async version
             f"{system_instruction}\n\nUser instruction: {prompt}"
@@ -193,7 +215,10 @@ async def get_instructions_from_ai(prompt: str) -> dict:
         if text.startswith("```json") and text.endswith("```"):
             text = text[7:-3].strip()
         
-        return json.loads(text)
+        plan = json.loads(text)
+        if USE_PLAN_CACHE and isinstance(plan, dict) and plan.get("actions"):
+            store_plan(prompt, GEMINI_MODEL, system_instruction, plan)
+        return plan
 
     except json.JSONDecodeError as e:
         print(f"Error decoding JSON from AI response: {e}")
@@ -258,9 +283,8 @@ async def run_automation(natural_language_instruction: str):
 
     print(f"\nAI generated actions: {json.dumps(actions, indent=2)}\n")
 
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=False)  # Set to True for silent execution
-        page = await browser.new_page()
+    async with browser_pool.context() as context:
+        page = await context.new_page()
 
         for step in actions:
             action = step.get("action")
@@ -325,11 +349,18 @@ async def run_automation(natural_language_instruction: str):
                 print(f"Unknown action '{action}', skipping.")
 
         print("Automation sequence finished.")
-        await browser.close()
 
 
 # --- Entry point ---
 
+async def run_and_shutdown(natural_language_instruction: str):
+    """Runs one instruction, then shuts the browser pool down."""
+    try:
+        await run_automation(natural_language_instruction)
+    finally:
+        await browser_pool.close()
+
+
 if __name__ == "__main__":
     print("\n--- Flexible AI-Powered Web Automation ---")
     print("This script uses Playwright for browser interaction and Google Gemini for understanding your instructions.")
@@ -350,4 +381,4 @@ if __name__ == "__main__":
         full_instruction_for_ai = ai_prompt_input
 
     # Run the asynchronous automation
-    asyncio.run(run_automation(full_instruction_for_ai))
\ No newline at end of file
+    asyncio.run(run_and_shutdown(full_instruction_for_ai))
\ No newline at end of file
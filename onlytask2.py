@@ -2,11 +2,21 @@ import asyncio
 import json
 import re
 import os
-from playwright.async_api import async_playwright
+from urllib.parse import urlparse
+
+from selector_race import race_selectors, MATCHED_SELECTOR_TIMEOUT
+from selector_cache import SelectorCache
+from selector_ranking import SelectorStats
+from plan_cache import get_cached_plan, store_plan
+from selector_rules import infer_generic_selectors
+from browser_pool import BrowserPool
+from execution_profiles import configured_profile_name, get_execution_profile
 
 # Import the Google Generative AI library
 import google.generativeai as genai
 
+from gemini_client import get_gemini_client
+
 # --- AI Model Configuration ---
 GEMINI_MODEL = "gemini-1.5-flash"
 
@@ -19,540 +29,33 @@ except KeyError:
 
 # Initialize Gemini Model
 try:
-    gemini_model = genai.GenerativeModel(GEMINI_MODEL)
+    gemini_model = get_gemini_client(GEMINI_MODEL) # Rate-limited, retrying wrapper shared by all scripts
 except Exception as e:
     print(f"Error initializing Gemini model '{GEMINI_MODEL}': {e}")
     print("Please check if the model is available and your API key is correct.")
     exit()
 
-# Global dictionary to store extracted data
-extracted_data = {}
+# --- Selector Resolution ---
+RACE_SELECTORS = True # Probe all candidate selectors at once instead of waiting on each one in turn
+USE_SELECTOR_CACHE = True # Reuse selectors that worked for the same description on the same site
+CACHED_SELECTOR_TIMEOUT = 5000 # A known-good selector should show up quickly; fall back to inference otherwise
+RANK_SELECTORS = True # Try inferred selectors in order of how often they've worked (per site, then overall), top-K first
 
-# --- Helper function to infer generalized selectors ---
+selector_cache = SelectorCache() if USE_SELECTOR_CACHE else None
+selector_stats = SelectorStats() if RANK_SELECTORS else None
 
-def infer_generic_selectors(description: str) -> list[str]:
-    """
-    Infers a list of potential Playwright selectors based on a natural language description.
-    This function is designed to be flexible and catch common patterns.
-    """
-    description_lower = description.lower()
-    selectors = []
-    current_url = os.getenv("CURRENT_URL", "").lower() # Get current URL for context
-    button_text_match = None 
-    input_label = None
-    # --- Common Elements & Actions ---
-    # Sign in/Log in buttons - generic approach
-    if 'sign in' in description_lower or 'log in' in description_lower or 'login' in description_lower:
-        # Prioritize visible, interactive elements that likely represent sign-in buttons
-        selectors += [
-            "button:has-text('Sign in')",
-            "button:has-text('Log in')",
-            "a:has-text('Sign in')",
-            "a:has-text('Log in')",
-            "[aria-label*='Sign in']",
-            "[aria-label*='Log in']",
-            "[data-testid*='login-button']",  # Common test ID pattern
-            "[data-tracking*='login']",  # Common analytics tracking pattern
-            ".login-button",  # Common class name
-            ".signin-button",
-            "[role='button']:has-text('Sign in')",  # For accessible buttons
-            "input[value*='Sign in'][type='submit']",  # Submit buttons
-            "input[value*='Log in'][type='submit']",
-            "nav a:has-text('Sign in')",  # In navigation
-            "header a:has-text('Sign in')",  # In header
-            "#login-button",  # Common ID
-            "#signin-button",
-            "button[type='button']:has-text('Sign in')",
-            "a[href*='login']",  # Links containing login
-            "a[href*='signin']",
-            "a[href*='auth']",  # Common auth paths
-        ]
-
-        # Add variations with different capitalizations
-        selectors += [
-            "button:has-text('Sign In')",
-            "button:has-text('Log In')",
-            "a:has-text('Sign In')",
-            "a:has-text('Log In')",
-        ]
-
-        # Add language variations
-        selectors += [
-            "button:has-text('Se connecter')",  # French
-            "button:has-text('Anmelden')",  # German
-            "button:has-text('Iniciar sesión')",  # Spanish
-        ]
-    
-    # Search bar/input field
-    if 'search bar' in description_lower or 'search input' in description_lower or 'search box' in description_lower:
-        if "amazon.in" in current_url or "amazon.com" in current_url:
-            selectors.append("#twotabsearchtextbox") # Amazon's main search bar ID
-        selectors += [
-            "input[type='search']",
-            "input[placeholder*='search']",
-            "input[aria-label*='search']",
-            "input[name*='search']",
-            "input#search",
-            "input.search-input",
-            "div.nav-search-field input", # Amazon specific
-            "input[role='searchbox']",
-            "form[role='search'] input",
-            "input[type='text'][name*='q']", # Common for search query
-            "input.query-input",
-        ]
-    # Search button
-    elif 'search button' in description_lower or 'submit search' in description_lower or 'search icon' in description_lower:
-        if "amazon.in" in current_url or "amazon.com" in current_url:
-            selectors += [".nav-search-submit input[type='submit']", "button[type='submit'][data-csa-c-type='widget']"]
-        selectors += [
-            "button:has-text('Search')",
-            "input[type='submit'][value*='Search']",
-            "button[aria-label*='Search']",
-            "a[aria-label*='Search']",
-            "button#search-button",
-            "button.search-submit",
-            "button[type='submit']",
-            "input[type='submit']",
-            "[role='button']:has-text('Search')",
-            "i.search-icon", # Common for icon-only search buttons
-            "button.search-icon",
-        ]
-
-    # --- Sorting/Filtering/Dropdowns ---
-    elif 'filter by' in description_lower or 'sort by' in description_lower or 'order by' in description_lower or 'cost high to low' in description_lower or 'price' in description_lower:
-        if 'dropdown' in description_lower or 'select' in description_lower or 'option' in description_lower:
-            selectors += [
-                "select[aria-label*='sort']",
-                "select[name*='sort']",
-                "select[id*='sort']",
-                "select.sort-by",
-                "select",
-                "div[role='combobox'][aria-haspopup='listbox']", # Common pattern for accessible custom dropdowns
-                "button:has-text('Sort by')", # If the dropdown is opened by a button
-                "a:has-text('Sort by')",    # If the dropdown is a link
-                "span:has-text('Sort by') ~ select", # If the label is a span next to the select
-                "div.select-wrapper select", # Common wrapper class
-                "div.dropdown-menu-button", # Generic dropdown trigger
-                "label:has-text('Sort by') + select", # Label preceding a select
-            ]
-            
-            # Extract the specific option text from the description if present
-            # e.g., "Sort by 'Price: High to Low'"
-            option_match = re.search(r"'(.*?)'", description)
-            option_text = option_match.group(1) if option_match else description.replace("sort by ", "").strip()
-
-            if option_text:
-                selectors += [
-                    f"option:has-text('{option_text}')",
-                    f"option[label='{option_text}']",
-                    f"option[value*='{option_text.lower().replace(' ', '_')}']", # for values like price_desc
-                    f"option[value*='{option_text.lower().replace(' ', '')}']", # for values like pricehightolow
-                    f"div[role='option']:has-text('{option_text}')", # for custom dropdowns
-                    f"a:has-text('{option_text}')", # for custom dropdowns where options are links
-                    f"button:has-text('{option_text}')", # for custom dropdowns where options are buttons
-                ]
-        # General price/cost related options that might not be in a dropdown directly
-        price_sort_keywords = ["price", "cost", "high to low", "low to high", "descending", "ascending"]
-        for keyword in price_sort_keywords:
-            if keyword in description_lower:
-                selectors += [
-                    f"button:has-text('{description}')", 
-                    f"a:has-text('{description}')",
-                    f"button:has-text('{keyword}')",
-                    f"a:has-text('{keyword}')",
-                    f"*[aria-label*='{keyword}'][role='button']",
-                    f"*[aria-label*='{keyword}'][role='link']",
-                    f".sort-option:has-text('{description}')", 
-                    f".filter-option:has-text('{description}')",
-                ]
-        # Add general text-based selector for the dropdown if no specific element is inferred
-        if 'dropdown' in description_lower:
-            selectors.append(f"text='{description.replace('dropdown', '').strip()}'")
-
-
-    # --- Brand/Filter Checkboxes/Links ---
-    # --- Brand/Filter Checkboxes/Links ---
-    # This section is generally for any type of filter, including checkboxes.
-    # We can generalize the text extraction for checkboxes here.
-    elif 'brand' in description_lower or 'filter by brand' in description_lower or 'checkbox' in description_lower or 'terms' in description_lower or 'agree' in description_lower:
-        # Extract the specific name/label from the description for the checkbox/filter
-        # e.g., "checkbox labeled 'Boat'" or "click 'I agree to terms'"
-        # Use a more generic regex to capture the label for checkboxes/links
-        
-        # Priority 1: Text within single quotes (e.g., 'Boat', 'I agree to the terms')
-        label_match = re.search(r"'(.*?)'", description_lower)
-        extracted_label_text = label_match.group(1).strip() if label_match else None
-
-        # Priority 2: Common checkbox phrases if no quoted text was found
-        if not extracted_label_text:
-            if 'checkbox for' in description_lower:
-                match = re.search(r"checkbox for\s*(.*?)(?:\s+in|\s+section)?", description_lower)
-                if match: extracted_label_text = match.group(1).strip()
-            elif 'checkbox labeled' in description_lower:
-                match = re.search(r"checkbox labeled\s*(.*?)(?:\s+in|\s+section)?", description_lower)
-                if match: extracted_label_text = match.group(1).strip()
-            # Add more common phrases if needed, e.g., "accept terms", "subscribe to newsletter"
-
-        # Priority 3: Infer common 'terms' or 'agree' texts if keywords are present but no specific label found
-        if not extracted_label_text and ('terms' in description_lower or 'agree' in description_lower):
-            if 'agree to the terms' in description_lower:
-                extracted_label_text = 'agree to the terms'
-            elif 'terms and conditions' in description_lower:
-                extracted_label_text = 'terms and conditions'
-            # Add more specific common terms related to checkboxes if necessary
-
-        # Now, use the extracted_label_text for generating selectors
-        if extracted_label_text:
-            # Selectors for a checkbox/radio button labeled with extracted_label_text
-            selectors += [
-                f"input[type='checkbox'][value*='{extracted_label_text}']",
-                f"input[type='radio'][value*='{extracted_label_text}']",
-                f"label:has-text('{extracted_label_text}') input[type='checkbox']", # checkbox with adjacent label
-                f"label:has-text('{extracted_label_text}') input[type='radio']",
-                f"div.a-checkbox:has-text('{extracted_label_text}') input", # Amazon-specific checkbox
-                f"span.a-checkbox-label:has-text('{extracted_label_text}') input", # Another Amazon-specific checkbox
-                f"input[type='checkbox'][aria-label*='{extracted_label_text}']",
-                f"input[type='radio'][aria-label*='{extracted_label_text}']",
-                
-                # --- NEW/IMPROVED SELECTORS FOR CHECKBOXES ---
-                # XPath to find a checkbox associated with a label containing the text
-                f"//label[contains(., '{extracted_label_text}')]/input[@type='checkbox']", 
-                # Find a checkbox input that is a descendant of a div containing the text
-                f"div:has-text('{extracted_label_text}') input[type='checkbox']",
-                # Find a checkbox input that is a descendant of a span containing the text
-                f"span:has-text('{extracted_label_text}') input[type='checkbox']",
-            ]
-            
-            # Selectors for a link/button representing a brand filter (these still use brand_name contextually)
-            # We keep these separate because they are specifically for links/buttons, not necessarily checkboxes.
-            # If the extracted_label_text is used for a "brand" context, these apply.
-            selectors += [
-                f"a:has-text('{extracted_label_text}')",
-                f"button:has-text('{extracted_label_text}')",
-                f"div.s-navigation-item-label:has-text('{extracted_label_text}') a", # Amazon-specific link
-                f"li:has-text('{extracted_label_text}') a", # Link within a list item
-                f"[data-csa-c-content-id*='{extracted_label_text}']", # Common data attribute for filters
-                f".brand-name:has-text('{extracted_label_text}')", # Common class for brand names
-            ]
-        
-        # General brand filter section selectors (if description is less specific)
-        # These are usually for finding the *section* itself, not a specific checkbox within it.
-        # It's fine for these to remain somewhat generic.
-        selectors += [
-            "div.s-filters div.s-card-border:has-text('Brand')", # Amazon-like brand filter section
-            "section:has-text('Brand')",
-            "#brandsRefinements", # Common ID for brand filter sections
-            ".brand-filter-section",
-            ".s-navigation-group:has-text('Brand')", # Another Amazon-specific navigation group
-            "[aria-label*='Brand filter']",
-            "h3:has-text('Brand') + div", # Section title followed by filter options
-            "h2:has-text('Brand') + div",
-        ]
-        
-        # Fallback if only 'checkbox' is mentioned without a specific label (and no label was extracted)
-        # This will add generic checkbox selectors if no specific text was identified
-        if 'checkbox' in description_lower and not extracted_label_text:
-            selectors += ["input[type='checkbox']", "[role='checkbox']"]
-
-
-    # --- Extracting Information Selectors ---
-    elif 'product title' in description_lower:
-        selectors += [
-            ".product-title", ".product__title", "h1.title", "h2.product-name",
-            "[data-test='product-title']", "a.product-link",
-            "span[itemprop='name']", "h3.item-name",
-            ".a-color-base.a-text-normal", # Amazon specific search result titles
-            "a.a-link-normal.a-text-normal", # Another Amazon specific for links with titles
-        ]
-        selectors.append(".product-grid .product-title")
-        selectors.append(".product-list .product-title")
-        selectors.append(".s-main-result .s-title-instructions") # Amazon search result title
-        
-    elif 'product price' in description_lower or 'item price' in description_lower:
-        selectors += [
-            ".price", ".product-price", "span.price", "div.price",
-            "[data-test='product-price']",
-            "span[itemprop='price']", "span[data-a-color='price']",
-            "span.final-price", ".offer-price",
-            ".a-price-whole", ".a-price-fraction", ".a-price-symbol", # Amazon price parts
-            ".a-offscreen", # Sometimes prices are hidden for accessibility
-        ]
-        selectors.append(".product-grid .price")
-        selectors.append(".product-list .price")
-        selectors.append(".s-main-result .a-price") # Amazon search result price
-        
-    elif 'product description' in description_lower:
-        selectors += [
-            ".product-description", "#product-description", "div.description",
-            "div[itemprop='description']", ".details-content",
-            "#feature-bullets", "#productDescription", # Amazon specific
-            ".product-specs", ".item-details",
-        ]
-    elif 'image' in description_lower:
-        selectors += [
-            "img[alt*='product']", "img.product-image", ".product-gallery img",
-            "img[role='img']", "img[srcset]",
-            "img.s-image", # Amazon search result images
-        ]
-    elif 'review' in description_lower:
-        selectors += [
-            ".review-text", ".customer-review", ".review-body",
-            "[data-hook='review-body']", # Amazon specific
-            ".cr-review-text", ".review-comment",
-        ]
-    elif 'all' in description_lower and ('products' in description_lower or 'items' in description_lower):
-        selectors += [
-            ".s-main-result", # Amazon search results container
-            ".product-grid .product-card", 
-            ".product-list .product-item",
-            "[data-asin]", "[data-item-id]", # Common e-commerce item attributes
-            ".product-tile", ".search-result-item",
-            ".item-cell", ".grid-item",
-        ]
-
-    # --- Navigation & General Interaction ---
-    if 'navbar' in description_lower or 'navigation' in description_lower:
-        selectors += ['nav', '[role="navigation"]', '.navbar', '#main-navigation', '.header-nav']
-
-    if 'link' in description_lower or 'menu item' in description_lower or 'tab' in description_lower:
-        match = re.search(r'(?:link|menu item|tab|go to) ?\'?\"?([^\']+)\'?\"?', description_lower)
-        if match:
-            text = match.group(1)
-            selectors += [
-                f"a:has-text('{text}')",
-                f"nav a:has-text('{text}')",
-                f"li a:has-text('{text}')",
-                f"div[role='tab']:has-text('{text}')",
-                f"button:has-text('{text}')[role='link']", 
-                f"[aria-label*='{text}'][role='link']",
-                f"link[rel='{text}']", # For actual link tags
-            ]
-        selectors += ['a', 'nav a', 'li a', '[role="tab"]'] 
-
-    if 'button' in description_lower:
-        # Improved button text extraction
-        button_text_match = re.search(r'button(?: labeled| with text)?\s*\'?\"?([^\']+)\'?\"?', description_lower)
-        button_text = button_text_match.group(1) if button_text_match else None
-
-        if button_text:
-            selectors += [
-                f"button:has-text('{button_text}')",
-                f"input[type=submit][value*='{button_text}']",
-                f"button[name*='{button_text}']", 
-                f"*[aria-label*='{button_text}'][role='button']",
-                f"a[role='button']:has-text('{button_text}')", # link styled as button
-                f"button[aria-label*='{button_text}']"
-                
- 
-            ]
-        else: # Generic button selectors if no specific text is found
-            selectors += ['button', 'input[type=submit}', '[role="button"]']
-
-    if 'cart' in description_lower or 'checkout' in description_lower or 'add to cart' in description_lower:
-        selectors += [
-            'div.cart-item', 'li.cart-item', '#cart', '[aria-label="cart"]', '.cart-icon', '.shopping-cart',
-            'a:has-text("Cart")', 'button:has-text("Cart")',
-            'a:has-text("Checkout")', 'button:has-text("Checkout")',
-            '#add-to-cart-button', '.add-to-cart', 'button:has-text("Add to Cart")',
-        ]
-
-    if 'modal' in description_lower or 'dialog' in description_lower or 'popup' in description_lower:
-        selectors += ['div[role="dialog"]', '.modal', '.dialog', '[aria-modal="true"]', '#modal', '.popup', '[data-modal-id]']
-    
-    # Inside infer_generic_selectors function
+# --- Action Plan Cache ---
+USE_PLAN_CACHE = os.getenv("DISABLE_PLAN_CACHE") != "1" # Set DISABLE_PLAN_CACHE=1 to always ask Gemini for a fresh plan
 
-# --- Text Input Fields (username, email, password, general textboxes) ---
-    if 'input field' in description_lower or 'textbox' in description_lower or 'input' in description_lower:
-        input_label = None # Initialize to None
+# --- Execution Profile ---
+EXECUTION_PROFILE = configured_profile_name("interactive") # See execution_profiles.py; the EXECUTION_PROFILE env var overrides
+execution_profile = get_execution_profile(EXECUTION_PROFILE)
 
-    # 1. Try to extract exact quoted text (e.g., 'First name', 'Email address')
-    label_match_quoted = re.search(r"'(.*?)' (?:input|text)?(?:field|box)", description_lower)
-    if label_match_quoted:
-        input_label = label_match_quoted.group(1).strip().lower()
-    else:
-        # 2. Try to extract common patterns like 'email input', 'password field'
-        # Note: 'Password' should be handled first due to type='password'
-        common_labels = ["password", "email address", "email", "first name", "last name", "company name", "username"]
-        for common_label in common_labels:
-            if common_label in description_lower:
-                input_label = common_label
-                break
-
-    # --- IMPORTANT: Handle password fields FIRST and with high specificity ---
-        if 'password' in description_lower:
-             selectors += [
-            "input[type='password']", # Most specific: exact type
-            "input[name*='password']", # Common name pattern
-            "input[id*='password']",   # Common ID pattern
-            "input[placeholder*='Password']", # Common placeholder
-            "label:has-text('Password') + input[type='password']", # Label + specific type
-        ]
-        if 'confirm' in description_lower: # For confirm password if it exists
-            selectors += [
-                "input[type='password'][name*='confirm']",
-                "input[type='password'][id*='confirm']",
-                "input[placeholder*='Confirm Password']",
-                "label:has-text('Confirm Password') + input[type='password']",
-            ]
-         # Important: If it's a password field, we're done here, return its specific selectors.
-                        # This prevents generic selectors from being added to it.
-
-
-    # --- Handle other specific input fields (First name, Last name, Email, Company) ---
-    if input_label:
-        # Use Playwright's `has-placeholder` which is very effective
-        if input_label == 'first name':
-            selectors.append("input[placeholder*='First name']")
-            selectors.append("input[name*='first_name']")
-            selectors.append("input[id*='first_name']")
-            selectors.append("label:has-text('First name') + input")
-        elif input_label == 'last name':
-            selectors.append("input[placeholder*='Last name']")
-            selectors.append("input[name*='last_name']")
-            selectors.append("input[id*='last_name']")
-            selectors.append("label:has-text('Last name') + input")
-        elif input_label == 'email' or input_label == 'email address':
-            selectors.append("input[type='email']") # Prioritize specific type
-            selectors.append("input[placeholder*='Email address']")
-            selectors.append("input[name*='email']")
-            selectors.append("input[id*='email']")
-            selectors.append("label:has-text('Email address') + input")
-        elif input_label == 'company name':
-            selectors.append("input[placeholder*='Company name']")
-            selectors.append("input[name*='company']")
-            selectors.append("input[id*='company']")
-            selectors.append("label:has-text('Company name') + input")
-        elif input_label == 'username':
-            selectors.append("input[placeholder*='Username']")
-            selectors.append("input[name*='username']")
-            selectors.append("input[id*='username']")
-            selectors.append("label:has-text('Username') + input")
-
-        # Add a generic fallback for any extracted label that wasn't explicitly handled above
-        # This should be *after* specific matches, but before truly generic inputs
-        selectors.append(f"input[placeholder*='{input_label}']") # General placeholder match
-        selectors.append(f"label:has-text('{input_label}') + input") # General label + input match
-
-    # --- General / Fallback text input selectors (lowest priority) ---
-    # These should only be used if no specific label was identified and matched
-    if not selectors: # Only add if no specific selectors have been added yet
-        selectors.append("input[type='text']") # Broadest text input type
-        selectors.append("textarea")
-        selectors.append("input") # Matches ANY input, should be last resort if used at all here
-    # Fallback to direct text or partial text match if no specific selectors were inferred
-    if not selectors or not any(s for s in selectors if not s.startswith("text=") and not s.startswith(":has-text=")):    
-        # Only add generic text selectors if no more specific selectors were found
-        selectors.append(f"text='{description}'")
-        selectors.append(f":has-text('{description}')")
-    if 'button' in description_lower:
-        # Regex to capture text like 'button "TEXT"', 'button labeled "TEXT"', 'the "TEXT" button'
-        # This regex is a bit more robust for various phrasings
-        button_text_match = re.search(r'(?:button(?: labeled| with text)?|the)\s*\'?\"?([^\']+)\'?\"?\s*button', description_lower)
-        # If the above doesn't work, try just capturing text after 'button'
-        if not button_text_match:
-            button_text_match = re.search(r'button\s*\'?\"?([^\']+)\'?\"?', description_lower)
-
-        button_text = button_text_match.group(1) if button_text_match else None
-
-        if button_text:
-            # Prioritize selectors based on visible text
-            selectors += [
-                f"button:has-text('{button_text}')",
-                f"a[role='button']:has-text('{button_text}')", # link styled as button
-                f"input[type=submit][value='{button_text}']", # Exact value match for submit inputs
-                f"input[type=button][value='{button_text}']", # Exact value match for button inputs
-                f"*[aria-label='{button_text}'][role='button']", # Exact aria-label match
-                f"button[name='{button_text}']", # Exact name match
-                f"#signup-button",
-                # Then exact text matches
-                f"button:has-text('{button_text}')",
-                f"a[role='button']:has-text('{button_text}')", 
-                f"input[type=submit][value='{button_text}']", 
-                 # ... and so on
-            ]
-            # Add partial matches if exact doesn't work, but they are less precise
-            selectors += [
-                f"button:has-text('{button_text.lower()}')", # Case-insensitive text
-                f"button[name*='{button_text}']", # Partial name match
-                f"*[aria-label*='{button_text}'][role='button']", # Partial aria-label match
-                f"button[aria-label*='{button_text}']",
-                f"input[type=submit][value*='{button_text}']", # Partial value match
-            ]
-        else: # Generic button selectors if no specific text is found
-            # Ensure the typo is fixed here
-            selectors += ['button', 'input[type=submit]', '[role="button"]', 'input[type=button]']
-
-    # Your line 350 (or similar) check:
-    # This specific line `if not button_text_match:` implies that if no button text was extracted,
-    # you might want to add other selectors or handle that case.
-    # Given the new robust text extraction, this might be less critical.
-    # Ensure this block doesn't overwrite your primary button selectors.
-    if not button_text_match and 'button' in description_lower: # Only if 'button' was mentioned but no text
-         selectors += ['button', 'input[type=submit]', '[role="button"]', 'input[type=button]']
-
-
-    # --- Input related logic ---
-    # This is where your input_label would be assigned.
-    # Example (adjust based on your actual code for input field recognition):
-    if any(word in description_lower for word in ['input', 'field', 'text box']):
-        # Attempt to extract text like "First name input field" or "Email address"
-        input_label_match = re.search(r'(?:input|field|text box)\s*(?:labeled|with text)?\s*\'?\"?([^\']+)\'?\"?', description_lower)
-        if not input_label_match: # Try capturing just the label if "input/field" isn't present
-             input_label_match = re.search(r'\"?([^\"]+)\"?\s*(?:input|field|text box)', description_lower)
-
-        input_label = input_label_match.group(1) if input_label_match else None
-
-    if input_label:
-        # Generate selectors for input fields based on the extracted label
-        selectors += [
-            f"input[placeholder*='{input_label}']",
-            f"input[name*='{input_label}']",
-            f"input[id*='{input_label}']",
-            f"label:has-text('{input_label}') + input",
-            f"input[placeholder*='{input_label.lower()}']",
-            f"label:has-text('{input_label.lower()}') + input",
-            f"*[aria-label*='{input_label}']",
-            f"input[data-qa*='{input_label}']", # Common for QA/test automation attributes
-            f"textarea[name*='{input_label}']", # Also consider textareas
-            f"textarea[id*='{input_label}']"
-        ]
-    else:
-        # Generic input selectors if no specific label is found
-        selectors += [
-            'input[type="text"]', 
-            'input[type="email"]', 
-            'input[type="password"]', 
-            'textarea',
-            'input' # generic input selector
-        ]
-
-    # --- Checkbox related logic ---
-    if 'checkbox' in description_lower:
-        checkbox_label_match = re.search(r'checkbox(?: next to| labeled)?\s*\'?\"?([^\']+)\'?\"?', description_lower)
-        checkbox_label = checkbox_label_match.group(1) if checkbox_label_match else None
-
-        if checkbox_label:
-            selectors += [
-                f"input[type='checkbox']:has(~ label:has-text('{checkbox_label}'))", # Checkbox with sibling label
-                f"input[type='checkbox']:has-text('{checkbox_label}')", # Direct text (less common for checkboxes)
-                f"label:has-text('{checkbox_label}') > input[type='checkbox']", # Checkbox inside label
-                f"input[type='checkbox'][aria-label*='{checkbox_label}']",
-                f"*[role='checkbox'][aria-label*='{checkbox_label}']",
-                f"input[type='checkbox'][name*='{checkbox_label}']",
-                f"input[type='checkbox'][id*='{checkbox_label}']"
-            ]
-        else:
-            selectors += ["input[type='checkbox']", "[role='checkbox']"]
-    # Remove duplicates while preserving order
-    seen = set()
-    result = []
-    for sel in selectors:
-        if sel not in seen:
-            seen.add(sel)
-            result.append(sel)
-
-    return result
+# --- Browser Pool ---
+browser_pool = BrowserPool(profile=execution_profile) # Browsers stay warm across run_automation calls; each task gets a fresh context
 
+# Global dictionary to store extracted data
+extracted_data = {}
 
 # --- AI function using Gemini ---
 
@@ -586,6 +89,12 @@ async def get_instructions_from_ai(prompt: str) -> dict:
             "If the user asks to 'randomly select/check all checkboxes', you should generate separate 'click' actions for each, identifying them by common descriptions (e.g., 'terms and conditions checkbox', 'newsletter opt-in checkbox').\n"        
         )
 
+        if USE_PLAN_CACHE:
+            cached_plan = get_cached_plan(prompt, GEMINI_MODEL, system_instruction)
+            if cached_plan is not None:
+                print("Using cached action plan for this instruction (skipping Gemini).")
+                return cached_plan
+
         print("Sending instruction to Gemini for action planning...")
         response = await gemini_model.generate_content_async(
             f"{system_instruction}\n\nUser instruction: {prompt}"
@@ -596,7 +105,10 @@ async def get_instructions_from_ai(prompt: str) -> dict:
         if text.startswith("```json") and text.endswith("```"):
             text = text[7:-3].strip()
             
-        return json.loads(text)
+        plan = json.loads(text)
+        if USE_PLAN_CACHE and isinstance(plan, dict) and plan.get("actions"):
+            store_plan(prompt, GEMINI_MODEL, system_instruction, plan)
+        return plan
 
     except json.JSONDecodeError as e:
         print(f"Error decoding JSON from AI response: {e}")
@@ -609,11 +121,20 @@ async def get_instructions_from_ai(prompt: str) -> dict:
 
 # --- Utility: try selectors one by one until success ---
 
-async def try_selectors(page, selectors, action_type, value=None, timeout=15000):
+async def try_selectors(page, selectors, action_type, value=None, timeout=15000, race=RACE_SELECTORS):
     """
     Attempts to perform a Playwright action using a list of selectors in order,
     stopping at the first successful attempt.
+    With race=True all candidates are resolved concurrently first, so only the
+    selectors actually present on the page are tried.
+    Returns the selector that succeeded, or False if none did.
     """
+    if race and len(selectors) > 1:
+        # Presence is enough for wait/assert/extract, like the wait_for_selector calls below
+        race_state = 'visible' if action_type in ['click', 'type', 'select'] else 'attached'
+        selectors = await race_selectors(page, selectors, state=race_state, timeout=timeout)
+        timeout = MATCHED_SELECTOR_TIMEOUT
+
     for sel in selectors:
         try:
             # Wait for the element to be visible before interacting for click/type/select
@@ -630,28 +151,28 @@ async def try_selectors(page, selectors, action_type, value=None, timeout=15000)
             if action_type == 'click':
                 await page.click(sel)
                 print(f"Successfully clicked using selector: {sel}")
-                return True
+                return sel
             elif action_type == 'wait':
                 print(f"Successfully waited for element using selector: {sel}")
-                return True
+                return sel
             elif action_type == 'assert':
                 print(f"Successfully asserted element presence using selector: {sel}")
-                return True
+                return sel
             elif action_type == 'type':
                 await page.fill(sel, value)
                 print(f"Successfully typed '{value}' into selector: {sel}")
-                return True
+                return sel
             elif action_type == 'select': 
                 # CRITICAL CHANGE: Try selecting by label first, then by value
                 try:
                     await page.select_option(sel, label=value) # Try by visible text
                     print(f"Successfully selected option '{value}' from selector: {sel} by label.")
-                    return True
+                    return sel
                 except Exception:
                     try:
                         await page.select_option(sel, value=value) # Try by value attribute
                         print(f"Successfully selected option '{value}' from selector: {sel} by value.")
-                        return True
+                        return sel
                     except Exception as inner_e:
                         # Continue to the next selector if both label and value fail for the current selector
                         # This print helps in debugging which specific selector failed for select
@@ -677,7 +198,7 @@ async def try_selectors(page, selectors, action_type, value=None, timeout=15000)
                     else:
                         print(f"Extracted no text for '{value}' using selector '{sel}'")
                         extracted_data[value] = None
-                return True # Extraction considered successful even if no text found for a single element
+                return sel # Extraction considered successful even if no text found for a single element
 
         except Exception as e:
             # print(f"Selector '{sel}' failed for action '{action_type}': {e}") # Uncomment for more verbose debugging
@@ -687,6 +208,41 @@ async def try_selectors(page, selectors, action_type, value=None, timeout=15000)
     return False
 
 
+async def try_cached_selectors(page, desc, action_type, value=None):
+    """
+    Runs an action on the element described by `desc`, trying the selector that worked
+    last time on this host before falling back to the full inferred selector list.
+    """
+    host = urlparse(page.url).netloc
+    if selector_cache:
+        cached_selector = selector_cache.lookup(host, action_type, desc)
+        if cached_selector:
+            print(f"Using cached selector for '{desc}' on {host}: {cached_selector}")
+            if await try_selectors(page, [cached_selector], action_type, value=value, timeout=CACHED_SELECTOR_TIMEOUT):
+                selector_cache.record_success(host, action_type, desc, cached_selector)
+                return True
+            print(f"Cached selector '{cached_selector}' no longer works, inferring selectors again.")
+            selector_cache.record_failure(host, action_type, desc)
+
+    selectors = infer_generic_selectors(desc)
+    remaining = []
+    if selector_stats and RACE_SELECTORS:
+        selectors = selector_stats.rank(selectors, host) # A race costs one timeout however many candidates it has, so the top K would only drop matches
+    elif selector_stats:
+        selectors, remaining = selector_stats.shortlist(selectors, host)
+    print(f"Inferred selectors for '{desc}': {selectors}")
+    winning_selector = await try_selectors(page, selectors, action_type, value=value)
+    if not winning_selector and remaining:
+        print(f"Top {len(selectors)} selectors failed, trying the {len(remaining)} lower-ranked ones.")
+        selectors = selectors + remaining
+        winning_selector = await try_selectors(page, remaining, action_type, value=value)
+    if selector_stats:
+        selector_stats.record(host, selectors, winning_selector or None)
+    if winning_selector and selector_cache:
+        selector_cache.record_success(host, action_type, desc, winning_selector)
+    return bool(winning_selector)
+
+
 # --- Main automation runner ---
 
 async def run_automation(natural_language_instruction: str):
@@ -704,9 +260,8 @@ async def run_automation(natural_language_instruction: str):
 
     print(f"\nAI generated actions: {json.dumps(actions, indent=2)}\n")
 
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=False)  # Set to True for silent execution
-        page = await browser.new_page()
+    async with browser_pool.context() as context:
+        page = await context.new_page()
 
         for step in actions:
             action = step.get("action")
@@ -730,10 +285,9 @@ async def run_automation(natural_language_instruction: str):
                     print(f"Missing selector_description for action {action}, skipping.")
                     continue
 
-                selectors = infer_generic_selectors(desc)
-                print(f"Attempting to '{action}' on: '{desc}' using selectors: {selectors}")
+                print(f"Attempting to '{action}' on: '{desc}'")
 
-                success = await try_selectors(page, selectors, action)
+                success = await try_cached_selectors(page, desc, action)
                 if not success:
                     print(f"Critical: Failed to {action} on '{desc}'. Automation stopping.")
                     await page.screenshot(path=f"failure_{action}_{desc.replace(' ', '_').replace('/', '_')}.png")
@@ -746,10 +300,9 @@ async def run_automation(natural_language_instruction: str):
                     print(f"Missing selector_description or value for action {action}, skipping.")
                     continue
                 
-                selectors = infer_generic_selectors(desc)
-                print(f"Attempting to '{action}' '{value}' into: '{desc}' using selectors: {selectors}")
+                print(f"Attempting to '{action}' '{value}' into: '{desc}'")
 
-                success = await try_selectors(page, selectors, action, value=value)
+                success = await try_cached_selectors(page, desc, action, value=value)
                 if not success:
                     print(f"Critical: Failed to {action} '{value}' into '{desc}'. Automation stopping.")
                     await page.screenshot(path=f"failure_{action}_{desc.replace(' ', '_').replace('/', '_')}.png")
@@ -762,10 +315,9 @@ async def run_automation(natural_language_instruction: str):
                     print(f"Missing selector_description or value for action {action}, skipping.")
                     continue
                 
-                selectors = infer_generic_selectors(desc)
-                print(f"Attempting to '{action}' option '{value}' from: '{desc}' using selectors: {selectors}")
+                print(f"Attempting to '{action}' option '{value}' from: '{desc}'")
 
-                success = await try_selectors(page, selectors, action, value=value)
+                success = await try_cached_selectors(page, desc, action, value=value)
                 if not success:
                     print(f"Critical: Failed to {action} option '{value}' from '{desc}'. Automation stopping.")
                     await page.screenshot(path=f"failure_{action}_{desc.replace(' ', '_').replace('/', '_')}.png")
@@ -830,10 +382,9 @@ async def run_automation(natural_language_instruction: str):
                     print(f"Missing selector_description or name for action {action}, skipping.")
                     continue
                 
-                selectors = infer_generic_selectors(desc)
-                print(f"Attempting to '{action}' data for '{name}' from: '{desc}' using selectors: {selectors}")
+                print(f"Attempting to '{action}' data for '{name}' from: '{desc}'")
 
-                success = await try_selectors(page, selectors, action, value=name) # Pass 'name' as value to try_selectors
+                success = await try_cached_selectors(page, desc, action, value=name) # Pass 'name' as value to try_selectors
                 if not success:
                     print(f"Warning: Failed to {action} data for '{name}' from '{desc}'. Continuing automation.")
                     # We don't make extraction critical failure unless explicitly required
@@ -851,8 +402,7 @@ async def run_automation(natural_language_instruction: str):
                 print(f"Unknown action '{action}', skipping.")
 
         print("Automation sequence finished.")
-        await browser.close()
-        
+
         if extracted_data:
             print("\n--- Extracted Data ---")
             for key, value in extracted_data.items():
@@ -862,6 +412,16 @@ async def run_automation(natural_language_instruction: str):
 
 # --- Entry point ---
 
+async def run_and_shutdown(natural_language_instruction: str):
+    """Runs one instruction, then shuts the browser pool down."""
+    try:
+        await run_automation(natural_language_instruction)
+    finally:
+        await browser_pool.close()
+        if selector_stats:
+            selector_stats.save() # Writes what the last SELECTOR_STATS_SAVE_INTERVAL held back
+
+
 if __name__ == "__main__":
     print("\n--- Flexible AI-Powered Web Automation ---")
     print("This script uses Playwright for browser interaction and Google Gemini for understanding your instructions.")
@@ -877,4 +437,4 @@ if __name__ == "__main__":
     else:
         full_instruction_for_ai = ai_prompt_input
 
-    asyncio.run(run_automation(full_instruction_for_ai))
\ No newline at end of file
+    asyncio.run(run_and_shutdown(full_instruction_for_ai))
\ No newline at end of file
@@ -2,11 +2,21 @@ import asyncio
 import json
 import re
 import os
-from playwright.async_api import async_playwright
+import time
+from urllib.parse import urlparse
+
+from selector_race import race_selectors, MATCHED_SELECTOR_TIMEOUT
+from plan_cache import get_cached_plan, store_plan
+from selector_ranking import SelectorStats
+from accessibility_resolver import resolve_by_accessibility, ACCESSIBILITY_MIN_SCORE
+from browser_pool import BrowserPool
+from execution_profiles import configured_profile_name, get_execution_profile
 
 # Import the Google Generative AI library
 import google.generativeai as genai
 
+from gemini_client import get_gemini_client
+
 # --- AI Model Configuration ---
 GEMINI_MODEL = "gemini-1.5-flash"
 
@@ -19,12 +29,35 @@ except KeyError:
 
 # Initialize Gemini Model
 try:
-    gemini_model = genai.GenerativeModel(GEMINI_MODEL)
+    gemini_model = get_gemini_client(GEMINI_MODEL) # Rate-limited, retrying wrapper shared by all scripts
 except Exception as e:
     print(f"Error initializing Gemini model '{GEMINI_MODEL}': {e}")
     print("Please check if the model is available and your API key is correct.")
     exit()
 
+# --- Selector Resolution ---
+RACE_SELECTORS = True # Probe all candidate selectors at once instead of waiting on each one in turn
+RANK_SELECTORS = True # Try inferred selectors in order of how often they've worked (per site, then overall), top-K first
+RESOLVER_MODE = "accessibility" # "accessibility": match the description against the page's accessibility tree first; "css": only guess CSS selectors
+
+# --- Batch Mode ---
+BATCH_INSTRUCTIONS_FILE = "instructions.jsonl" # One instruction per line: {"id": ..., "instruction": ...} or just a JSON string
+BATCH_RESULTS_FILE = "batch_results.jsonl" # One result line per instruction, written as soon as that run finishes
+BATCH_PARALLELISM = 4 # Instructions run at once, each in its own browser context of one shared browser
+BATCH_EXECUTION_PROFILE = configured_profile_name("ci-fast") # Batch runs never stop for human intervention, so there's nothing to watch
+
+selector_stats = SelectorStats() if RANK_SELECTORS else None
+
+# --- Execution Profile ---
+EXECUTION_PROFILE = configured_profile_name("interactive") # Headed, for human intervention; see execution_profiles.py (the EXECUTION_PROFILE env var overrides)
+execution_profile = get_execution_profile(EXECUTION_PROFILE)
+
+# --- Browser Pool ---
+browser_pool = BrowserPool(profile=execution_profile) # Browsers stay warm between instructions; each gets a fresh context
+
+# --- Action Plan Cache ---
+USE_PLAN_CACHE = os.getenv("DISABLE_PLAN_CACHE") != "1" # Set DISABLE_PLAN_CACHE=1 to always ask Gemini for a fresh plan
+
 # Global dictionary to store extracted data
 extracted_data = {}
 
@@ -254,8 +287,14 @@ async def get_instructions_from_ai(prompt: str) -> dict:
             '`{"actions": [{"action": "navigate", "url": "https://example.com"}, {"action": "type", "selector_description": "username input field", "value": "myuser"}, {"action": "select", "selector_description": "sort by dropdown", "value": "Price: High to Low"}, {"action": "scroll", "to": "bottom"}, {"action": "extract", "selector_description": "all product titles", "name": "extracted_titles"}, {"action": "click", "selector_description": "Sign In button"}, {"action": "screenshot", "name": "final_page.png"}]}`'
         )
 
+        if USE_PLAN_CACHE:
+            cached_plan = get_cached_plan(prompt, GEMINI_MODEL, system_instruction)
+            if cached_plan is not None:
+                print("Using cached action plan for this instruction (skipping Gemini).")
+                return cached_plan
+
         print("Sending instruction to Gemini for action planning...")
-        response = await genai.GenerativeModel(GEMINI_MODEL).generate_content_async(
+        response = await gemini_model.generate_content_async(
             f"{system_instruction}\n\nUser instruction: {prompt}"
         )
         
@@ -264,7 +303,10 @@ async def get_instructions_from_ai(prompt: str) -> dict:
         if text.startswith("```json") and text.endswith("```"):
             text = text[7:-3].strip()
             
-        return json.loads(text)
+        plan = json.loads(text)
+        if USE_PLAN_CACHE and isinstance(plan, dict) and plan.get("actions"):
+            store_plan(prompt, GEMINI_MODEL, system_instruction, plan)
+        return plan
 
     except json.JSONDecodeError as e:
         print(f"Error decoding JSON from AI response: {e}")
@@ -277,10 +319,23 @@ async def get_instructions_from_ai(prompt: str) -> dict:
 
 # --- Utility: try selectors one by one until success ---
 
-async def try_selectors(page, selectors, action_type, selector_description_for_debug: str = "element", value=None, timeout=15000):
+async def try_selectors(page, selectors, action_type, selector_description_for_debug: str = "element", value=None, timeout=15000, race=RACE_SELECTORS, extracted=None, screenshot_prefix=""):
     """Attempts to perform a Playwright action using a list of selectors in order,
-    stopping at the first successful attempt."""
+    stopping at the first successful attempt.
+    With race=True all candidates are resolved concurrently first, so a step costs
+    at most one timeout instead of one per selector.
+    Extracted values go into `extracted` (the global extracted_data by default).
+    Debug screenshot names start with `screenshot_prefix`.
+    Returns the selector that succeeded, or False if none did."""
     last_error = None
+    if extracted is None:
+        extracted = extracted_data
+
+    if race and len(selectors) > 1:
+        selectors = await race_selectors(page, selectors, state='attached', timeout=timeout)
+        if not selectors:
+            last_error = f"no candidate selector appeared within {timeout}ms"
+        timeout = MATCHED_SELECTOR_TIMEOUT
     
     for sel in selectors:
         try:
@@ -307,12 +362,12 @@ async def try_selectors(page, selectors, action_type, selector_description_for_d
             if action_type == 'click':
                 await element.click()
                 print(f"Successfully clicked using selector: {sel} (Description: '{selector_description_for_debug}')")
-                print(f"Page URL after click attempt: {page.url()}")
+                print(f"Page URL after click attempt: {page.url}")
                 # Sanitize selector_description_for_debug for filename
                 safe_desc_filename = re.sub(r'[^\w\s-]', '', selector_description_for_debug.lower())
                 safe_desc_filename = re.sub(r'[-\s]+', '_', safe_desc_filename).strip('_')
                 if not safe_desc_filename: safe_desc_filename = "element" # fallback
-                await page.screenshot(path=f"debug_after_click_on_{safe_desc_filename}.png")
+                await page.screenshot(path=f"{screenshot_prefix}debug_after_click_on_{safe_desc_filename}.png")
 
             elif action_type == 'type':
                 await element.fill(value)
@@ -345,13 +400,13 @@ async def try_selectors(page, selectors, action_type, selector_description_for_d
                         if el_idx < 5: # Print first few for confirmation
                              print(f"Extracted item {el_idx+1} for '{data_name}': '{text_content.strip()[:50]}...'")
 
-                    extracted_data[data_name] = extracted_texts
+                    extracted[data_name] = extracted_texts
                     print(f"Successfully extracted {len(extracted_texts)} items for '{data_name}' using selector: {sel}")
                 else:
                     # Extract single element
                     text_content = await element.text_content()
                     if text_content:
-                        extracted_data[data_name] = text_content.strip()
+                        extracted[data_name] = text_content.strip()
                         print(f"Successfully extracted '{text_content.strip()}' for '{data_name}' using selector: {sel}")
                     else:
                         raise Exception("No text content found for extraction.")
@@ -363,7 +418,7 @@ async def try_selectors(page, selectors, action_type, selector_description_for_d
                 # The wait_for_selector and checks above already cover this
                 print(f"Assertion successful: element '{selector_description_for_debug}' found and visible using selector: {sel}")
 
-            return True
+            return sel
             
         except Exception as e:
             last_error = f"Selector '{sel}' for '{selector_description_for_debug}' failed: {str(e)}"
@@ -373,28 +428,66 @@ async def try_selectors(page, selectors, action_type, selector_description_for_d
     return False
 
 
-# --- Main automation runner ---
-
-async def run_automation(natural_language_instruction: str):
+async def try_accessibility_match(page, desc, action_type, value=None, extracted=None, screenshot_prefix=""):
     """
-    Executes a series of web automation steps based on a natural language instruction
-    processed by the AI.
+    Matches `desc` against the roles and accessible names in one accessibility snapshot
+    of the page and runs the action on the best node, if it scores high enough.
+    Returns the selector that succeeded, or False.
     """
-    # 1. Get AI instructions
-    ai_response = await get_instructions_from_ai(natural_language_instruction)
-    actions = ai_response.get("actions", [])
+    try:
+        match = await resolve_by_accessibility(page, desc, action_type)
+    except Exception as e:
+        print(f"Accessibility snapshot failed for '{desc}': {e}")
+        return False
+    if match is None:
+        print(f"No named elements in the accessibility tree for '{desc}'.")
+        return False
+    print(f"Accessibility match for '{desc}': {match.role} '{match.name}' (score {match.score:.2f})")
+    if match.score < ACCESSIBILITY_MIN_SCORE:
+        print(f"Score below {ACCESSIBILITY_MIN_SCORE}, falling back to inferred selectors.")
+        return False
+    return await try_selectors(page, [match.selector], action_type, selector_description_for_debug=desc, value=value, race=False,
+                               extracted=extracted, screenshot_prefix=screenshot_prefix)
+
+
+async def try_inferred_selectors(page, desc, action_type, value=None, extracted=None, screenshot_prefix=""):
+    """Runs the action using selectors guessed from `desc`, best-ranked first. Returns the selector that succeeded, or False."""
+    selectors = infer_generic_selectors(desc)
+    host = urlparse(page.url).netloc
+    remaining = []
+    if selector_stats and RACE_SELECTORS:
+        selectors = selector_stats.rank(selectors, host) # A race costs one timeout however many candidates it has, so the top K would only drop matches
+    elif selector_stats:
+        selectors, remaining = selector_stats.shortlist(selectors, host)
+    print(f"Attempting to '{action_type}' on: '{desc}' using selectors: {selectors}")
+
+    success = await try_selectors(page, selectors, action_type, selector_description_for_debug=desc, value=value, extracted=extracted, screenshot_prefix=screenshot_prefix)
+    if not success and remaining:
+        print(f"Top {len(selectors)} selectors failed, trying the {len(remaining)} lower-ranked ones.")
+        selectors = selectors + remaining
+        success = await try_selectors(page, remaining, action_type, selector_description_for_debug=desc, value=value, extracted=extracted, screenshot_prefix=screenshot_prefix)
+    if selector_stats:
+        selector_stats.record(host, selectors, success or None)
+    return success
 
-    if not actions:
-        print("AI did not return any executable actions or an error occurred. Please refine your instruction.")
-        return
 
-    print(f"\nAI generated actions: {json.dumps(actions, indent=2)}\n")
+# --- Main automation runner ---
 
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=False)  # Keep headless=False for human interaction
-        page = await browser.new_page()
+async def run_actions(page, actions, extracted=None, interactive=True, screenshot_prefix="") -> dict:
+    """
+    Runs AI-generated actions on a page. Extracted values go into `extracted` (the global
+    extracted_data by default). With interactive=False a failed step ends the run instead
+    of asking a human for help. Every screenshot name starts with `screenshot_prefix`, so
+    concurrent batch runs keep their own. Returns the status ("completed", "failed" or "exited"),
+    the failed step's number, if any, and how long each step took.
+    """
+    if extracted is None:
+        extracted = extracted_data
+    result = {"status": "completed", "failed_step": None, "step_timings": []}
 
-        for step_idx, step in enumerate(actions):
+    for step_idx, step in enumerate(actions):
+        step_started = time.monotonic()
+        try:
             action = step.get("action")
             selector_description = step.get("selector_description", "N/A")
             print(f"\n--- Step {step_idx + 1}: Action '{action}' on '{selector_description}' ---")
@@ -409,9 +502,10 @@ async def run_automation(natural_language_instruction: str):
                         print(f"Successfully navigated to {url}")
                     except Exception as e:
                         print(f"Failed to navigate to {url}: {e}")
-                        screenshot_name = f"failure_navigate_to_{url.replace('https://','').replace('http://','').replace('/', '_')}.png"
+                        screenshot_name = f"{screenshot_prefix}failure_navigate_to_{url.replace('https://','').replace('http://','').replace('/', '_')}.png"
                         await page.screenshot(path=screenshot_name)
                         print(f"Screenshot saved to {screenshot_name}")
+                        result.update(status="failed", failed_step=step_idx + 1)
                         break  
                 else:
                     print("Navigation action missing URL, skipping.")
@@ -423,10 +517,11 @@ async def run_automation(natural_language_instruction: str):
                     print(f"Missing selector_description for action {action}, skipping.")
                     continue
 
-                selectors = infer_generic_selectors(desc)
-                print(f"Attempting to '{action}' on: '{desc}' using selectors: {selectors}")
-
-                success = await try_selectors(page, selectors, action, selector_description_for_debug=desc, value=value)
+                success = False
+                if RESOLVER_MODE == "accessibility" and action != "extract": # Extraction of lists still needs CSS selectors
+                    success = await try_accessibility_match(page, desc, action, value=value, extracted=extracted, screenshot_prefix=screenshot_prefix)
+                if not success:
+                    success = await try_inferred_selectors(page, desc, action, value=value, extracted=extracted, screenshot_prefix=screenshot_prefix)
                 
                 if not success:
                     print(f"\nCRITICAL: Failed to {action} on '{desc}'.")
@@ -436,9 +531,12 @@ async def run_automation(natural_language_instruction: str):
                     safe_desc_filename = re.sub(r'[-\s]+', '_', safe_desc_filename).strip('_')
                     if not safe_desc_filename: safe_desc_filename = "failed_action"
 
-                    failure_screenshot_path = f"failure_{safe_desc_filename}_step_{step_idx + 1}.png"
+                    failure_screenshot_path = f"{screenshot_prefix}failure_{safe_desc_filename}_step_{step_idx + 1}.png"
                     await page.screenshot(path=failure_screenshot_path)
                     print(f"Screenshot of failure saved to {failure_screenshot_path}")
+                    if not interactive:
+                        result.update(status="failed", failed_step=step_idx + 1)
+                        break
 
                     # --- Human-in-the-Loop Intervention ---
                     while True:
@@ -457,7 +555,7 @@ async def run_automation(natural_language_instruction: str):
                             new_selector = input("Enter the new Playwright selector: ").strip()
                             if new_selector:
                                 print(f"Attempting to retry with new selector: '{new_selector}'")
-                                retry_success = await try_selectors(page, [new_selector], action, selector_description_for_debug=desc, value=value)
+                                retry_success = await try_selectors(page, [new_selector], action, selector_description_for_debug=desc, value=value, extracted=extracted, screenshot_prefix=screenshot_prefix)
                                 if retry_success:
                                     print("Retry successful! Continuing automation.")
                                     break # Exit human intervention loop
@@ -473,7 +571,7 @@ async def run_automation(natural_language_instruction: str):
                                     print("Could not infer selectors from the new description. Please try a different description or a direct selector.")
                                     continue # Go back to choice menu
                                 print(f"Attempting to retry with new description '{new_description}' (inferred selectors: {new_selectors})")
-                                retry_success = await try_selectors(page, new_selectors, action, selector_description_for_debug=new_description, value=value)
+                                retry_success = await try_selectors(page, new_selectors, action, selector_description_for_debug=new_description, value=value, extracted=extracted, screenshot_prefix=screenshot_prefix)
                                 if retry_success:
                                     print("Retry successful! Continuing automation.")
                                     break # Exit human intervention loop
@@ -486,8 +584,8 @@ async def run_automation(natural_language_instruction: str):
                             break # Exit human intervention loop
                         elif user_choice == '4':
                             print("Exiting automation as requested by human.")
-                            await browser.close()
-                            return # Exit the function
+                            result.update(status="exited", failed_step=step_idx + 1)
+                            return result
                         else:
                             print("Invalid choice. Please enter 1, 2, 3, or 4.")
                     # End of while loop for human intervention
@@ -541,7 +639,7 @@ async def run_automation(natural_language_instruction: str):
                     print(f"Invalid scroll direction: '{to}'. Skipping scroll action.")
 
             elif action == "screenshot":
-                name = step.get("name", f"screenshot_{step_idx + 1}.png")
+                name = screenshot_prefix + step.get("name", f"screenshot_{step_idx + 1}.png")
                 try:
                     await page.screenshot(path=name)
                     print(f"Screenshot saved as {name}")
@@ -549,23 +647,149 @@ async def run_automation(natural_language_instruction: str):
                     print(f"Failed to take screenshot {name}: {e}")
             else:
                 print(f"Unknown action: {action}, skipping.")
-        
-        print("\n--- Automation Finished ---")
-        if extracted_data:
-            print("\nExtracted Data:")
-            print(json.dumps(extracted_data, indent=2))
+        finally:
+            result["step_timings"].append({"step": step_idx + 1, "action": step.get("action"), "seconds": round(time.monotonic() - step_started, 3)})
+    return result
 
-        await browser.close()
+
+async def run_automation(natural_language_instruction: str):
+    """
+    Executes a series of web automation steps based on a natural language instruction
+    processed by the AI.
+    """
+    # 1. Get AI instructions
+    ai_response = await get_instructions_from_ai(natural_language_instruction)
+    actions = ai_response.get("actions", [])
+
+    if not actions:
+        print("AI did not return any executable actions or an error occurred. Please refine your instruction.")
+        return
+
+    print(f"\nAI generated actions: {json.dumps(actions, indent=2)}\n")
+
+    async with browser_pool.context() as context:
+        page = await context.new_page()
+
+        result = await run_actions(page, actions)
+        if result["status"] != "exited":
+            print("\n--- Automation Finished ---")
+            if extracted_data:
+                print("\nExtracted Data:")
+                print(json.dumps(extracted_data, indent=2))
+
+
+# --- Batch runner ---
+
+def load_batch_instructions(path: str) -> list[dict]:
+    """Reads {"id", "instruction"} entries from a JSONL file; ids default to the line number."""
+    instructions = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError as e:
+                print(f"WARN: Skipping line {line_no} of {path}: {e}")
+                continue
+            if isinstance(entry, str):
+                entry = {"instruction": entry}
+            if not isinstance(entry, dict) or not entry.get("instruction"):
+                print(f"WARN: Skipping line {line_no} of {path}: no instruction.")
+                continue
+            entry.setdefault("id", str(line_no))
+            instructions.append(entry)
+    return instructions
+
+
+async def run_batch_instruction(pool: BrowserPool, entry: dict, semaphore: asyncio.Semaphore) -> dict:
+    """
+    Plans one batch instruction, then runs it in a fresh context from the pool once a slot
+    is free. Never raises: failures end up in the returned record.
+    """
+    started = time.monotonic()
+    record = {"id": entry["id"], "instruction": entry["instruction"]}
+    extracted = {}
+    try:
+        ai_response = await get_instructions_from_ai(entry["instruction"]) # Planning doesn't hold a browser slot
+        actions = ai_response.get("actions", [])
+        record["plan_seconds"] = round(time.monotonic() - started, 3)
+        record["steps_total"] = len(actions)
+        if not actions:
+            record["status"] = "no_actions"
+        else:
+            async with semaphore:
+                run_started = time.monotonic()
+                async with pool.context() as context:
+                    page = await context.new_page()
+                    screenshot_prefix = re.sub(r"[^\w-]", "_", str(entry["id"])) + "_" # Parallel runs would overwrite each other's screenshots
+                    record.update(await run_actions(page, actions, extracted, interactive=False, screenshot_prefix=screenshot_prefix))
+                record["run_seconds"] = round(time.monotonic() - run_started, 3)
+    except Exception as e:
+        record.update(status="error", error=str(e))
+    record["extracted_data"] = extracted
+    record["total_seconds"] = round(time.monotonic() - started, 3)
+    return record
+
+
+async def run_batch(input_path: str = BATCH_INSTRUCTIONS_FILE, output_path: str = BATCH_RESULTS_FILE, parallelism: int = BATCH_PARALLELISM):
+    """
+    Runs every instruction in a JSONL file concurrently, each in its own context of a
+    shared browser pool (BATCH_EXECUTION_PROFILE), at most `parallelism` at a time. A result line (status, extracted
+    data, timings) is appended to output_path as soon as each run finishes.
+    """
+    try:
+        instructions = load_batch_instructions(input_path)
+    except OSError as e:
+        print(f"Could not read batch instructions from {input_path}: {e}")
+        return
+    if not instructions:
+        print(f"No instructions found in {input_path}.")
+        return
+
+    print(f"Running {len(instructions)} instructions from {input_path}, {parallelism} at a time. Results go to {output_path}.")
+    batch_started = time.monotonic()
+    semaphore = asyncio.Semaphore(max(1, parallelism))
+    statuses = {}
+    pool = BrowserPool(profile=get_execution_profile(BATCH_EXECUTION_PROFILE))
+    try:
+        with open(output_path, "w", encoding="utf-8") as out:
+            runs = [run_batch_instruction(pool, entry, semaphore) for entry in instructions]
+            for finished in asyncio.as_completed(runs):
+                record = await finished
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+                statuses[record["status"]] = statuses.get(record["status"], 0) + 1
+                print(f"[{record['id']}] {record['status']} in {record['total_seconds']}s")
+    finally:
+        await pool.close()
+
+    summary = ", ".join(f"{count} {status}" for status, count in sorted(statuses.items()))
+    print(f"\nBatch finished in {time.monotonic() - batch_started:.1f}s: {summary}.")
 
 
 # --- Main execution block ---
-async def main():
+async def prompt_loop():
     while True:
-        user_prompt = input("Enter your automation instruction (e.g., 'Navigate to example.com, click on the 'About Us' link'):\nOr type 'exit' to quit.\n> ").strip()
+        user_prompt = input(f"Enter your automation instruction (e.g., 'Navigate to example.com, click on the 'About Us' link'):\nOr type 'batch [file.jsonl]' to run a file of instructions (default {BATCH_INSTRUCTIONS_FILE}), or 'exit' to quit.\n> ").strip()
         if user_prompt.lower() == 'exit':
             print("Exiting program.")
             break
+        if user_prompt.lower() == 'batch' or user_prompt.lower().startswith('batch '):
+            await run_batch(user_prompt[len('batch'):].strip() or BATCH_INSTRUCTIONS_FILE)
+            continue
         await run_automation(user_prompt)
 
+
+async def main():
+    try:
+        await prompt_loop()
+    finally:
+        await browser_pool.close()
+        if selector_stats:
+            selector_stats.save() # Writes what the last SELECTOR_STATS_SAVE_INTERVAL held back
+
+
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,119 @@
+import asyncio
+import time
+from urllib.parse import urlparse
+
+# --- Readiness Settings ---
+READY_TIMEOUT_MS = 3000 # Ceiling on how long any page is waited for, however busy it stays (no slower than the fixed sleeps this replaced)
+QUIET_WINDOW_MS = 500 # The page counts as settled after this long without elements being added/removed or XHR/fetch requests finishing
+NAVIGATION_GRACE_MS = 250 # How long a click gets to start a navigation before the page is judged in place
+NETWORK_IDLE_MAX_MS = 2000 # Pages with beacons or long polling never go network-idle; don't wait past this for it
+
+# Per-site tuning, keyed by host (subdomains match too). Values override the defaults above.
+SITE_READINESS = {
+    "books.toscrape.com": {"quiet_ms": 200, "timeout_ms": 2000}, # Static pages, no client-side rendering
+}
+
+# Resolves true once no elements have been added or removed and no XHR/fetch request has
+# finished for quietMs, or false after timeoutMs regardless. Attribute changes, images and
+# beacons don't count: animations, carousels and analytics would keep a page busy forever.
+SETTLE_FUNCTION = """
+(quietMs, timeoutMs) => new Promise(resolve => {
+    let lastActivity = performance.now();
+    const started = lastActivity;
+    const observer = new MutationObserver(() => { lastActivity = performance.now(); });
+    observer.observe(document.documentElement || document, {childList: true, subtree: true});
+    let resources = null;
+    try {
+        resources = new PerformanceObserver(list => {
+            if (list.getEntries().some(entry => entry.initiatorType === 'xmlhttprequest' || entry.initiatorType === 'fetch')) {
+                lastActivity = performance.now();
+            }
+        });
+        resources.observe({type: 'resource'});
+    } catch (e) { resources = null; }
+    const finish = settled => {
+        observer.disconnect();
+        if (resources) resources.disconnect();
+        clearInterval(poll);
+        resolve(settled);
+    };
+    const poll = setInterval(() => {
+        const now = performance.now();
+        if (document.readyState === 'complete' && now - lastActivity >= quietMs) finish(true);
+        else if (now - started >= timeoutMs) finish(false);
+    }, 50);
+})
+"""
+PLAYWRIGHT_SETTLE_SCRIPT = f"([quietMs, timeoutMs]) => ({SETTLE_FUNCTION})(quietMs, timeoutMs)"
+SELENIUM_SETTLE_SCRIPT = f"const done = arguments[arguments.length - 1]; ({SETTLE_FUNCTION})(arguments[0], arguments[1]).then(done);"
+
+
+def readiness_settings(url: str) -> dict:
+    """Returns quiet_ms and timeout_ms for a URL, applying any SITE_READINESS override for its host."""
+    settings = {"quiet_ms": QUIET_WINDOW_MS, "timeout_ms": READY_TIMEOUT_MS}
+    labels = (urlparse(url).hostname or "").lower().split(".")
+    for i in range(len(labels)):
+        override = SITE_READINESS.get(".".join(labels[i:]))
+        if override:
+            settings.update(override)
+            break
+    return settings
+
+
+def _remaining_ms(deadline: float) -> int:
+    return max(0, int((deadline - time.monotonic()) * 1000))
+
+
+# --- Playwright ---
+async def wait_until_settled(page, timeout_ms: int = None, expect_navigation: bool = False) -> bool:
+    """
+    Waits until a Playwright page is settled: any pending navigation has loaded, the
+    network is idle and the DOM has stopped changing. Returns False if the ceiling was
+    hit first. Set expect_navigation after clicks/submits that may navigate.
+    """
+    settings = readiness_settings(page.url)
+    deadline = time.monotonic() + (timeout_ms or settings["timeout_ms"]) / 1000
+
+    if expect_navigation:
+        try:
+            await page.wait_for_event("framenavigated", timeout=NAVIGATION_GRACE_MS)
+        except Exception:
+            pass # No navigation started; the click changed the page in place (or not at all)
+
+    while _remaining_ms(deadline) > 0:
+        try:
+            await page.wait_for_load_state("domcontentloaded", timeout=_remaining_ms(deadline) or 1)
+            network_idle = page.wait_for_load_state("networkidle", timeout=min(NETWORK_IDLE_MAX_MS, _remaining_ms(deadline)) or 1)
+            dom_quiet = page.evaluate(PLAYWRIGHT_SETTLE_SCRIPT, [settings["quiet_ms"], _remaining_ms(deadline)])
+            _, dom_result = await asyncio.gather(network_idle, dom_quiet, return_exceptions=True)
+        except Exception:
+            return False # Even the document itself didn't load in time
+        if isinstance(dom_result, Exception):
+            continue # Execution context destroyed: a navigation happened mid-check, so wait for the new document
+        return dom_result is True
+    return False
+
+
+# --- Selenium ---
+def wait_until_settled_sync(driver, timeout_ms: int = None, expect_navigation: bool = False) -> bool:
+    """Selenium counterpart of wait_until_settled, using document.readyState and the same settle script."""
+    settings = readiness_settings(driver.current_url)
+    deadline = time.monotonic() + (timeout_ms or settings["timeout_ms"]) / 1000
+
+    if expect_navigation:
+        url_before = driver.current_url
+        grace_deadline = time.monotonic() + NAVIGATION_GRACE_MS / 1000
+        while time.monotonic() < grace_deadline and driver.current_url == url_before:
+            time.sleep(0.05)
+
+    while _remaining_ms(deadline) > 0:
+        try:
+            while driver.execute_script("return document.readyState") == "loading":
+                if _remaining_ms(deadline) == 0:
+                    return False
+                time.sleep(0.05)
+            driver.set_script_timeout(_remaining_ms(deadline) / 1000 + 1)
+            return driver.execute_async_script(SELENIUM_SETTLE_SCRIPT, settings["quiet_ms"], _remaining_ms(deadline)) is True
+        except Exception:
+            time.sleep(0.05) # Document replaced mid-check by a navigation; look at the new one
+    return False
@@ -0,0 +1,108 @@
+import asyncio
+from contextlib import contextmanager
+
+from page_readiness import wait_until_settled, wait_until_settled_sync
+
+# --- Interaction Probe Settings ---
+PROBE_CONCURRENCY = 4 # Button/form probes run at once, each in its own throwaway browser context
+
+
+class PageSnapshot:
+    """
+    Everything needed to put a page back the way it was: its URL, the document it was
+    served, and the context's cookies and local storage. Probes open a fresh context
+    from the snapshot, so the crawled page itself never has to be reloaded.
+    """
+
+    def __init__(self, browser, url: str, html: bytes, storage_state: dict, viewport: dict | None):
+        self.browser = browser
+        self.url = url
+        self.html = html
+        self.storage_state = storage_state
+        self.viewport = viewport
+
+
+async def capture_snapshot(page, response=None) -> PageSnapshot:
+    """
+    Snapshots a loaded page. Pass the navigation response when there is one: its raw
+    body replays exactly what the server sent, whereas page.content() is the DOM after
+    scripts have already run on it.
+    """
+    html = None
+    if response is not None and response.ok:
+        try:
+            html = await response.body()
+        except Exception:
+            html = None # Body isn't available for some redirects; fall back to the live DOM
+    if html is None:
+        html = (await page.content()).encode("utf-8")
+    storage_state = await page.context.storage_state()
+    return PageSnapshot(page.context.browser, page.url, html, storage_state, page.viewport_size)
+
+
+async def open_probe_page(snapshot: PageSnapshot, resource_policy=None):
+    """Opens a new context restored from the snapshot; the first load of its URL is served from the cached document."""
+    context = await snapshot.browser.new_context(storage_state=snapshot.storage_state, viewport=snapshot.viewport)
+    if resource_policy is not None:
+        await resource_policy.apply(context)
+
+    served = False
+
+    async def serve_cached_document(route):
+        nonlocal served
+        request = route.request
+        if not served and request.resource_type == "document" and request.method == "GET":
+            served = True
+            await route.fulfill(status=200, content_type="text/html; charset=utf-8", body=snapshot.html)
+        else:
+            await route.fallback() # Later loads (form posts, reloads) go to the network or the resource policy
+
+    await context.route(lambda url: url == snapshot.url, serve_cached_document)
+    page = await context.new_page()
+    await page.goto(snapshot.url, wait_until="domcontentloaded")
+    await wait_until_settled(page)
+    return context, page
+
+
+async def run_probes(snapshot: PageSnapshot, probes: list, concurrency: int = PROBE_CONCURRENCY, resource_policy=None) -> list[list[str]]:
+    """
+    Runs each `probe(probe_page) -> report lines` in its own context restored from the
+    snapshot, up to `concurrency` at a time. Results come back in probe order.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(probe):
+        async with semaphore:
+            context = None
+            try:
+                context, probe_page = await open_probe_page(snapshot, resource_policy)
+                return await probe(probe_page)
+            except Exception as e:
+                return [f"ERROR: Could not restore {snapshot.url} for an interaction probe: {e}"]
+            finally:
+                if context is not None:
+                    await context.close()
+
+    return await asyncio.gather(*(run(probe) for probe in probes))
+
+
+# --- Selenium ---
+@contextmanager
+def probe_tab(driver, url: str):
+    """
+    Opens url in a new tab of the same WebDriver session (so cookies and storage carry
+    over), yields with the driver switched to it, then closes it and switches back. The
+    crawled page stays loaded in its own tab, so its elements don't go stale. One
+    WebDriver drives one tab at a time, so Selenium probes run one after another.
+    """
+    original_window = driver.current_window_handle
+    driver.switch_to.new_window("tab")
+    try:
+        driver.get(url)
+        wait_until_settled_sync(driver)
+        yield
+    finally:
+        try:
+            driver.close()
+        finally:
+            driver.switch_to.window(original_window)
@@ -0,0 +1,109 @@
+import hashlib
+import json
+import os
+import re
+import time
+
+# --- Plan Cache Settings ---
+PLAN_CACHE_DIR = "plan_cache" # One JSON file per cached action plan, named by its content hash
+PLAN_CACHE_TTL_HOURS = 24 * 7 # Plans older than this are asked for again
+PLAN_CACHE_MAX_ENTRIES = 500 # Least recently used plans are evicted beyond this
+
+
+def normalize_instruction(instruction: str) -> str:
+    """
+    Collapses whitespace in an instruction. Case is kept on purpose: instructions
+    carry values to type (emails, passwords) where case matters.
+    """
+    return re.sub(r"\s+", " ", instruction).strip()
+
+
+def plan_cache_key(instruction: str, model_name: str, system_prompt: str) -> str:
+    """Content address of a plan: hash of the normalized instruction, model name and system-prompt hash."""
+    system_prompt_hash = hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()
+    material = "\n".join([normalize_instruction(instruction), model_name, system_prompt_hash])
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def _entry_path(key: str, cache_dir: str) -> str:
+    return os.path.join(cache_dir, f"{key}.json")
+
+
+def _write_entry(path: str, entry: dict):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(entry, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def get_cached_plan(instruction: str, model_name: str, system_prompt: str, cache_dir: str = PLAN_CACHE_DIR) -> dict | None:
+    """Returns the cached plan for this instruction, or None if there is no fresh one."""
+    path = _entry_path(plan_cache_key(instruction, model_name, system_prompt), cache_dir)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            entry = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"WARN: Ignoring unreadable plan cache entry {path}: {e}")
+        return None
+
+    if time.time() - entry.get("created", 0) > PLAN_CACHE_TTL_HOURS * 3600:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return None
+
+    entry["last_used"] = time.time()
+    try:
+        _write_entry(path, entry)
+    except OSError:
+        pass # Failing to bump the LRU timestamp is harmless
+    return entry["plan"]
+
+
+def store_plan(instruction: str, model_name: str, system_prompt: str, plan: dict, cache_dir: str = PLAN_CACHE_DIR):
+    """Saves a plan under its content address and evicts the least recently used plans if over budget."""
+    now = time.time()
+    entry = {
+        "created": now,
+        "last_used": now,
+        "model": model_name,
+        "instruction": normalize_instruction(instruction),
+        "plan": plan,
+    }
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        _write_entry(_entry_path(plan_cache_key(instruction, model_name, system_prompt), cache_dir), entry)
+    except OSError as e:
+        print(f"WARN: Could not write plan cache entry: {e}")
+        return
+    evict_plans(cache_dir)
+
+
+def evict_plans(cache_dir: str = PLAN_CACHE_DIR, max_entries: int = PLAN_CACHE_MAX_ENTRIES) -> int:
+    """Drops expired plans, then the least recently used ones beyond max_entries. Returns how many were removed."""
+    entries = []
+    for name in os.listdir(cache_dir):
+        if not name.endswith(".json"):
+            continue
+        path = os.path.join(cache_dir, name)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            entries.append((entry.get("last_used", 0), entry.get("created", 0), path))
+        except (OSError, json.JSONDecodeError):
+            entries.append((0, 0, path))
+
+    expiry = time.time() - PLAN_CACHE_TTL_HOURS * 3600
+    doomed = [path for _, created, path in entries if created < expiry]
+    live = sorted((e for e in entries if e[2] not in doomed), reverse=True)
+    doomed += [path for _, _, path in live[max_entries:]]
+
+    for path in doomed:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    return len(doomed)
@@ -1,12 +1,25 @@
+import asyncio
 import os
 import time
-from collections import deque
-from urllib.parse import urljoin, urlparse
+from urllib.parse import urlparse
 # Playwright specific imports
-from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError, Page, Locator
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError, Page, Locator
 
 import google.generativeai as genai
 
+from gemini_client import get_gemini_client
+from html_reducer import reduce_html
+from analysis_cache import AnalysisCache
+
+from crawl_engine import CrawlEngine
+from link_harvester import harvest_links, harvest_links_from_html, crawlable_urls
+from page_readiness import wait_until_settled
+from resource_policy import apply_resource_policy
+from execution_profiles import configured_profile_name, get_execution_profile
+from analysis_pipeline import AnalysisPipeline, resolve_report_lines
+from recrawl_state import RecrawlState
+from tiered_fetcher import HttpFetcher, browser_reason
+
 # --- Configuration ---
 # AI Model and Report
 GEMINI_MODEL = "gemini-1.5-flash"
@@ -15,6 +28,14 @@ SCREENSHOT_DIR = "screenshots_playwright_test" # Directory to save screenshots
 
 # Crawler Settings
 MAX_PAGES_TO_VISIT = 10
+CRAWL_CONCURRENCY = 4 # Pages crawled in parallel (each worker has its own tab in the shared browser)
+RESOURCE_POLICY = "full" # "full", "lean" (no fonts/media/trackers) or "text-only" (also no images/CSS); blocking turns off the browser cache, see resource_policy.py
+EXECUTION_PROFILE = configured_profile_name("ci-fast") # See execution_profiles.py; the EXECUTION_PROFILE env var overrides
+HTTP_FIRST = True # Pages are fetched over plain HTTP first (doubling as the INCREMENTAL_CRAWL check); JS-rendered pages (and, with TEST_FORMS_ON_EACH_PAGE, pages with forms) still go to the browser. See tiered_fetcher.py
+SCREENSHOT_EVERY_PAGE = False # True renders (and screenshots) every page, giving up HTTP_FIRST's browser-free static pages; pages escalated to the browser are always screenshotted
+INCREMENTAL_CRAWL = True # Pages the server reports unchanged since the last run (ETag/Last-Modified or same content) skip rendering and AI analysis; see recrawl_state.py
+ANALYSIS_WORKERS = 3 # Concurrent Gemini analyses running alongside the crawl
+ANALYSIS_QUEUE_SIZE = 10 # Page snapshots allowed to wait for analysis before crawling pauses
 TEST_FORMS_ON_EACH_PAGE = False # Simplified for this example, can be re-enabled
 CLICK_EXTERNAL_LINKS = False
 
@@ -30,24 +51,32 @@ except KeyError:
 
 # --- Initialize Gemini Model ---
 try:
-    gemini_model = genai.GenerativeModel(GEMINI_MODEL)
+    gemini_model = get_gemini_client(GEMINI_MODEL) # Rate-limited, retrying wrapper shared by all scripts
 except Exception as e:
     print(f"Error initializing Gemini model '{GEMINI_MODEL}': {e}")
     print("Please check if the model is available and your API key is correct.")
     exit()
 
+# --- AI Analysis Cache ---
+USE_ANALYSIS_CACHE = True # Reuse analyses of identical or near-identical pages instead of calling Gemini again
+analysis_cache = AnalysisCache() if USE_ANALYSIS_CACHE else None
+
 # --- AI Analysis Function ---
 def analyze_content_with_ai(content: str, prompt_suffix: str) -> str:
-    """Sends content to Gemini for analysis."""
-    MAX_CONTENT_LENGTH = 15000
-    if len(content) > MAX_CONTENT_LENGTH:
-        content = content[:MAX_CONTENT_LENGTH] + "\n... [Content Truncated] ..."
-
-    full_prompt = f"Analyze the following web page content. {prompt_suffix}\n\nContent:\n{content}"
+    """Reduces page HTML to a compact outline and sends it to Gemini for analysis."""
+    content = reduce_html(content) # Outline of headings, links, forms, prices and text instead of raw HTML
+    if analysis_cache:
+        cached_analysis = analysis_cache.lookup(content, prompt_suffix)
+        if cached_analysis:
+            return cached_analysis
+
+    full_prompt = f"Analyze the following web page, given as a text outline of its headings, links, forms, prices and text. {prompt_suffix}\n\nContent:\n{content}"
     try:
         print(f"Sending content for AI analysis (prompt len: {len(full_prompt)})...")
         response = gemini_model.generate_content(full_prompt)
         if response.parts and response.parts[0].text:
+            if analysis_cache:
+                analysis_cache.store(content, prompt_suffix, response.parts[0].text)
             return response.parts[0].text
         else:
             return "AI analysis completed, but no text response was generated."
@@ -55,10 +84,8 @@ def analyze_content_with_ai(content: str, prompt_suffix: str) -> str:
         return f"AI analysis failed: {e}. This might be due to API issues, rate limits, or content too large."
 
 # --- Web Testing Logic ---
-def run_web_test_playwright():
+async def run_web_test_playwright():
     report_content = []
-    visited_urls = set()
-    urls_to_visit = deque()
 
     # --- Get User Input for Testing ---
     print("\n--- Configure Web Test (Playwright) ---")
@@ -72,154 +99,192 @@ def run_web_test_playwright():
     main_ai_prompt = input("Enter the PRIMARY AI prompt for analysis on ALL visited pages (e.g., 'Check for broken links, missing content, layout issues, and overall relevance. Identify any functional anomalies or errors.'). This will guide all AI analysis:\n> ")
     print("--- Test Configuration Complete ---\n")
 
+    # Page snapshots are analysed by a pool of workers while the crawl carries on
+    analysis_pipeline = AnalysisPipeline(analyze_content_with_ai, workers=ANALYSIS_WORKERS, queue_size=ANALYSIS_QUEUE_SIZE)
+    recrawl_state = RecrawlState.for_crawl("playright", main_ai_prompt) if INCREMENTAL_CRAWL else None
+    http_fetcher = HttpFetcher() if HTTP_FIRST else None
+
+    async def test_page(page, cleaned_current_url, page_count, engine):
+        """Tests a single crawled page and returns its report lines."""
+        page_report = [f"\n--- Testing Page {page_count}: {cleaned_current_url} ---"]
+        print(f"Testing Page {page_count}: {cleaned_current_url}")
+
+        # A cheap HTTP check first: pages unchanged since the last run are neither rendered nor re-analysed.
+        # With the HTTP tier, its (conditional) GET is that check, so each page costs one request.
+        if http_fetcher:
+            headers = recrawl_state.conditional_headers(cleaned_current_url) if recrawl_state else None
+            http_page = await http_fetcher.fetch(cleaned_current_url, headers)
+            change = await asyncio.to_thread(recrawl_state.check_fetched, cleaned_current_url, http_page) if recrawl_state else None
+        else:
+            change = await asyncio.to_thread(recrawl_state.check, cleaned_current_url) if recrawl_state else None
+        if change and change.unchanged:
+            page_report.append(f"Unchanged since run {change.since}; skipped rendering and AI analysis.")
+            for linked_url in change.links:
+                engine.add_url(linked_url)
+            return page_report
+
+        # Static pages are tested from the served HTML; only pages that need it are rendered in the browser
+        if http_fetcher:
+            reason = browser_reason(http_page, needs_forms=TEST_FORMS_ON_EACH_PAGE, needs_screenshot=SCREENSHOT_EVERY_PAGE)
+            if reason is None:
+                page_report.append("Fetched over HTTP (static page; no browser render or screenshot).")
+                page_report.append("\n--- AI Content Analysis ---")
+                ai_analysis_page = await analysis_pipeline.submit(http_page.html, main_ai_prompt)
+                page_report.append(ai_analysis_page)
+                page_links = crawlable_urls(harvest_links_from_html(http_page.html), http_page.url, base_url, allow_external=CLICK_EXTERNAL_LINKS)
+                for full_url in page_links:
+                    engine.add_url(full_url)
+                if change:
+                    recrawl_state.record(cleaned_current_url, change, page_links, ai_analysis_page)
+                return page_report
+            page_report.append(f"Rendering in the browser: {reason}.")
+
+        try:
+            await page.goto(cleaned_current_url, wait_until="domcontentloaded", timeout=30000) # 30 sec timeout
+            await wait_until_settled(page) # Until the network and DOM go quiet (capped), instead of a fixed sleep
+
+            screenshot_filename = os.path.basename(urlparse(cleaned_current_url).path).replace('/', '_').replace('.', '_') or 'index'
+            screenshot_path = os.path.join(SCREENSHOT_DIR, f"page_{page_count}_{screenshot_filename}.png")
+            await page.screenshot(path=screenshot_path)
+            page_report.append(f"Screenshot saved: {screenshot_path}")
+
+            page_source = await page.content() # Get page source
+            page_report.append("\n--- AI Content Analysis ---")
+            # Analysis runs in the background; the future is resolved when the report is written
+            ai_analysis_page = await analysis_pipeline.submit(page_source, main_ai_prompt)
+            page_report.append(ai_analysis_page)
+
+            # --- Find and Queue New Links ---
+            # One evaluate collects every link; resolving and filtering happen here in bulk
+            try:
+                links = await harvest_links(page)
+            except Exception as link_e:
+                links = []
+                page_report.append(f"WARN: Error collecting links on {cleaned_current_url}: {link_e}")
+            page_links = crawlable_urls(links, cleaned_current_url, base_url, allow_external=CLICK_EXTERNAL_LINKS)
+            for full_url in page_links:
+                engine.add_url(full_url)
+            if change:
+                recrawl_state.record(cleaned_current_url, change, page_links, ai_analysis_page)
+
+            # --- Test Forms on the Page (Simplified for Playwright example) ---
+            if TEST_FORMS_ON_EACH_PAGE:
+                forms = await page.locator("form").all()
+                for form_index, form_locator in enumerate(forms):
+                    # Playwright locators are powerful; interact directly with form elements
+                    # This is a very basic example; full form testing would involve more logic
+                    # to identify input types, fill intelligently, and handle specific validations.
+                    page_report.append(f"\n--- Attempting basic form interaction for form {form_index} ---")
+                    try:
+                        # Fill text/email inputs
+                        text_inputs = form_locator.locator("input[type='text'], input[type='email'], input[type='password'], textarea")
+                        for i in range(await text_inputs.count()):
+                            if await text_inputs.nth(i).is_visible() and await text_inputs.nth(i).is_editable():
+                                await text_inputs.nth(i).fill("test_data")
+
+                        # Click checkboxes/radios
+                        checkboxes = form_locator.locator("input[type='checkbox']")
+                        for i in range(await checkboxes.count()):
+                            if await checkboxes.nth(i).is_visible() and await checkboxes.nth(i).is_enabled():
+                                await checkboxes.nth(i).click()
+
+                        radios = form_locator.locator("input[type='radio']")
+                        for i in range(await radios.count()):
+                            if await radios.nth(i).is_visible() and await radios.nth(i).is_enabled():
+                                await radios.nth(i).click()
+
+                        # Select first option in select dropdowns
+                        selects = form_locator.locator("select")
+                        for i in range(await selects.count()):
+                            if await selects.nth(i).is_visible() and await selects.nth(i).is_enabled():
+                                options = await selects.nth(i).locator("option").all_text_contents()
+                                if options:
+                                    await selects.nth(i).select_option(options[0]) # Selects by value, label, or index
+
+                        # Attempt to submit
+                        submit_button = form_locator.locator("input[type='submit'], button[type='submit'], button:has-text('Submit'), button:has-text('Send')").first
+                        if await submit_button.is_visible() and await submit_button.is_enabled():
+                            page_report.append(f"Submitting form {form_index}...")
+                            await page.wait_for_load_state("domcontentloaded") # Wait for page to be ready after potential submit
+                            await submit_button.click()
+                            await wait_until_settled(page, expect_navigation=True)
+
+                            page_report.append("\n--- AI Analysis: After Form Submission ---")
+                            ai_analysis_form_submit = await analysis_pipeline.submit(
+                                await page.content(),
+                                main_ai_prompt # Use general prompt
+                            )
+                            page_report.append(ai_analysis_form_submit)
+                            # After form submission, navigate back to original URL to continue crawling
+                            await page.goto(cleaned_current_url, wait_until="domcontentloaded")
+                            await wait_until_settled(page)
+                        else:
+                            page_report.append(f"WARN: No clickable submit button found for form {form_index}.")
+
+                    except PlaywrightTimeoutError as e:
+                        page_report.append(f"FAIL: Form interaction failed (Timeout) for form {form_index}: {e}")
+                    except Exception as e:
+                        page_report.append(f"ERROR: General error during form interaction for form {form_index}: {e}")
+                    finally:
+                        pass # No explicit navigation back needed if submit failed or form was AJAX
+
+        except PlaywrightTimeoutError:
+            page_report.append(f"FAIL: Page {cleaned_current_url} did not load within timeout.")
+            await page.screenshot(path=os.path.join(SCREENSHOT_DIR, f"page_load_timeout_{page_count}.png"))
+        except Exception as e:
+            page_report.append(f"ERROR: An unexpected error occurred while testing {cleaned_current_url}: {e}")
+            await page.screenshot(path=os.path.join(SCREENSHOT_DIR, f"page_error_{page_count}.png"))
+
+        return page_report
+
     # Playwright Context Manager
-    with sync_playwright() as p:
-        # You can choose 'chromium', 'firefox', or 'webkit'
-        # For visible browser, set headless=False
-        browser = p.chromium.launch(headless=False)
-        page = browser.new_page()
-        page.set_viewport_size({"width": 1280, "height": 800}) # Set a consistent viewport
+    async with async_playwright() as p:
+        execution_profile = get_execution_profile(EXECUTION_PROFILE)
+        browser = await p.chromium.launch(**execution_profile.launch_options()) # Headless mode and browser flags come from the profile
+        # All crawl workers open their pages in this context, so they share one browser
+        context = await browser.new_context(**execution_profile.context_options()) # Viewport etc. from the profile
+        resource_policy = await apply_resource_policy(context, RESOURCE_POLICY) # Skip assets the crawl never looks at
 
         report_content.append(f"--- Starting AI Web Test (Playwright) ---")
         report_content.append(f"Timestamp: {time.ctime()}")
         report_content.append(f"Starting URL: {start_url}")
         report_content.append(f"Base Domain for Crawling: {base_url}")
         report_content.append(f"AI Analysis Prompt: '{main_ai_prompt}'")
-        report_content.append(f"Gemini Model Used: {GEMINI_MODEL}\n")
-
-        urls_to_visit.append(start_url)
-        page_count = 0
-
-        while urls_to_visit and page_count < MAX_PAGES_TO_VISIT:
-            current_url = urls_to_visit.popleft()
-
-            # Clean URL for tracking (remove fragments and query params for basic crawl)
-            cleaned_current_url = urlparse(current_url)._replace(query='', fragment='').geturl()
-            if cleaned_current_url in visited_urls:
-                continue
-
-            if not CLICK_EXTERNAL_LINKS and urlparse(cleaned_current_url).netloc != urlparse(base_url).netloc:
-                report_content.append(f"Skipping external URL: {cleaned_current_url}")
-                continue
-
-            visited_urls.add(cleaned_current_url)
-            page_count += 1
-            report_content.append(f"\n--- Testing Page {page_count}: {cleaned_current_url} ---")
-            print(f"Testing Page {page_count}: {cleaned_current_url}")
-
-            try:
-                page.goto(cleaned_current_url, wait_until="domcontentloaded", timeout=30000) # 30 sec timeout
-                # Playwright often auto-waits, but a small sleep can help for dynamic JS rendering
-                time.sleep(2)
-
-                screenshot_filename = os.path.basename(urlparse(cleaned_current_url).path).replace('/', '_').replace('.', '_') or 'index'
-                screenshot_path = os.path.join(SCREENSHOT_DIR, f"page_{page_count}_{screenshot_filename}.png")
-                page.screenshot(path=screenshot_path)
-                report_content.append(f"Screenshot saved: {screenshot_path}")
-
-                page_source = page.content() # Get page source
-                report_content.append("\n--- AI Content Analysis ---")
-                ai_analysis_page = analyze_content_with_ai(
-                    page_source,
-                    main_ai_prompt
-                )
-                report_content.append(ai_analysis_page)
-
-                # --- Find and Queue New Links ---
-                # Playwright's page.locator allows for robust element selection
-                links = page.locator("a").all() # Get all <a> locators
-                for link_locator in links:
-                    try:
-                        href = link_locator.get_attribute("href")
-                        if href:
-                            full_url = urljoin(cleaned_current_url, href)
-                            # Basic validation and domain check
-                            if (full_url.startswith("http://") or full_url.startswith("https://")) and \
-                               urlparse(full_url).fragment == '' and \
-                               (CLICK_EXTERNAL_LINKS or urlparse(full_url).netloc == urlparse(base_url).netloc):
-                                cleaned_full_url = urlparse(full_url)._replace(query='').geturl()
-                                if cleaned_full_url not in visited_urls and cleaned_full_url not in urls_to_visit:
-                                    urls_to_visit.append(cleaned_full_url)
-                    except PlaywrightTimeoutError: # Or other Playwright errors on locator
-                        continue # Skip elements that cause issues
-                    except Exception as link_e:
-                        report_content.append(f"WARN: Error processing link on {cleaned_current_url}: {link_e}")
-
-                # --- Test Forms on the Page (Simplified for Playwright example) ---
-                if TEST_FORMS_ON_EACH_PAGE:
-                    forms = page.locator("form").all()
-                    for form_index, form_locator in enumerate(forms):
-                        # Playwright locators are powerful; interact directly with form elements
-                        # This is a very basic example; full form testing would involve more logic
-                        # to identify input types, fill intelligently, and handle specific validations.
-                        report_content.append(f"\n--- Attempting basic form interaction for form {form_index} ---")
-                        try:
-                            # Fill text/email inputs
-                            text_inputs = form_locator.locator("input[type='text'], input[type='email'], input[type='password'], textarea")
-                            for i in range(text_inputs.count()):
-                                if text_inputs.nth(i).is_visible() and text_inputs.nth(i).is_editable():
-                                    text_inputs.nth(i).fill("test_data")
-
-                            # Click checkboxes/radios
-                            checkboxes = form_locator.locator("input[type='checkbox']")
-                            for i in range(checkboxes.count()):
-                                if checkboxes.nth(i).is_visible() and checkboxes.nth(i).is_enabled():
-                                    checkboxes.nth(i).click()
-
-                            radios = form_locator.locator("input[type='radio']")
-                            for i in range(radios.count()):
-                                if radios.nth(i).is_visible() and radios.nth(i).is_enabled():
-                                    radios.nth(i).click()
-
-                            # Select first option in select dropdowns
-                            selects = form_locator.locator("select")
-                            for i in range(selects.count()):
-                                if selects.nth(i).is_visible() and selects.nth(i).is_enabled():
-                                    options = selects.nth(i).locator("option").all_text_contents()
-                                    if options:
-                                        selects.nth(i).select_option(options[0]) # Selects by value, label, or index
-
-                            # Attempt to submit
-                            submit_button = form_locator.locator("input[type='submit'], button[type='submit'], button:has-text('Submit'), button:has-text('Send')").first
-                            if submit_button.is_visible() and submit_button.is_enabled():
-                                report_content.append(f"Submitting form {form_index}...")
-                                page.wait_for_load_state("domcontentloaded") # Wait for page to be ready after potential submit
-                                submit_button.click()
-                                time.sleep(3) # Give time for server response
-
-                                report_content.append("\n--- AI Analysis: After Form Submission ---")
-                                ai_analysis_form_submit = analyze_content_with_ai(
-                                    page.content(),
-                                    main_ai_prompt # Use general prompt
-                                )
-                                report_content.append(ai_analysis_form_submit)
-                                # After form submission, navigate back to original URL to continue crawling
-                                page.goto(cleaned_current_url, wait_until="domcontentloaded")
-                                time.sleep(2)
-                            else:
-                                report_content.append(f"WARN: No clickable submit button found for form {form_index}.")
-
-                        except PlaywrightTimeoutError as e:
-                            report_content.append(f"FAIL: Form interaction failed (Timeout) for form {form_index}: {e}")
-                        except Exception as e:
-                            report_content.append(f"ERROR: General error during form interaction for form {form_index}: {e}")
-                        finally:
-                            pass # No explicit navigation back needed if submit failed or form was AJAX
-
-            except PlaywrightTimeoutError:
-                report_content.append(f"FAIL: Page {cleaned_current_url} did not load within timeout.")
-                page.screenshot(path=os.path.join(SCREENSHOT_DIR, f"page_load_timeout_{page_count}.png"))
-            except Exception as e:
-                report_content.append(f"ERROR: An unexpected error occurred while testing {cleaned_current_url}: {e}")
-                page.screenshot(path=os.path.join(SCREENSHOT_DIR, f"page_error_{page_count}.png"))
-
-        if page_count >= MAX_PAGES_TO_VISIT:
+        report_content.append(f"Execution Profile: {execution_profile.summary()}")
+        report_content.append(f"Gemini Model Used: {GEMINI_MODEL}")
+        report_content.append(f"Crawl Concurrency: {CRAWL_CONCURRENCY}\n")
+
+        engine = CrawlEngine(
+            context,
+            test_page,
+            max_pages=MAX_PAGES_TO_VISIT,
+            concurrency=CRAWL_CONCURRENCY,
+            allow_url=lambda url: CLICK_EXTERNAL_LINKS or urlparse(url).netloc == urlparse(base_url).netloc,
+        )
+        engine.add_url(start_url)
+
+        await analysis_pipeline.start()
+        crawl_results = await engine.run()
+        await analysis_pipeline.close() # Wait for the last analyses to finish
+        if http_fetcher:
+            await http_fetcher.close()
+        if recrawl_state:
+            recrawl_state.save()
+        for _, _, page_report in crawl_results:
+            report_content.extend(await resolve_report_lines(page_report))
+        for skipped_url in engine.skipped_urls:
+            report_content.append(f"Skipping external URL: {skipped_url}")
+        for trapped_url, reason in engine.trapped_urls.items():
+            report_content.append(f"Skipping possible crawler trap: {trapped_url} ({reason})")
+
+        if engine.page_count >= MAX_PAGES_TO_VISIT:
             report_content.append(f"\n--- Maximum pages to visit ({MAX_PAGES_TO_VISIT}) reached. Stopping traversal. ---")
         report_content.append("\n--- Automated Web Test Complete ---")
-        report_content.append(f"Total unique pages visited: {len(visited_urls)}")
+        report_content.append(f"Total unique pages visited: {len(engine.visited_urls)}")
         report_content.append(f"Total forms attempted: {'N/A (Simplified)' if not TEST_FORMS_ON_EACH_PAGE else 'Yes, forms attempted'}") # Update if form testing is detailed
 
-        browser.close() # Close the browser when done
+        report_content.append(f"Resource Policy: {resource_policy.summary()}")
+        await browser.close() # Close the browser when done
 
     # --- Generate Report ---
     print(f"\nWriting report to {REPORT_FILE}...")
@@ -230,4 +295,4 @@ def run_web_test_playwright():
     print("Please review the report for AI insights and test outcomes and check the 'screenshots_playwright_test' directory.")
 
 if __name__ == "__main__":
-    run_web_test_playwright()
\ No newline at end of file
+    asyncio.run(run_web_test_playwright())
\ No newline at end of file
@@ -0,0 +1,181 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from dataclasses import dataclass, field
+
+from analysis_pipeline import analysis_succeeded
+from html_reducer import reduce_html
+from tiered_fetcher import HttpPage
+from url_canonicalizer import canonical_key
+
+# --- Incremental Re-crawl Settings ---
+RECRAWL_STATE_DIR = "recrawl_state" # One file per script and prompt: validators, fingerprints and links of every page from earlier runs
+PREFETCH_TIMEOUT = 10 # Seconds for the HTTP check made before a page is rendered
+PREFETCH_MAX_BYTES = 5 * 1024 * 1024 # Larger responses are never fingerprinted (always treated as changed)
+PREFETCH_USER_AGENT = "Mozilla/5.0 (compatible; ai-web-test incremental check)"
+
+
+@dataclass
+class PrefetchResult:
+    status: int # 304 when the server confirmed the stored validators
+    etag: str | None
+    last_modified: str | None
+    fingerprint: str | None # Hash of the served page's outline; None for a 304
+
+
+@dataclass
+class ChangeCheck:
+    unchanged: bool
+    since: str | None = None # Run in which an unchanged page last changed
+    links: list[str] = field(default_factory=list) # Links recorded for an unchanged page in that run
+    prefetch: PrefetchResult | None = None
+
+
+def content_fingerprint(body: bytes, content_type: str, charset: str = "utf-8") -> str:
+    """Hash of the page outline for HTML (so nonces and inline scripts don't count as changes), of the bytes otherwise."""
+    if "html" in content_type:
+        try:
+            text = body.decode(charset, errors="replace")
+        except LookupError:
+            text = body.decode("utf-8", errors="replace")
+        body = reduce_html(text, max_chars=0).encode("utf-8")
+    return hashlib.sha256(body).hexdigest()
+
+
+def _conditional_headers(entry: dict | None) -> dict:
+    headers = {}
+    if entry and entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry and entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+
+def prefetch_page(url: str, entry: dict | None = None) -> PrefetchResult | None:
+    """Conditional GET with the stored validators; None when the check itself fails."""
+    headers = {"User-Agent": PREFETCH_USER_AGENT, "Accept-Encoding": "identity", **_conditional_headers(entry)}
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=PREFETCH_TIMEOUT) as response:
+            body = response.read(PREFETCH_MAX_BYTES + 1)
+            fingerprint = None
+            if len(body) <= PREFETCH_MAX_BYTES:
+                fingerprint = content_fingerprint(body, response.headers.get_content_type(), response.headers.get_content_charset() or "utf-8")
+            return PrefetchResult(response.status, response.headers.get("ETag"), response.headers.get("Last-Modified"), fingerprint)
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            return PrefetchResult(304, e.headers.get("ETag"), e.headers.get("Last-Modified"), None)
+        return None
+    except Exception as e:
+        print(f"WARN: Incremental check of {url} failed ({e}); rendering it.")
+        return None
+
+
+def prefetch_from_page(page: HttpPage | None) -> PrefetchResult | None:
+    """The same check result from a page the HTTP tier already fetched (with RecrawlState.conditional_headers)."""
+    if page is None or page.status >= 400:
+        return None
+    if page.status == 304:
+        return PrefetchResult(304, page.etag, page.last_modified, None)
+    # Fingerprinted from the decoded text; the outline (all HTML fingerprints use) is the same either way
+    fingerprint = content_fingerprint(page.html.encode("utf-8"), page.content_type)
+    return PrefetchResult(page.status, page.etag, page.last_modified, fingerprint)
+
+
+class RecrawlState:
+    """
+    Per-URL validators (ETag, Last-Modified), content fingerprint and crawlable links
+    from earlier runs. check() asks the server whether a page changed, by conditional
+    request or, where the server offers no validators, by fingerprinting what it
+    serves; check_fetched() does the same with a response the HTTP tier already has.
+    Unchanged pages skip the browser render and AI analysis; their stored links keep
+    the crawl going. Pages are only stored once their analysis has succeeded, so a
+    failed one is redone next run. Safe to call from worker threads.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.run_label = time.strftime("%Y-%m-%d %H:%M") # How reports name this run
+        self.entries = {} # url key -> {etag, last_modified, fingerprint, links, changed_run, checked_run}
+        self.awaiting_analysis = [] # (url, check, links, analysis future) recorded before their analysis finished
+        self.lock = threading.Lock()
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.entries = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"WARN: Could not read re-crawl state {path}: {e}. Every page will be rendered.")
+                self.entries = {}
+
+    @classmethod
+    def for_crawl(cls, name: str, *prompts: str, directory: str = RECRAWL_STATE_DIR):
+        """Re-crawl state of this script's runs with these prompts; another script or prompt never reuses its analyses."""
+        digest = hashlib.sha256("\n".join(prompts).encode("utf-8")).hexdigest()[:16]
+        return cls(os.path.join(directory, f"{name}_{digest}.json"))
+
+    def _entry(self, url: str) -> dict | None:
+        with self.lock:
+            return self.entries.get(canonical_key(url))
+
+    def conditional_headers(self, url: str) -> dict:
+        """Request headers that let the server answer 304 if the page hasn't changed since it was recorded."""
+        return _conditional_headers(self._entry(url))
+
+    def check(self, url: str) -> ChangeCheck:
+        """Whether the page is unchanged since it was last rendered (makes one HTTP request)."""
+        entry = self._entry(url)
+        return self._compare(entry, prefetch_page(url, entry))
+
+    def check_fetched(self, url: str, page: HttpPage | None) -> ChangeCheck:
+        """Like check(), but from the HTTP tier's response (None if that fetch failed), so no second request is made."""
+        return self._compare(self._entry(url), prefetch_from_page(page))
+
+    def _compare(self, entry: dict | None, prefetch: PrefetchResult | None) -> ChangeCheck:
+        if entry is None or prefetch is None:
+            return ChangeCheck(False, prefetch=prefetch)
+        if prefetch.status != 304 and (prefetch.fingerprint is None or prefetch.fingerprint != entry.get("fingerprint")):
+            return ChangeCheck(False, prefetch=prefetch)
+        with self.lock:
+            entry["checked_run"] = self.run_label
+            entry["etag"] = prefetch.etag or entry.get("etag")
+            entry["last_modified"] = prefetch.last_modified or entry.get("last_modified")
+        return ChangeCheck(True, entry["changed_run"], list(entry["links"]), prefetch)
+
+    def record(self, url: str, check: ChangeCheck, links: list[str], analysis=None):
+        """
+        Stores what a rendered page looked like, so the next run can skip it if it stays the same.
+        With the page's analysis future, that happens in save(), and only if the analysis succeeded.
+        """
+        if analysis is not None:
+            with self.lock:
+                self.awaiting_analysis.append((url, check, links, analysis))
+            return
+        key = canonical_key(url)
+        prefetch = check.prefetch
+        with self.lock:
+            if prefetch is None or prefetch.fingerprint is None:
+                self.entries.pop(key, None) # Nothing to compare against next time
+                return
+            self.entries[key] = {
+                "etag": prefetch.etag, "last_modified": prefetch.last_modified, "fingerprint": prefetch.fingerprint,
+                "links": list(dict.fromkeys(links)), "changed_run": self.run_label, "checked_run": self.run_label,
+            }
+
+    def save(self):
+        """Stores the pages whose analysis succeeded (call once analyses have finished), then writes the state to disk atomically."""
+        with self.lock:
+            awaiting, self.awaiting_analysis = self.awaiting_analysis, []
+        for url, check, links, analysis in awaiting:
+            if analysis_succeeded(analysis):
+                self.record(url, check, links)
+        tmp_path = f"{self.path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with self.lock, open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"WARN: Could not write re-crawl state {self.path}: {e}")
@@ -0,0 +1,90 @@
+from urllib.parse import urlparse
+
+# --- Resource Policy Settings ---
+# Well-known analytics, ad and tag-manager hosts; subdomains are matched too
+TRACKER_DOMAINS = {
+    "google-analytics.com", "googletagmanager.com", "googleadservices.com", "googlesyndication.com",
+    "doubleclick.net", "adservice.google.com", "connect.facebook.net", "analytics.twitter.com",
+    "static.ads-twitter.com", "bat.bing.com", "clarity.ms", "hotjar.com", "segment.io", "segment.com",
+    "mixpanel.com", "amplitude.com", "newrelic.com", "nr-data.net", "scorecardresearch.com",
+    "quantserve.com", "taboola.com", "outbrain.com", "criteo.com", "adnxs.com", "fullstory.com",
+}
+
+# Named profiles. "blocked_types" are Playwright resource types
+# (document, stylesheet, image, media, font, script, xhr, fetch, websocket, other ...).
+# Any policy that blocks something routes every request, and Playwright disables the
+# browser's HTTP cache while routing is on: shared CSS, JS and fonts are downloaded again
+# for every page. On multi-page crawls of one site that can cost more than blocking saves.
+RESOURCE_POLICIES = {
+    "full": {"blocked_types": set(), "block_trackers": False},
+    # Keeps images and CSS so screenshots still look like the real page
+    "lean": {"blocked_types": {"media", "font"}, "block_trackers": True},
+    # For analysis-only crawls that just need the DOM
+    "text-only": {"blocked_types": {"image", "media", "font", "stylesheet"}, "block_trackers": True},
+}
+DEFAULT_RESOURCE_POLICY = "full" # Keeps the HTTP cache; "lean" pays off on tracker-heavy sites or single-page runs
+
+
+def _host_matches(host: str, domains: set) -> bool:
+    """True if host is one of domains or a subdomain of one."""
+    labels = host.split(".")
+    return any(".".join(labels[i:]) in domains for i in range(len(labels)))
+
+
+class ResourcePolicy:
+    """
+    Allows or denies requests by resource type and domain using Playwright route
+    interception (which turns off the browser cache for the context). Allowed domains
+    always win; documents are never blocked, so navigation itself can't be broken by a policy.
+    """
+
+    def __init__(self, blocked_types=(), block_trackers: bool = True, blocked_domains=(), allowed_domains=(), name: str = "custom"):
+        self.name = name
+        self.blocked_types = set(blocked_types) - {"document"}
+        self.blocked_domains = set(blocked_domains) | (TRACKER_DOMAINS if block_trackers else set())
+        self.allowed_domains = set(allowed_domains)
+        self.blocked_count = 0
+        self.allowed_count = 0
+
+    @classmethod
+    def from_profile(cls, name: str, blocked_domains=(), allowed_domains=()):
+        if name not in RESOURCE_POLICIES:
+            print(f"WARN: Unknown resource policy '{name}'; using '{DEFAULT_RESOURCE_POLICY}'.")
+            name = DEFAULT_RESOURCE_POLICY
+        profile = RESOURCE_POLICIES[name]
+        return cls(profile["blocked_types"], profile["block_trackers"], blocked_domains, allowed_domains, name=name)
+
+    @property
+    def blocks_anything(self) -> bool:
+        return bool(self.blocked_types or self.blocked_domains)
+
+    def should_block(self, resource_type: str, url: str) -> bool:
+        host = (urlparse(url).hostname or "").lower()
+        if host and _host_matches(host, self.allowed_domains):
+            return False
+        if resource_type == "document":
+            return False
+        return resource_type in self.blocked_types or (bool(host) and _host_matches(host, self.blocked_domains))
+
+    async def _handle_route(self, route):
+        request = route.request
+        if self.should_block(request.resource_type, request.url):
+            self.blocked_count += 1
+            await route.abort()
+        else:
+            self.allowed_count += 1
+            await route.continue_()
+
+    async def apply(self, context):
+        """Installs the policy on a browser context (covers every page opened in it)."""
+        if self.blocks_anything:
+            await context.route("**/*", self._handle_route)
+        return self
+
+    def summary(self) -> str:
+        return f"{self.name} ({self.blocked_count} requests blocked, {self.allowed_count} allowed)"
+
+
+async def apply_resource_policy(context, name: str = DEFAULT_RESOURCE_POLICY, blocked_domains=(), allowed_domains=()) -> ResourcePolicy:
+    """Builds the named policy and installs it on the context."""
+    return await ResourcePolicy.from_profile(name, blocked_domains, allowed_domains).apply(context)
@@ -0,0 +1,107 @@
+import json
+import os
+import re
+import time
+
+# --- Selector Cache Settings ---
+SELECTOR_CACHE_FILE = "selector_cache.json" # Where resolved selectors are remembered between runs
+SELECTOR_CACHE_MAX_AGE_DAYS = 14 # Entries not validated within this many days are dropped
+SELECTOR_CACHE_MIN_ATTEMPTS = 3 # Don't judge an entry's hit rate before this many uses
+SELECTOR_CACHE_MIN_HIT_RATE = 0.5 # Entries that fail more often than this are evicted
+
+
+def normalize_description(description: str) -> str:
+    """Lowercases a selector description and collapses whitespace and surrounding punctuation."""
+    description = re.sub(r"\s+", " ", description.lower()).strip()
+    return description.strip(" .,:;!?")
+
+
+def cache_key(host: str, action: str, description: str) -> str:
+    """Builds the (host, action, normalized description) lookup key."""
+    return f"{host.lower()}|{action}|{normalize_description(description)}"
+
+
+class SelectorCache:
+    """
+    On-disk record of which selector worked for a given description on a given site.
+    Each entry keeps the winning selector, its hit/miss counts and when it last worked,
+    so repeat runs can go straight to the known-good selector.
+    """
+
+    def __init__(self, path: str = SELECTOR_CACHE_FILE):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.entries = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"WARN: Could not read selector cache {path}: {e}. Starting with an empty cache.")
+                self.entries = {}
+        if self.evict_stale():
+            self.save()
+
+    def _is_stale(self, entry: dict) -> bool:
+        max_age = SELECTOR_CACHE_MAX_AGE_DAYS * 24 * 3600
+        return time.time() - entry.get("last_validated", 0) > max_age
+
+    def _is_failing(self, entry: dict) -> bool:
+        attempts = entry.get("hits", 0) + entry.get("misses", 0)
+        if attempts < SELECTOR_CACHE_MIN_ATTEMPTS:
+            return False
+        return entry.get("hits", 0) / attempts < SELECTOR_CACHE_MIN_HIT_RATE
+
+    def evict_stale(self) -> int:
+        """Removes entries that are too old or fail too often. Returns how many were removed."""
+        doomed = [key for key, entry in self.entries.items() if self._is_stale(entry) or self._is_failing(entry)]
+        for key in doomed:
+            del self.entries[key]
+        return len(doomed)
+
+    def lookup(self, host: str, action: str, description: str) -> str | None:
+        """Returns the cached selector for this description on this host, if there is a usable one."""
+        entry = self.entries.get(cache_key(host, action, description))
+        if not entry or self._is_stale(entry):
+            return None
+        return entry["selector"]
+
+    def record_success(self, host: str, action: str, description: str, selector: str):
+        """Remembers that the selector worked; a different winner replaces the old entry."""
+        key = cache_key(host, action, description)
+        entry = self.entries.get(key)
+        if not entry or entry["selector"] != selector:
+            entry = {"selector": selector, "hits": 0, "misses": 0}
+            self.entries[key] = entry
+        entry["hits"] += 1
+        entry["last_validated"] = time.time()
+        self.save()
+
+    def record_failure(self, host: str, action: str, description: str):
+        """Counts a miss for the cached selector and evicts it once its hit rate drops too low."""
+        key = cache_key(host, action, description)
+        entry = self.entries.get(key)
+        if not entry:
+            return
+        entry["misses"] += 1
+        if self._is_failing(entry):
+            print(f"Evicting failing cached selector '{entry['selector']}' for {key}")
+            del self.entries[key]
+        self.save()
+
+    def hit_rate(self, host: str, action: str, description: str) -> float | None:
+        """Fraction of uses where the cached selector worked, or None if there is no entry."""
+        entry = self.entries.get(cache_key(host, action, description))
+        if not entry:
+            return None
+        attempts = entry["hits"] + entry["misses"]
+        return entry["hits"] / attempts if attempts else None
+
+    def save(self):
+        """Writes the cache to disk atomically."""
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"WARN: Could not write selector cache {self.path}: {e}")
@@ -0,0 +1,73 @@
+import asyncio
+
+# --- Selector Race Settings ---
+# Once the race has found which candidates are on the page, the action itself
+# only needs a short timeout per selector.
+MATCHED_SELECTOR_TIMEOUT = 2000
+
+
+async def _probe_selector(page, selector: str, state: str) -> bool:
+    """Returns True if the selector matches an element in the requested state right now."""
+    try:
+        element = await page.query_selector(selector)
+        if element is None:
+            return False
+        if state == 'visible':
+            return await element.is_visible()
+        return True
+    except Exception:
+        # Malformed or unsupported selectors simply don't match
+        return False
+
+
+async def probe_selectors(page, selectors: list[str], state: str = 'visible') -> list[str]:
+    """
+    Checks every candidate selector concurrently, without waiting,
+    and returns the ones that currently match, in their original priority order.
+    """
+    results = await asyncio.gather(*(_probe_selector(page, sel, state) for sel in selectors))
+    return [sel for sel, matched in zip(selectors, results) if matched]
+
+
+async def race_selectors(page, selectors: list[str], state: str = 'visible', timeout: int = 15000) -> list[str]:
+    """
+    Resolves a list of candidate selectors in one pass instead of one by one.
+
+    All candidates are probed at once; if none matches yet, a wait is started for
+    every candidate concurrently. As soon as any of them appears the remaining waits
+    are cancelled and the page is probed again so the highest-priority match wins.
+    A step therefore costs at most one timeout, however many candidates there are.
+
+    Returns the matching selectors in priority order (empty list if nothing matched).
+    """
+    if not selectors:
+        return []
+
+    matches = await probe_selectors(page, selectors, state)
+    if matches:
+        return matches
+
+    waiters = {
+        asyncio.ensure_future(page.wait_for_selector(sel, state=state, timeout=timeout)): sel
+        for sel in selectors
+    }
+    pending = set(waiters)
+    first_matches = []
+    try:
+        while pending and not first_matches:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if not task.cancelled() and task.exception() is None:
+                    first_matches.append(waiters[task])
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    if not first_matches:
+        return []
+
+    # A lower-priority candidate may have won the race while a better one was
+    # appearing at the same time, so re-probe everything before deciding.
+    matches = await probe_selectors(page, selectors, state)
+    return matches or [sel for sel in selectors if sel in first_matches]
@@ -0,0 +1,140 @@
+import json
+import os
+import re
+import time
+
+# --- Selector Ranking Settings ---
+SELECTOR_STATS_FILE = "selector_stats.json" # Per-host and global success counts for individual selectors
+SELECTOR_TOP_K = 12 # Candidates tried first when selectors are tried one by one; the lower-ranked rest is only tried if all of these fail
+SELECTOR_DEFAULT_RATE = 0.1 # Assumed success rate of a selector that has never been tried
+SELECTOR_PRIOR_WEIGHT = 4 # How many observations the fallback rate counts as when blending (host <- global <- default)
+GLOBAL_HOST = "*" # Stats key for counts across all hosts
+SELECTOR_STATS_MAX_ENTRIES = 5000 # Least recently used (host, selector) counts are dropped beyond this
+SELECTOR_STATS_SAVE_INTERVAL = 30 # Seconds between writes while a run records results; save() at the end writes the rest
+
+HAS_TEXT_RE = re.compile(r""":has-text\((['"])(.*?)\1\)""")
+ATTRIBUTE_RE = re.compile(r"""\[([\w-]+)\s*([*^$|~]?=)\s*(?:'([^']*)'|"([^"]*)"|([^\]'"\s]+))\s*\]""")
+
+
+def _quote(value: str) -> str:
+    return f'"{value}"' if "'" in value else f"'{value}'"
+
+
+def canonical_selector(selector: str) -> str:
+    """
+    Collapses spellings that select the same elements: whitespace runs, attribute
+    value quoting, and the case of :has-text() (Playwright matches it case-insensitively).
+    """
+    selector = re.sub(r"\s+", " ", selector.strip())
+    if selector.startswith("//"):
+        return selector # XPath; leave it alone
+    selector = HAS_TEXT_RE.sub(lambda m: f":has-text({_quote(m.group(2).lower())})", selector)
+    return ATTRIBUTE_RE.sub(
+        lambda m: f"[{m.group(1)}{m.group(2)}{_quote(next(v for v in m.group(3, 4, 5) if v is not None))}]",
+        selector,
+    )
+
+
+def dedupe_selectors(selectors: list[str]) -> list[str]:
+    """Drops exact and near-duplicate selectors, keeping the first spelling of each."""
+    seen = set()
+    unique = []
+    for selector in selectors:
+        key = canonical_selector(selector)
+        if key not in seen:
+            seen.add(key)
+            unique.append(selector)
+    return unique
+
+
+class SelectorStats:
+    """
+    On-disk tally of how often each selector was tried and how often it was the one
+    that worked, per host and across all hosts. Inferred candidates are ranked by
+    these rates: the host's own history first, the global rate where the host has
+    little history, and SELECTOR_DEFAULT_RATE where there is none at all.
+    """
+
+    def __init__(self, path: str = SELECTOR_STATS_FILE):
+        self.path = path
+        self.entries = {} # host -> canonical selector -> {tries, wins, used}
+        self.dirty = False
+        self.last_save = time.monotonic()
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.entries = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"WARN: Could not read selector stats {path}: {e}. Starting with no history.")
+                self.entries = {}
+
+    def _counts(self, host: str, key: str) -> tuple[int, int]:
+        entry = self.entries.get(host, {}).get(key)
+        return (entry["tries"], entry["wins"]) if entry else (0, 0)
+
+    def score(self, host: str, selector: str) -> float:
+        """Estimated chance that the selector works on this host."""
+        key = canonical_selector(selector)
+        tries, wins = self._counts(GLOBAL_HOST, key)
+        global_rate = (wins + SELECTOR_PRIOR_WEIGHT * SELECTOR_DEFAULT_RATE) / (tries + SELECTOR_PRIOR_WEIGHT)
+        tries, wins = self._counts(host.lower(), key)
+        return (wins + SELECTOR_PRIOR_WEIGHT * global_rate) / (tries + SELECTOR_PRIOR_WEIGHT)
+
+    def rank(self, selectors: list[str], host: str) -> list[str]:
+        """Dedupes the candidates and orders them by score; ties keep the inferred order."""
+        unique = dedupe_selectors(selectors)
+        scores = {selector: self.score(host, selector) for selector in unique}
+        return sorted(unique, key=lambda selector: -scores[selector])
+
+    def shortlist(self, selectors: list[str], host: str, top_k: int = SELECTOR_TOP_K) -> tuple[list[str], list[str]]:
+        """Returns the top_k best-ranked candidates and the rest (top_k <= 0 means no cap)."""
+        ranked = self.rank(selectors, host)
+        if top_k <= 0:
+            return ranked, []
+        return ranked[:top_k], ranked[top_k:]
+
+    def record(self, host: str, tried: list[str], winner: str | None):
+        """
+        Counts an attempt for each selector tried, in ranked order, up to and including
+        the winner. Candidates ranked below the winner were never needed, so they aren't
+        penalized. With no winner every candidate counts as a miss.
+        """
+        if winner in tried:
+            tried = tried[:tried.index(winner) + 1]
+        winner_key = canonical_selector(winner) if winner else None
+        for key in dict.fromkeys(canonical_selector(selector) for selector in tried):
+            for stats_host in (host.lower(), GLOBAL_HOST):
+                entry = self.entries.setdefault(stats_host, {}).setdefault(key, {"tries": 0, "wins": 0})
+                entry["tries"] += 1
+                entry["used"] = time.time()
+                if key == winner_key:
+                    entry["wins"] += 1
+        self.dirty = True
+        if time.monotonic() - self.last_save >= SELECTOR_STATS_SAVE_INTERVAL:
+            self.save()
+
+    def _evict(self):
+        """Drops the least recently used counts beyond SELECTOR_STATS_MAX_ENTRIES."""
+        counts = [(entry.get("used", 0), host, key) for host, selectors in self.entries.items() for key, entry in selectors.items()]
+        if len(counts) <= SELECTOR_STATS_MAX_ENTRIES:
+            return
+        counts.sort()
+        for _, host, key in counts[:len(counts) - SELECTOR_STATS_MAX_ENTRIES]:
+            del self.entries[host][key]
+            if not self.entries[host]:
+                del self.entries[host]
+
+    def save(self):
+        """Writes the stats to disk atomically, if anything was recorded since the last write. Call at the end of a run."""
+        if not self.dirty:
+            return
+        self._evict()
+        self.dirty = False
+        self.last_save = time.monotonic()
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"WARN: Could not write selector stats {self.path}: {e}")
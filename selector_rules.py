@@ -0,0 +1,593 @@
+import os
+import re
+from collections import deque
+from functools import lru_cache
+
+SELECTOR_RULE_CACHE_SIZE = 512 # Descriptions already resolved; plan replays and retries ask for the same ones again
+
+# Declarative rules behind infer_generic_selectors. The table is compiled once at import:
+# every keyword it mentions goes into one Aho-Corasick automaton, so a description is
+# scanned a single time no matter how many rules there are, and only rules whose
+# keywords occurred (plus the few keyword-free ones) are evaluated.
+#
+# A rule is a dict:
+#   "when":  condition that must hold for the rule to fire (see _holds for the keys)
+#   "group": rules sharing a group form an if/elif chain; only the first that fires applies
+#   "steps": run in order once the rule fires; a rule without steps is itself one step
+# A step may have its own "when", then any of:
+#   "capture"/"from": store the first value the extractors produce under that name
+#                     (empty strings are skipped unless "accept_empty" is set)
+#   "add":            selectors appended as-is
+#   "format":         selectors formatted with the captured values (plus "description")
+#   "for_each":       (name, keywords): repeat "format" for each keyword present in the description
+
+
+# --- Extractors ---
+def regex(pattern: str, source: str = "lower", strip: bool = False) -> tuple:
+    """First group of a precompiled pattern, searched in the lowercased ("lower") or original ("description") text."""
+    return ("regex", re.compile(pattern), source, strip)
+
+
+def phrase(*phrases: str) -> tuple:
+    """The first of phrases that occurs in the description."""
+    return ("phrase", phrases)
+
+
+def derive(name: str, transform) -> tuple:
+    """transform(value) of an already captured value."""
+    return ("derive", name, transform)
+
+
+AMAZON_HOSTS = ["amazon.in", "amazon.com"]
+PRICE_SORT_KEYWORDS = ["price", "cost", "high to low", "low to high", "descending", "ascending"]
+COMMON_INPUT_LABELS = ["password", "email address", "email", "first name", "last name", "company name", "username"] # Password first: it gets type='password' selectors
+
+# --- Rule Table ---
+SELECTOR_RULES = [
+    # --- Common Elements & Actions ---
+    {"name": "sign in", "when": {"any": ["sign in", "log in", "login"]}, "add": [
+        "button:has-text('Sign in')",
+        "button:has-text('Log in')",
+        "a:has-text('Sign in')",
+        "a:has-text('Log in')",
+        "[aria-label*='Sign in']",
+        "[aria-label*='Log in']",
+        "[data-testid*='login-button']",  # Common test ID pattern
+        "[data-tracking*='login']",  # Common analytics tracking pattern
+        ".login-button",  # Common class name
+        ".signin-button",
+        "[role='button']:has-text('Sign in')",  # For accessible buttons
+        "input[value*='Sign in'][type='submit']",  # Submit buttons
+        "input[value*='Log in'][type='submit']",
+        "nav a:has-text('Sign in')",  # In navigation
+        "header a:has-text('Sign in')",  # In header
+        "#login-button",  # Common ID
+        "#signin-button",
+        "button[type='button']:has-text('Sign in')",
+        "a[href*='login']",  # Links containing login
+        "a[href*='signin']",
+        "a[href*='auth']",  # Common auth paths
+        # Capitalization variants
+        "button:has-text('Sign In')",
+        "button:has-text('Log In')",
+        "a:has-text('Sign In')",
+        "a:has-text('Log In')",
+        # Language variants
+        "button:has-text('Se connecter')",  # French
+        "button:has-text('Anmelden')",  # German
+        "button:has-text('Iniciar sesión')",  # Spanish
+    ]},
+
+    # --- Search, sorting, filters and extraction targets (one of these at most) ---
+    {"name": "search bar", "group": "element", "when": {"any": ["search bar", "search input", "search box"]}, "steps": [
+        {"when": {"url_any": AMAZON_HOSTS}, "add": ["#twotabsearchtextbox"]}, # Amazon's main search bar ID
+        {"add": [
+            "input[type='search']",
+            "input[placeholder*='search']",
+            "input[aria-label*='search']",
+            "input[name*='search']",
+            "input#search",
+            "input.search-input",
+            "div.nav-search-field input", # Amazon specific
+            "input[role='searchbox']",
+            "form[role='search'] input",
+            "input[type='text'][name*='q']", # Common for search query
+            "input.query-input",
+        ]},
+    ]},
+    {"name": "search button", "group": "element", "when": {"any": ["search button", "submit search", "search icon"]}, "steps": [
+        {"when": {"url_any": AMAZON_HOSTS}, "add": [".nav-search-submit input[type='submit']", "button[type='submit'][data-csa-c-type='widget']"]},
+        {"add": [
+            "button:has-text('Search')",
+            "input[type='submit'][value*='Search']",
+            "button[aria-label*='Search']",
+            "a[aria-label*='Search']",
+            "button#search-button",
+            "button.search-submit",
+            "button[type='submit']",
+            "input[type='submit']",
+            "[role='button']:has-text('Search')",
+            "i.search-icon", # Common for icon-only search buttons
+            "button.search-icon",
+        ]},
+    ]},
+    {"name": "sort", "group": "element", "when": {"any": ["filter by", "sort by", "order by", "cost high to low", "price"]}, "steps": [
+        {"when": {"any": ["dropdown", "select", "option"]}, "add": [
+            "select[aria-label*='sort']",
+            "select[name*='sort']",
+            "select[id*='sort']",
+            "select.sort-by",
+            "select",
+            "div[role='combobox'][aria-haspopup='listbox']", # Common pattern for accessible custom dropdowns
+            "button:has-text('Sort by')", # If the dropdown is opened by a button
+            "a:has-text('Sort by')",    # If the dropdown is a link
+            "span:has-text('Sort by') ~ select", # If the label is a span next to the select
+            "div.select-wrapper select", # Common wrapper class
+            "div.dropdown-menu-button", # Generic dropdown trigger
+            "label:has-text('Sort by') + select", # Label preceding a select
+        ]},
+        # The option to pick, e.g. "Sort by 'Price: High to Low'"
+        {"when": {"any": ["dropdown", "select", "option"]}, "capture": "option_text", "accept_empty": True, "from": [
+            regex(r"'(.*?)'", source="description"),
+            derive("description", lambda description: description.replace("sort by ", "").strip()),
+        ]},
+        {"when": {"has": "option_text"}, "capture": "option_value", "from": [derive("option_text", lambda text: text.lower().replace(" ", "_"))]},
+        {"when": {"has": "option_text"}, "capture": "option_compact", "from": [derive("option_text", lambda text: text.lower().replace(" ", ""))]},
+        {"when": {"has": "option_text"}, "format": [
+            "option:has-text('{option_text}')",
+            "option[label='{option_text}']",
+            "option[value*='{option_value}']", # for values like price_desc
+            "option[value*='{option_compact}']", # for values like pricehightolow
+            "div[role='option']:has-text('{option_text}')", # for custom dropdowns
+            "a:has-text('{option_text}')", # for custom dropdowns where options are links
+            "button:has-text('{option_text}')", # for custom dropdowns where options are buttons
+        ]},
+        # Price/cost options that might not be in a dropdown
+        {"for_each": ("keyword", PRICE_SORT_KEYWORDS), "format": [
+            "button:has-text('{description}')",
+            "a:has-text('{description}')",
+            "button:has-text('{keyword}')",
+            "a:has-text('{keyword}')",
+            "*[aria-label*='{keyword}'][role='button']",
+            "*[aria-label*='{keyword}'][role='link']",
+            ".sort-option:has-text('{description}')",
+            ".filter-option:has-text('{description}')",
+        ]},
+        {"when": {"any": ["dropdown"]}, "capture": "dropdown_text", "accept_empty": True, "from": [derive("description", lambda description: description.replace("dropdown", "").strip())]},
+        {"when": {"any": ["dropdown"]}, "format": ["text='{dropdown_text}'"]},
+    ]},
+    # Brand filters and any other checkbox, e.g. "checkbox labeled 'Boat'" or "click 'I agree to terms'"
+    {"name": "filter checkbox", "group": "element", "when": {"any": ["brand", "filter by brand", "checkbox", "terms", "agree"]}, "steps": [
+        {"capture": "filter_label", "from": [
+            regex(r"'(.*?)'", strip=True),
+            regex(r"checkbox for\s*(.*?)(?:\s+in|\s+section)?", strip=True),
+            regex(r"checkbox labeled\s*(.*?)(?:\s+in|\s+section)?", strip=True),
+            phrase("agree to the terms", "terms and conditions"),
+        ]},
+        {"when": {"has": "filter_label"}, "format": [
+            "input[type='checkbox'][value*='{filter_label}']",
+            "input[type='radio'][value*='{filter_label}']",
+            "label:has-text('{filter_label}') input[type='checkbox']", # checkbox with adjacent label
+            "label:has-text('{filter_label}') input[type='radio']",
+            "div.a-checkbox:has-text('{filter_label}') input", # Amazon-specific checkbox
+            "span.a-checkbox-label:has-text('{filter_label}') input", # Another Amazon-specific checkbox
+            "input[type='checkbox'][aria-label*='{filter_label}']",
+            "input[type='radio'][aria-label*='{filter_label}']",
+            "//label[contains(., '{filter_label}')]/input[@type='checkbox']",
+            "div:has-text('{filter_label}') input[type='checkbox']",
+            "span:has-text('{filter_label}') input[type='checkbox']",
+            # Links/buttons acting as brand filters
+            "a:has-text('{filter_label}')",
+            "button:has-text('{filter_label}')",
+            "div.s-navigation-item-label:has-text('{filter_label}') a", # Amazon-specific link
+            "li:has-text('{filter_label}') a", # Link within a list item
+            "[data-csa-c-content-id*='{filter_label}']", # Common data attribute for filters
+            ".brand-name:has-text('{filter_label}')", # Common class for brand names
+        ]},
+        # The brand filter section itself
+        {"add": [
+            "div.s-filters div.s-card-border:has-text('Brand')", # Amazon-like brand filter section
+            "section:has-text('Brand')",
+            "#brandsRefinements", # Common ID for brand filter sections
+            ".brand-filter-section",
+            ".s-navigation-group:has-text('Brand')", # Another Amazon-specific navigation group
+            "[aria-label*='Brand filter']",
+            "h3:has-text('Brand') + div", # Section title followed by filter options
+            "h2:has-text('Brand') + div",
+        ]},
+        {"when": {"any": ["checkbox"], "lacks": "filter_label"}, "add": ["input[type='checkbox']", "[role='checkbox']"]},
+    ]},
+    {"name": "product title", "group": "element", "when": {"any": ["product title"]}, "add": [
+        ".product-title", ".product__title", "h1.title", "h2.product-name",
+        "[data-test='product-title']", "a.product-link",
+        "span[itemprop='name']", "h3.item-name",
+        ".a-color-base.a-text-normal", # Amazon specific search result titles
+        "a.a-link-normal.a-text-normal", # Another Amazon specific for links with titles
+        ".product-grid .product-title",
+        ".product-list .product-title",
+        ".s-main-result .s-title-instructions", # Amazon search result title
+    ]},
+    {"name": "product price", "group": "element", "when": {"any": ["product price", "item price"]}, "add": [
+        ".price", ".product-price", "span.price", "div.price",
+        "[data-test='product-price']",
+        "span[itemprop='price']", "span[data-a-color='price']",
+        "span.final-price", ".offer-price",
+        ".a-price-whole", ".a-price-fraction", ".a-price-symbol", # Amazon price parts
+        ".a-offscreen", # Sometimes prices are hidden for accessibility
+        ".product-grid .price",
+        ".product-list .price",
+        ".s-main-result .a-price", # Amazon search result price
+    ]},
+    {"name": "product description", "group": "element", "when": {"any": ["product description"]}, "add": [
+        ".product-description", "#product-description", "div.description",
+        "div[itemprop='description']", ".details-content",
+        "#feature-bullets", "#productDescription", # Amazon specific
+        ".product-specs", ".item-details",
+    ]},
+    {"name": "image", "group": "element", "when": {"any": ["image"]}, "add": [
+        "img[alt*='product']", "img.product-image", ".product-gallery img",
+        "img[role='img']", "img[srcset]",
+        "img.s-image", # Amazon search result images
+    ]},
+    {"name": "review", "group": "element", "when": {"any": ["review"]}, "add": [
+        ".review-text", ".customer-review", ".review-body",
+        "[data-hook='review-body']", # Amazon specific
+        ".cr-review-text", ".review-comment",
+    ]},
+    {"name": "all products", "group": "element", "when": {"all": ["all"], "any": ["products", "items"]}, "add": [
+        ".s-main-result", # Amazon search results container
+        ".product-grid .product-card",
+        ".product-list .product-item",
+        "[data-asin]", "[data-item-id]", # Common e-commerce item attributes
+        ".product-tile", ".search-result-item",
+        ".item-cell", ".grid-item",
+    ]},
+
+    # --- Navigation & General Interaction ---
+    {"name": "navbar", "when": {"any": ["navbar", "navigation"]}, "add": ['nav', '[role="navigation"]', '.navbar', '#main-navigation', '.header-nav']},
+    {"name": "link", "when": {"any": ["link", "menu item", "tab"]}, "steps": [
+        {"capture": "link_text", "from": [regex(r'(?:link|menu item|tab|go to) ?\'?\"?([^\']+)\'?\"?')]},
+        {"when": {"has": "link_text"}, "format": [
+            "a:has-text('{link_text}')",
+            "nav a:has-text('{link_text}')",
+            "li a:has-text('{link_text}')",
+            "div[role='tab']:has-text('{link_text}')",
+            "button:has-text('{link_text}')[role='link']",
+            "[aria-label*='{link_text}'][role='link']",
+            "link[rel='{link_text}']", # For actual link tags
+        ]},
+        {"add": ['a', 'nav a', 'li a', '[role="tab"]']},
+    ]},
+    {"name": "button", "when": {"any": ["button"]}, "steps": [
+        {"capture": "button_text", "from": [regex(r'button(?: labeled| with text)?\s*\'?\"?([^\']+)\'?\"?')]},
+        {"when": {"has": "button_text"}, "format": [
+            "button:has-text('{button_text}')",
+            "input[type=submit][value*='{button_text}']",
+            "button[name*='{button_text}']",
+            "*[aria-label*='{button_text}'][role='button']",
+            "a[role='button']:has-text('{button_text}')", # link styled as button
+            "button[aria-label*='{button_text}']",
+        ]},
+        {"when": {"lacks": "button_text"}, "add": ['button', 'input[type=submit}', '[role="button"]']},
+    ]},
+    {"name": "cart", "when": {"any": ["cart", "checkout", "add to cart"]}, "add": [
+        'div.cart-item', 'li.cart-item', '#cart', '[aria-label="cart"]', '.cart-icon', '.shopping-cart',
+        'a:has-text("Cart")', 'button:has-text("Cart")',
+        'a:has-text("Checkout")', 'button:has-text("Checkout")',
+        '#add-to-cart-button', '.add-to-cart', 'button:has-text("Add to Cart")',
+    ]},
+    {"name": "modal", "when": {"any": ["modal", "dialog", "popup"]}, "add": ['div[role="dialog"]', '.modal', '.dialog', '[aria-modal="true"]', '#modal', '.popup', '[data-modal-id]']},
+
+    # --- Text Input Fields (username, email, password, general textboxes) ---
+    {"name": "input label", "steps": [
+        # Exact quoted text first (e.g. 'First name' field), else a well-known label
+        {"capture": "quoted_input_label", "accept_empty": True, "from": [regex(r"'(.*?)' (?:input|text)?(?:field|box)", strip=True)]},
+        {"when": {"set": "quoted_input_label"}, "capture": "input_label", "accept_empty": True, "from": [derive("quoted_input_label", str.lower)]},
+        {"when": {"unset": "quoted_input_label"}, "capture": "input_label", "from": [phrase(*COMMON_INPUT_LABELS)]},
+        {"when": {"unset": "quoted_input_label", "any": ["password"]}, "add": [
+            "input[type='password']", # Most specific: exact type
+            "input[name*='password']", # Common name pattern
+            "input[id*='password']",   # Common ID pattern
+            "input[placeholder*='Password']", # Common placeholder
+            "label:has-text('Password') + input[type='password']", # Label + specific type
+        ]},
+        {"when": {"unset": "quoted_input_label", "any": ["confirm"]}, "add": [ # For confirm password if it exists
+            "input[type='password'][name*='confirm']",
+            "input[type='password'][id*='confirm']",
+            "input[placeholder*='Confirm Password']",
+            "label:has-text('Confirm Password') + input[type='password']",
+        ]},
+    ]},
+    {"name": "first name field", "group": "known input", "when": {"value": ("input_label", {"first name"})}, "add": [
+        "input[placeholder*='First name']", "input[name*='first_name']", "input[id*='first_name']", "label:has-text('First name') + input",
+    ]},
+    {"name": "last name field", "group": "known input", "when": {"value": ("input_label", {"last name"})}, "add": [
+        "input[placeholder*='Last name']", "input[name*='last_name']", "input[id*='last_name']", "label:has-text('Last name') + input",
+    ]},
+    {"name": "email field", "group": "known input", "when": {"value": ("input_label", {"email", "email address"})}, "add": [
+        "input[type='email']", # Prioritize specific type
+        "input[placeholder*='Email address']", "input[name*='email']", "input[id*='email']", "label:has-text('Email address') + input",
+    ]},
+    {"name": "company name field", "group": "known input", "when": {"value": ("input_label", {"company name"})}, "add": [
+        "input[placeholder*='Company name']", "input[name*='company']", "input[id*='company']", "label:has-text('Company name') + input",
+    ]},
+    {"name": "username field", "group": "known input", "when": {"value": ("input_label", {"username"})}, "add": [
+        "input[placeholder*='Username']", "input[name*='username']", "input[id*='username']", "label:has-text('Username') + input",
+    ]},
+    {"name": "labelled field", "when": {"has": "input_label"}, "format": [
+        "input[placeholder*='{input_label}']", # General placeholder match
+        "label:has-text('{input_label}') + input", # General label + input match
+    ]},
+
+    # --- General / Fallback selectors (lowest priority) ---
+    {"name": "fallback input", "when": {"empty": True}, "add": ["input[type='text']", "textarea", "input"]},
+    {"name": "fallback text", "when": {"text_only": True}, "format": ["text='{description}'", ":has-text('{description}')"]},
+    # Button text phrased as 'button "TEXT"', 'button labeled "TEXT"' or 'the "TEXT" button'
+    {"name": "button text", "when": {"any": ["button"]}, "steps": [
+        {"capture": "button_label", "from": [
+            regex(r'(?:button(?: labeled| with text)?|the)\s*\'?\"?([^\']+)\'?\"?\s*button'),
+            regex(r'button\s*\'?\"?([^\']+)\'?\"?'),
+        ]},
+        {"when": {"has": "button_label"}, "capture": "button_label_lower", "from": [derive("button_label", str.lower)]},
+        {"when": {"has": "button_label"}, "format": [
+            "button:has-text('{button_label}')",
+            "a[role='button']:has-text('{button_label}')", # link styled as button
+            "input[type=submit][value='{button_label}']", # Exact value match for submit inputs
+            "input[type=button][value='{button_label}']", # Exact value match for button inputs
+            "*[aria-label='{button_label}'][role='button']", # Exact aria-label match
+            "button[name='{button_label}']", # Exact name match
+            "#signup-button",
+            # Partial matches: less precise
+            "button:has-text('{button_label_lower}')",
+            "button[name*='{button_label}']",
+            "*[aria-label*='{button_label}'][role='button']",
+            "button[aria-label*='{button_label}']",
+            "input[type=submit][value*='{button_label}']",
+        ]},
+        {"when": {"lacks": "button_label"}, "add": ['button', 'input[type=submit]', '[role="button"]', 'input[type=button]']},
+    ]},
+    # Input labels phrased as "input labeled 'Email'" or "Email field" replace the one found above
+    {"name": "input text", "when": {"any": ["input", "field", "text box"]}, "capture": "input_label", "from": [
+        regex(r'(?:input|field|text box)\s*(?:labeled|with text)?\s*\'?\"?([^\']+)\'?\"?'),
+        regex(r'\"?([^\"]+)\"?\s*(?:input|field|text box)'),
+    ]},
+    {"name": "input", "when": {"has": "input_label"}, "steps": [
+        {"capture": "input_label_lower", "from": [derive("input_label", str.lower)]},
+        {"format": [
+            "input[placeholder*='{input_label}']",
+            "input[name*='{input_label}']",
+            "input[id*='{input_label}']",
+            "label:has-text('{input_label}') + input",
+            "input[placeholder*='{input_label_lower}']",
+            "label:has-text('{input_label_lower}') + input",
+            "*[aria-label*='{input_label}']",
+            "input[data-qa*='{input_label}']", # Common for QA/test automation attributes
+            "textarea[name*='{input_label}']", # Also consider textareas
+            "textarea[id*='{input_label}']",
+        ]},
+    ]},
+    {"name": "generic input", "when": {"lacks": "input_label"}, "add": ['input[type="text"]', 'input[type="email"]', 'input[type="password"]', 'textarea', 'input']},
+    {"name": "checkbox", "when": {"any": ["checkbox"]}, "steps": [
+        {"capture": "checkbox_label", "from": [regex(r'checkbox(?: next to| labeled)?\s*\'?\"?([^\']+)\'?\"?')]},
+        {"when": {"has": "checkbox_label"}, "format": [
+            "input[type='checkbox']:has(~ label:has-text('{checkbox_label}'))", # Checkbox with sibling label
+            "input[type='checkbox']:has-text('{checkbox_label}')", # Direct text (less common for checkboxes)
+            "label:has-text('{checkbox_label}') > input[type='checkbox']", # Checkbox inside label
+            "input[type='checkbox'][aria-label*='{checkbox_label}']",
+            "*[role='checkbox'][aria-label*='{checkbox_label}']",
+            "input[type='checkbox'][name*='{checkbox_label}']",
+            "input[type='checkbox'][id*='{checkbox_label}']",
+        ]},
+        {"when": {"lacks": "checkbox_label"}, "add": ["input[type='checkbox']", "[role='checkbox']"]},
+    ]},
+]
+
+
+class KeywordIndex:
+    """Aho-Corasick automaton: finds which of a fixed set of keywords occur in a text in one pass."""
+
+    def __init__(self, keywords):
+        self._goto = [{}]
+        self._output = [set()]
+        for keyword in keywords:
+            state = 0
+            for char in keyword:
+                if char not in self._goto[state]:
+                    self._goto.append({})
+                    self._output.append(set())
+                    self._goto[state][char] = len(self._goto) - 1
+                state = self._goto[state][char]
+            self._output[state].add(keyword)
+
+        # Breadth-first, so each state's failure link is resolved before its children need it.
+        # Failure links are then folded into a full transition table, so scanning costs one
+        # dict lookup per character.
+        fail = [0] * len(self._goto)
+        self._next = [dict(self._goto[0])] + [None] * (len(self._goto) - 1)
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            self._next[state] = {**self._next[fail[state]], **self._goto[state]}
+            for char, child in self._goto[state].items():
+                fail[child] = self._next[fail[state]].get(char, 0)
+                self._output[child] |= self._output[fail[child]]
+                queue.append(child)
+        self._output = [frozenset(keywords) for keywords in self._output]
+
+    def find(self, text: str) -> set:
+        found = set()
+        transitions, output = self._next, self._output
+        state = 0
+        for char in text:
+            state = transitions[state].get(char, 0)
+            if output[state]:
+                found |= output[state]
+        return found
+
+
+def _rule_steps(rule: dict) -> list:
+    return rule.get("steps", [rule])
+
+
+def _condition_keywords(when: dict) -> set:
+    return set(when.get("any", ())) | set(when.get("all", ()))
+
+
+def _rule_keywords(rule: dict) -> set:
+    keywords = _condition_keywords(rule.get("when", {}))
+    for step in _rule_steps(rule):
+        keywords |= _condition_keywords(step.get("when", {}))
+        if "for_each" in step:
+            keywords |= set(step["for_each"][1])
+        for extractor in step.get("from", ()):
+            if extractor[0] == "phrase":
+                keywords |= set(extractor[1])
+    return keywords
+
+
+def _compile_condition(when: dict) -> tuple:
+    """Turns a "when" dict into (check, argument) pairs, keyword sets first since they're cheapest."""
+    checks = []
+    for key in ("any", "all", "url_any"):
+        if key in when:
+            checks.append((key, frozenset(when[key])))
+    for key in ("has", "lacks", "set", "unset", "value", "empty", "text_only"):
+        if when.get(key):
+            checks.append((key, when[key]))
+    return tuple(checks)
+
+
+def _compile_step(step: dict, conditional: bool = True) -> tuple:
+    return (
+        _compile_condition(step.get("when", {})) if conditional else (),
+        step.get("capture"),
+        tuple(step.get("from", ())),
+        step.get("accept_empty", False),
+        tuple(step.get("add", ())),
+        step.get("for_each"),
+        tuple(step.get("format", ())),
+    )
+
+
+def _compile(rules: list) -> tuple:
+    """Builds the compiled rules, the keyword automaton and the keyword -> rule positions index."""
+    compiled = []
+    keywords = set()
+    rules_by_keyword = {}
+    unindexed = []
+    for position, rule in enumerate(rules):
+        when = rule.get("when", {})
+        steps = [_compile_step(step) for step in rule["steps"]] if "steps" in rule else [_compile_step(rule, conditional=False)]
+        compiled.append((rule.get("group"), _compile_condition(when), tuple(steps)))
+        keywords |= _rule_keywords(rule)
+        triggers = when.get("any") or when.get("all")
+        if triggers:
+            for keyword in triggers:
+                rules_by_keyword.setdefault(keyword, []).append(position)
+        else:
+            unindexed.append(position) # Fires on captured values or on what's been selected so far
+    return tuple(compiled), KeywordIndex(keywords), rules_by_keyword, frozenset(unindexed)
+
+
+_COMPILED_RULES, _KEYWORD_INDEX, _RULES_BY_KEYWORD, _UNINDEXED_RULES = _compile(SELECTOR_RULES)
+
+
+def _holds(checks: tuple, found: set, values: dict, selectors: list, current_url: str) -> bool:
+    for check, argument in checks:
+        if check == "any":
+            if found.isdisjoint(argument):
+                return False
+        elif check == "all":
+            if not argument <= found:
+                return False
+        elif check == "url_any":
+            if not any(host in current_url for host in argument):
+                return False
+        elif check == "has":
+            if not values.get(argument):
+                return False
+        elif check == "lacks":
+            if values.get(argument):
+                return False
+        elif check == "set":
+            if values.get(argument) is None:
+                return False
+        elif check == "unset":
+            if values.get(argument) is not None:
+                return False
+        elif check == "value":
+            if values.get(argument[0]) not in argument[1]:
+                return False
+        elif check == "empty":
+            if selectors:
+                return False
+        elif check == "text_only":
+            if any(not s.startswith("text=") and not s.startswith(":has-text=") for s in selectors):
+                return False
+    return True
+
+
+def _extract(extractor: tuple, description: str, description_lower: str, found: set, values: dict):
+    kind = extractor[0]
+    if kind == "regex":
+        _, pattern, source, strip = extractor
+        match = pattern.search(description if source == "description" else description_lower)
+        if not match:
+            return None
+        return match.group(1).strip() if strip else match.group(1)
+    if kind == "phrase":
+        return next((p for p in extractor[1] if p in found), None)
+    _, name, transform = extractor
+    value = values.get(name)
+    return transform(value) if value is not None else None
+
+
+@lru_cache(maxsize=SELECTOR_RULE_CACHE_SIZE)
+def _infer(description: str, current_url: str) -> tuple:
+    description_lower = description.lower()
+    found = _KEYWORD_INDEX.find(description_lower)
+    positions = set(_UNINDEXED_RULES)
+    for keyword in found:
+        positions.update(_RULES_BY_KEYWORD.get(keyword, ()))
+
+    values = {"description": description}
+    selectors = []
+    fired_groups = set()
+    for position in sorted(positions):
+        group, checks, steps = _COMPILED_RULES[position]
+        if group in fired_groups or not _holds(checks, found, values, selectors, current_url):
+            continue
+        if group:
+            fired_groups.add(group)
+        for step_checks, capture, extractors, accept_empty, add, for_each, templates in steps:
+            if step_checks and not _holds(step_checks, found, values, selectors, current_url):
+                continue
+            if capture:
+                value = None
+                for extractor in extractors:
+                    value = _extract(extractor, description, description_lower, found, values)
+                    if value is not None and (value or accept_empty):
+                        break
+                values[capture] = value
+            selectors += add
+            if for_each:
+                name, keywords = for_each
+                for keyword in keywords:
+                    if keyword in found:
+                        values[name] = keyword
+                        selectors += [template.format_map(values) for template in templates]
+            elif templates:
+                selectors += [template.format_map(values) for template in templates]
+
+    # Remove duplicates while preserving order
+    return tuple(dict.fromkeys(selectors))
+
+
+def infer_generic_selectors(description: str, current_url: str = None) -> list[str]:
+    """
+    Infers a list of potential Playwright selectors based on a natural language description.
+    current_url defaults to the CURRENT_URL environment variable (used for site-specific selectors).
+    """
+    if current_url is None:
+        current_url = os.getenv("CURRENT_URL", "")
+    return list(_infer(description, current_url.lower()))
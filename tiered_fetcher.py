@@ -0,0 +1,149 @@
+import asyncio
+import re
+import threading
+import urllib.error
+import urllib.request
+from dataclasses import dataclass
+
+from html_reducer import reduce_html
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None # Falls back to urllib in worker threads (no connection reuse)
+
+# --- Tiered Fetch Settings ---
+HTTP_POOL_SIZE = 32 # Connections the HTTP tier keeps open across all hosts
+HTTP_POOL_SIZE_PER_HOST = 8
+HTTP_TIMEOUT = 15 # Seconds per request
+HTTP_MAX_BYTES = 5 * 1024 * 1024 # Bigger responses are left to the browser
+HTTP_USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+MIN_OUTLINE_CHARS = 200 # Served HTML with less outline than this is assumed to be filled in by JavaScript
+
+APP_ROOT_RE = re.compile(r"""<(div|main)\b[^>]*\bid=["'](?:root|app|__next|__nuxt|svelte)["'][^>]*>\s*</\1>""", re.IGNORECASE)
+NEEDS_JS_RE = re.compile(r"<noscript\b[^>]*>[^<]{0,300}\b(?:enable|requires?|needs?)\b[^<]{0,50}javascript", re.IGNORECASE)
+FORM_RE = re.compile(r"<form[\s>]", re.IGNORECASE)
+
+
+@dataclass
+class HttpPage:
+    url: str # After redirects; links resolve against this
+    status: int
+    content_type: str
+    html: str
+    etag: str | None = None
+    last_modified: str | None = None
+
+
+def browser_reason(page: HttpPage | None, needs_forms: bool = False, needs_screenshot: bool = False) -> str | None:
+    """Why a page has to be rendered in the browser after all, or None if its served HTML is enough."""
+    if page is None:
+        return "HTTP fetch failed"
+    if page.status >= 400:
+        return f"HTTP {page.status}"
+    if "html" not in page.content_type:
+        return f"not HTML ({page.content_type or 'unknown type'})"
+    if needs_screenshot:
+        return "every page gets a screenshot"
+    if needs_forms and FORM_RE.search(page.html):
+        return "it has forms to test"
+    if APP_ROOT_RE.search(page.html):
+        return "empty app root, rendered client-side"
+    if NEEDS_JS_RE.search(page.html):
+        return "it says it needs JavaScript"
+    if len(reduce_html(page.html, max_chars=0)) < MIN_OUTLINE_CHARS:
+        return "little server-rendered content"
+    return None
+
+
+def _fetch_with_urllib(url: str, timeout: float, headers: dict | None = None) -> HttpPage | None:
+    request = urllib.request.Request(url, headers={"User-Agent": HTTP_USER_AGENT, **(headers or {})})
+    try:
+        response = urllib.request.urlopen(request, timeout=timeout)
+    except urllib.error.HTTPError as e:
+        response = e # Error pages still have a status and body
+    with response:
+        body = response.read(HTTP_MAX_BYTES + 1)
+        if len(body) > HTTP_MAX_BYTES:
+            return None
+        charset = response.headers.get_content_charset() or "utf-8"
+        return HttpPage(response.geturl(), response.getcode(), response.headers.get_content_type(), body.decode(charset, errors="replace"),
+                        response.headers.get("ETag"), response.headers.get("Last-Modified"))
+
+
+class HttpFetcher:
+    """
+    The cheap tier of the crawl: plain HTTP GETs through a pooled client (aiohttp
+    when installed), so static pages can be parsed and analysed without a browser.
+    Callers check browser_reason() and only render the pages that need it.
+    """
+
+    def __init__(self, pool_size: int = HTTP_POOL_SIZE, pool_size_per_host: int = HTTP_POOL_SIZE_PER_HOST,
+                 timeout: float = HTTP_TIMEOUT):
+        self.pool_size = pool_size
+        self.pool_size_per_host = pool_size_per_host
+        self.timeout = timeout
+        self._session = None
+        if aiohttp is None:
+            print("WARN: aiohttp is not installed; the HTTP tier uses urllib without connection reuse.")
+
+    def _get_session(self):
+        if self._session is None: # Created lazily, on the loop that uses it
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size, limit_per_host=self.pool_size_per_host),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={"User-Agent": HTTP_USER_AGENT},
+            )
+        return self._session
+
+    async def fetch(self, url: str, headers: dict | None = None) -> HttpPage | None:
+        """
+        GETs a page; None if the request fails or the body is too big (the browser gets it instead).
+        Extra `headers` can make it conditional (see RecrawlState.conditional_headers), in which case the status may be 304.
+        """
+        try:
+            if aiohttp is None:
+                return await asyncio.to_thread(_fetch_with_urllib, url, self.timeout, headers)
+            async with self._get_session().get(url, headers=headers) as response:
+                if (response.content_length or 0) > HTTP_MAX_BYTES:
+                    return None
+                body = bytearray()
+                async for chunk in response.content.iter_chunked(64 * 1024): # read(n) returns whatever has arrived, not n bytes
+                    body += chunk
+                    if len(body) > HTTP_MAX_BYTES:
+                        return None
+                body = bytes(body)
+                return HttpPage(str(response.url), response.status, response.content_type, body.decode(response.charset or "utf-8", errors="replace"),
+                                response.headers.get("ETag"), response.headers.get("Last-Modified"))
+        except Exception as e:
+            print(f"WARN: HTTP fetch of {url} failed ({e}); using the browser.")
+            return None
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+class BackgroundHttpFetcher:
+    """
+    Runs an HttpFetcher on its own event loop thread so synchronous crawlers (the
+    Selenium scripts) share the same connection pool. `fetch()` blocks until done.
+    """
+
+    def __init__(self, **options):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.fetcher = HttpFetcher(**options)
+
+    def _call(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def fetch(self, url: str, headers: dict | None = None) -> HttpPage | None:
+        return self._call(self.fetcher.fetch(url, headers))
+
+    def close(self):
+        self._call(self.fetcher.close())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
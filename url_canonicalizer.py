@@ -0,0 +1,107 @@
+import re
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
+
+# --- URL Canonicalization Settings ---
+# Query parameters that never change the content (tracking and session ids) and are
+# dropped by canonicalization; every other parameter is kept. "*" applies to every
+# host, host entries add to it.
+QUERY_PARAM_DENYLIST = {
+    "*": {"gclid", "dclid", "gbraid", "wbraid", "fbclid", "msclkid", "yclid", "igshid", "mc_cid", "mc_eid", "_ga", "_gl", "_hsenc", "_hsmi", "jsessionid", "phpsessid", "sessionid", "sid"},
+    # "shop.example.com": {"sort", "view"},
+}
+QUERY_PARAM_DENY_PREFIXES = ("utm_",) # Whole families of tracking parameters
+DEFAULT_DOCUMENTS = {"index.html", "index.htm", "index.php", "index.shtml", "default.htm", "default.html", "default.asp", "default.aspx"} # Folded into their directory
+DEFAULT_PORTS = {"http": ":80", "https": ":443"}
+UPGRADE_TO_HTTPS = False # Treat http:// and https:// of a host as one page (fetched over https)
+STRIP_WWW = False # Treat www.example.com and example.com as one host
+LOWERCASE_PATHS = False # Only for case-insensitive servers (IIS); paths are case-sensitive elsewhere
+
+UNRESERVED_CHARS = set("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-._~")
+PERCENT_RE = re.compile(r"%([0-9a-fA-F]{2})")
+
+
+def _normalize_percent_encoding(text: str) -> str:
+    """Decodes escaped unreserved characters and uppercases the remaining escapes (%7e -> ~, %2f -> %2F)."""
+    def fix(match):
+        char = chr(int(match.group(1), 16))
+        return char if char in UNRESERVED_CHARS else f"%{match.group(1).upper()}"
+    return PERCENT_RE.sub(fix, text)
+
+
+def _remove_dot_segments(path: str) -> str:
+    """Resolves "." and ".." segments and collapses repeated slashes."""
+    segments = []
+    for segment in path.split("/")[1:]:
+        if segment == "..":
+            if segments:
+                segments.pop()
+        elif segment not in (".", ""):
+            segments.append(segment)
+    trailing = path.endswith("/") or path.rsplit("/", 1)[-1] in (".", "..")
+    return "/" + "/".join(segments) + ("/" if trailing and segments else "")
+
+
+def denied_query_params(host: str) -> set:
+    return QUERY_PARAM_DENYLIST.get("*", set()) | QUERY_PARAM_DENYLIST.get(host, set())
+
+
+def clean_url(url: str) -> str:
+    """The URL as found, minus surrounding whitespace and the fragment; this is what the crawlers queue and fetch."""
+    return url.strip().split("#", 1)[0]
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    Rewrites a URL into one spelling per page, for recognising duplicates: lowercase
+    scheme and host, no default port or fragment, dot segments resolved, default
+    documents folded into their directory (/docs/index.html -> /docs/), and the query
+    parameters sorted, without tracking parameters. Only used for comparing URLs;
+    pages are fetched at the URL they were found under (see clean_url).
+    """
+    parts = urlparse(url.strip())
+    scheme = parts.scheme.lower()
+    if scheme not in DEFAULT_PORTS:
+        return url # mailto:, javascript: and friends are left alone
+    host = (parts.hostname or "").rstrip(".") # urlparse lowercases it; also drops the dot of "example.com."
+    if STRIP_WWW and host.startswith("www."):
+        host = host[4:]
+    netloc = f"[{host}]" if ":" in host else host # IPv6
+    try:
+        port = parts.port
+    except ValueError:
+        port = None # Not a valid port; dropped
+    if port is not None and f":{port}" != DEFAULT_PORTS[scheme]:
+        netloc += f":{port}"
+    if parts.username is not None: # User name and password are case-sensitive; kept as written
+        userinfo = parts.username + (f":{parts.password}" if parts.password is not None else "")
+        netloc = f"{userinfo}@{netloc}"
+    if UPGRADE_TO_HTTPS:
+        scheme = "https"
+
+    path = _remove_dot_segments(_normalize_percent_encoding(parts.path or "/"))
+    if LOWERCASE_PATHS:
+        path = path.lower()
+    directory, _, document = path.rpartition("/")
+    if document.lower() in DEFAULT_DOCUMENTS:
+        path = directory + "/"
+
+    denied = denied_query_params(parts.hostname or "")
+    params = sorted((key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+                    if key.lower() not in denied and not key.lower().startswith(QUERY_PARAM_DENY_PREFIXES))
+    return urlunparse((scheme, netloc, path, parts.params, urlencode(params), ""))
+
+
+def url_key(canonical_url: str) -> str:
+    """
+    Dedupe key for a canonicalized URL: also folds the trailing slash, so /docs and
+    /docs/ count as one page while the queued URL keeps the spelling that was found
+    first (relative links resolve differently against the two).
+    """
+    parts = urlparse(canonical_url)
+    path = parts.path.rstrip("/") or "/"
+    return urlunparse(parts._replace(path=path))
+
+
+def canonical_key(url: str) -> str:
+    """Dedupe key of a URL as found: url_key() of its canonical form."""
+    return url_key(canonicalize_url(url))